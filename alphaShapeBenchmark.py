@@ -0,0 +1,145 @@
+import argparse
+import math
+import time
+
+import numpy as np
+import trimesh
+from alphashape import alphashape
+
+import meshCreation
+import meshCreationUtilities as MeshUtilities
+import pointCloudUtilities as PointCloudUtilities
+import vegetationPipeline as VegetationPipeline
+
+
+def islandsOfFile(input_path, cellSize):
+    """ Split the vegetation of a las/laz file into islands, like meshCreation.vegetationToMesh does
+
+    Parameters
+    ------
+    input_path : str
+      Path of the las/laz file
+    cellSize : float
+      Size of the cells of the grid
+
+    Returns
+    -------
+    islands : list
+        For each island, its points (sorted by height) and its size (number of cells it is spanning)
+    """
+    point_data, point_data_color = PointCloudUtilities.readVegetationPoints(input_path)
+    islands = VegetationPipeline.splitIslands(point_data, VegetationPipeline.eightBitColors(point_data_color), cellSize)
+
+    offsets = islands["offsets"]
+    return [(islands["points"][offsets[k]:offsets[k+1]], islands["sizes"][k]) for k in range(len(islands["names"]))]
+
+
+def alphaShapeCases(islands, nbLayers=5, layerMargin=1/3):
+    """ Point sets given to the alpha shapes by meshCreation.islandMeshes : the layers of the mid-size islands (3D)
+    and the biggest islands (2D, extruded)
+
+    Parameters
+    ------
+    islands : list
+      See islandsOfFile
+    nbLayers : int
+      Number of layers of the layered alpha shapes
+    layerMargin : float
+      See meshCreation.layerBounds
+
+    Returns
+    -------
+    cases : list
+        For each alpha shape, its points and its alpha
+    """
+    cases = []
+    for islandPoints, islandSize in islands:
+        if len(islandPoints) <= meshCreation.MIN_POINTS or islandSize < meshCreation.HULL_MAX_SIZE:
+            continue
+        alpha = MeshUtilities.computeAlpha(islandPoints)
+        if islandSize > meshCreation.EXTRUDED_MIN_SIZE:
+            cases.append((islandPoints[:,:2], alpha))
+        else:
+            for _, start, end in meshCreation.layerBounds(islandPoints, nbLayers, layerMargin):
+                cases.append((islandPoints[start:end], alpha))
+    return cases
+
+
+def runLibrary(points, alpha):
+    """ Alpha shape of the alphashape package, as measures : number of faces, area (or length of the outline in 2D)
+    and volume (or area in 2D) """
+    shape = alphashape(points, alpha)
+    if points.shape[1] == 2:
+        return len(getattr(shape, "geoms", [shape])), shape.length, shape.area
+    return len(shape.faces), shape.area, abs(shape.volume)
+
+
+def runNative(points, alpha):
+    """ Alpha shape of MeshUtilities.alphaComplex, with the same measures as runLibrary """
+    boundary, simplices = MeshUtilities.alphaComplex(points, alpha)
+    if points.shape[1] == 2:
+        length = np.linalg.norm(points[boundary[:,1]] - points[boundary[:,0]], axis=1).sum()
+        edges = points[simplices[:,1:]] - points[simplices[:,:1]]
+        return len(boundary), length, np.abs(np.cross(edges[:,0], edges[:,1])).sum() / 2
+    vertexIndexes, faces = MeshUtilities.referencedVertices(boundary)
+    vertices = points[vertexIndexes]
+    mesh = trimesh.Trimesh(vertices=vertices - vertices.mean(axis=0), faces=faces, process=False)
+    return len(faces), mesh.area, abs(mesh.volume)
+
+
+def benchmark(input_path, cellSize, repeat):
+    """ Time both alpha shape engines on the alpha shapes of a file and print the comparison
+
+    Parameters
+    ------
+    input_path : str
+      Path of the las/laz file
+    cellSize : float
+      Size of the cells of the grid
+    repeat : int
+      Number of times each alpha shape is computed, the best time is kept
+    """
+    cases = alphaShapeCases(islandsOfFile(input_path, cellSize))
+
+    line = "%6s %4s %8s %10s %10s %8s %14s %14s %14s %14s"
+    print(input_path)
+    print(line % ("Case", "Dim", "Points", "Library s", "Native s", "Speedup", "Library area", "Native area", "Library vol", "Native vol"))
+
+    totals = [0.0, 0.0]
+    for k, (points, alpha) in enumerate(cases):
+        results = []
+        for position, engine in enumerate((runLibrary, runNative)):
+            seconds = math.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                measures = engine(points, alpha)
+                seconds = min(seconds, time.perf_counter() - start)
+            totals[position] += seconds
+            results.append((seconds, measures))
+
+        (librarySeconds, libraryMeasures), (nativeSeconds, nativeMeasures) = results
+        print(line % (k, points.shape[1], len(points), "%.4f" % librarySeconds, "%.4f" % nativeSeconds,
+                      "%.1fx" % (librarySeconds / nativeSeconds), "%.2f" % libraryMeasures[1], "%.2f" % nativeMeasures[1],
+                      "%.2f" % libraryMeasures[2], "%.2f" % nativeMeasures[2]))
+
+    print(line % ("Total", "", sum(len(points) for points, _ in cases), "%.4f" % totals[0], "%.4f" % totals[1],
+                  "%.1fx" % (totals[0] / max(totals[1], 1e-12)), "", "", "", ""))
+    print('-------------')
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Compare the alphashape package and the native alpha shapes on the alpha shapes of las/laz files")
+
+    parser.add_argument("-i", "--input", help="Input las/laz files (default = the sample datas)", nargs="+",
+                        default=["./SampleDatas/ExampleDataIsolatedTrees.las", "./SampleDatas/ExampleDataDenseVegetation.las"])
+    parser.add_argument("-c", "--cellsize", help="Cell size (default = 2.0)", default=2.0, type=float)
+    parser.add_argument("-r", "--repeat", help="Number of runs of each alpha shape, the best time is kept (default = 3)", default=3, type=int)
+
+    args = parser.parse_args()
+
+    for input_path in args.input:
+        benchmark(input_path, args.cellsize, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import meshCreation
+
+
+# Extensions of the files taken from a directory
+INPUT_EXTENSIONS = (".las", ".laz")
+
+
+def listInputFiles(input_path):
+    """ List the las/laz files designated by an input path
+
+    Parameters
+    ------
+    input_path : str
+      A las/laz file, a directory (all its las/laz files) or a glob pattern (e.g. "./tiles/*.laz")
+
+    Returns
+    -------
+    files : list
+        Paths of the files, sorted, empty when the path matches none
+    """
+    if os.path.isdir(input_path):
+        return sorted(os.path.join(input_path, name) for name in os.listdir(input_path)
+                      if name.lower().endswith(INPUT_EXTENSIONS))
+    if glob.has_magic(input_path):
+        return sorted(path for path in glob.glob(input_path) if os.path.isfile(path))
+    return [input_path] if os.path.isfile(input_path) else []
+
+
+def batchVegetationToMesh(input_paths, output_path, cellSize, verbose, workers=1, **options):
+    """ Mesh the vegetation of several las/laz files, through one pool of processes shared by all the files
+
+    The meshes of each file are written in their own folder inside the output folder, named after the file.
+    A summary of each file is printed at the end.
+
+    Parameters
+    ------
+    input_paths : list
+      Paths of the las/laz files
+    output_path : str
+      Path of the output folder
+    cellSize : float
+      Size of the cells of the grid
+    verbose : bool
+      Increase the output verbosity
+    workers : int
+      Number of files processed at the same time
+    options : dict
+      Other options of meshCreation.vegetationToMesh
+
+    Returns
+    -------
+    summaries : list
+        For each file, a dict with its "file", number of "points", number of "islands", number of points "dropped"
+        by the downsampling and "seconds" spent, or the "error" that stopped it
+    """
+    start = time.time()
+    os.makedirs(output_path, exist_ok=True)
+
+    tasks = [(path, output_path + os.path.splitext(os.path.basename(path))[0] + "/", cellSize, verbose, options)
+             for path in input_paths]
+
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            summaries = list(executor.map(meshFileTask, tasks))
+    else:
+        summaries = [meshFileTask(task) for task in tasks]
+
+    printSummary(summaries, time.time() - start)
+
+    return summaries
+
+
+def meshFileTask(task):
+    """ Mesh the vegetation of a file of a batch, the islands of the file being meshed one after the other
+
+    Parameters
+    ------
+    task : tuple
+      Path of the file, path of its output folder, cell size, verbosity and other options of meshCreation.vegetationToMesh
+
+    Returns
+    -------
+    summary : dict
+        See batchVegetationToMesh
+    """
+    input_path, output_path, cellSize, verbose, options = task
+    try:
+        summary = meshCreation.vegetationToMesh(input_path, output_path, cellSize, verbose, **options)
+    except Exception as exce:
+        meshCreation.log.warning("[Warning] : error when processing " + input_path + ", skipping it")
+        meshCreation.log.warning(exce)
+        summary = {"error": str(exce)}
+
+    summary["file"] = input_path
+    return summary
+
+
+def printSummary(summaries, seconds):
+    """ Print the number of points, islands, dropped points and the time spent on each file of a batch, and the totals
+
+    Parameters
+    ------
+    summaries : list
+      Summary of each file, see batchVegetationToMesh
+    seconds : float
+      Total time spent on the batch
+    """
+    width = max([len(os.path.basename(summary["file"])) for summary in summaries] + [len("Total")])
+    line = "%-" + str(width) + "s %12s %8s %12s %10s"
+
+    print('-------------')
+    print(line % ("File", "Points", "Islands", "Dropped", "Seconds"))
+    for summary in summaries:
+        name = os.path.basename(summary["file"])
+        if "error" in summary:
+            print(line % (name, "ERROR", "", "", "") + " " + summary["error"])
+        else:
+            print(line % (name, summary["points"], summary["islands"], summary["dropped"], "%.2f" % summary["seconds"]))
+
+    done = [summary for summary in summaries if "error" not in summary]
+    print(line % ("Total", sum(summary["points"] for summary in done), sum(summary["islands"] for summary in done),
+                  sum(summary["dropped"] for summary in done), "%.2f" % seconds))
+    print(str(len(done)) + " of " + str(len(summaries)) + " files processed")
@@ -1,14 +1,40 @@
 import meshCreation
+import pointCloudUtilities as PointCloudUtilities
+import meshExport as MeshExport
+import meshCreationUtilities as MeshUtilities
+import batchMeshCreation as BatchMeshCreation
 import argparse
+import glob
+import os
 
 
 def main():
 
     parser = argparse.ArgumentParser(description="Transform the vegetation inside a classified point cloud into a set of meshes")
 
-    parser.add_argument("-i", "--input", help="Input las/laz file (mandatory)")
+    parser.add_argument("-i", "--input", help="Input las/laz file, directory or glob pattern of las/laz files (mandatory)")
     parser.add_argument("-o", "--output", help="Output directory (default ='./output/')", default="./output/")
     parser.add_argument("-c", "--cellsize", help="Cell size (default = 2.0)", default=2.0, type=float)
+    parser.add_argument("-s", "--chunksize", help="Stream the input by chunks of this many points (default = read the whole file at once)", default=None, type=int)
+    parser.add_argument("-z", "--zstatistic", help="Height given to each cell of the grid (default = mean)", default="mean", choices=PointCloudUtilities.CELL_STATISTICS)
+    parser.add_argument("-n", "--connectivity", help="Rule used to group the cells into islets (default = corner)", default="corner", choices=PointCloudUtilities.CONNECTIVITY_MODES)
+    parser.add_argument("-m", "--colormode", help="Color of the points : mean of their cell or their own LIDAR color (default = cell)", default="cell", choices=PointCloudUtilities.COLOR_MODES)
+    parser.add_argument("-w", "--workers", help="Number of processes used to create the meshes, or to process the files of a batch (default = 1)", default=1, type=int)
+    parser.add_argument("-f", "--format", help="Format of the output meshes (default = obj)", default="obj", choices=MeshExport.MESH_FORMATS)
+    parser.add_argument("-r", "--normals", help="How the faces of the alpha shapes are oriented (default = centroid)", default="centroid", choices=MeshUtilities.NORMALS_MODES)
+    parser.add_argument("-l", "--layers", help="Number of layers of the layered alpha shapes (default = 5)", default=5, type=int)
+    parser.add_argument("-g", "--layermargin", help="Portion of the layer above added to each layer (default = 1/3)", default=1/3, type=float)
+    parser.add_argument("-t", "--tilesize", help="Process the input by tiles of this size, to bound the memory used (default = no tiling)", default=None, type=float)
+    parser.add_argument("-a", "--halo", help="Width of the band read around each tile (default = 20)", default=20, type=float)
+    parser.add_argument("-k", "--cache", help="Folder caching the meshes of the islands between runs (default = no cache)", default=None)
+    parser.add_argument("-e", "--cachesize", help="Maximum size of the cache folder in MB (default = 1024)", default=1024, type=float)
+    parser.add_argument("-x", "--alphaengine", help="Implementation of the alpha shapes (default = library)", default="library", choices=MeshUtilities.ALPHA_ENGINES)
+    parser.add_argument("-d", "--voxelsize", help="Keep one point per voxel of this size, relative to the cell size (default = no voxels)", default=None, type=float)
+    parser.add_argument("-b", "--pointbudget", help="Maximum number of points of an island given to the meshing (default = no maximum)", default=None, type=int)
+    parser.add_argument("-q", "--lods", help="Portion of the faces kept by each level of detail written besides the meshes, e.g. -q 0.5 0.2 (default = no levels of detail)", default=[], type=float, nargs="*")
+    parser.add_argument("-j", "--tileset", help="Write the meshes as glb with a 3D Tiles tileset.json", action="store_true")
+    parser.add_argument("-p", "--profile", help="Write a profile.json report of the time and memory of each stage and of each island", action="store_true")
+    parser.add_argument("-u", "--grid", help="Storage of the grid of cells, sparse storing only the occupied cells (default = auto)", default="auto", choices=PointCloudUtilities.GRID_MODES)
     parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
 
     args = parser.parse_args()
@@ -17,8 +43,54 @@ def main():
     output_path = args.output
     cellSize = args.cellsize
     verbose = args.verbose
+    chunkSize = args.chunksize
+    zStatistic = args.zstatistic
+    connectivity = args.connectivity
+    colorMode = args.colormode
+    workers = args.workers
+    meshFormat = args.format
+    normalsMode = args.normals
+    nbLayers = args.layers
+    layerMargin = args.layermargin
+    tileSize = args.tilesize
+    halo = args.halo
+    cacheFolder = args.cache
+    cacheSize = args.cachesize
+    alphaEngine = args.alphaengine
+    voxelSize = args.voxelsize
+    pointBudget = args.pointbudget
+    lodRatios = args.lods
+    tileset = args.tileset
+    profile = args.profile
+    gridMode = args.grid
 
-    meshCreation.vegetationToMesh(input_path, output_path, cellSize, verbose)
+    if any(ratio <= 0 or ratio >= 1 for ratio in lodRatios) or lodRatios != sorted(lodRatios, reverse=True):
+        parser.error("the levels of detail must be decreasing portions of the faces, between 0 and 1")
+
+    if input_path is None:
+        parser.error("the input (-i) is mandatory")
+    if not (os.path.isfile(input_path) or os.path.isdir(input_path) or glob.has_magic(input_path)):
+        parser.error("no such file or directory : " + input_path)
+
+    if os.path.isfile(input_path):
+        meshCreation.vegetationToMesh(input_path, output_path, cellSize, verbose, chunkSize=chunkSize, zStatistic=zStatistic,
+                                      connectivity=connectivity, colorMode=colorMode, workers=workers, meshFormat=meshFormat,
+                                      normalsMode=normalsMode, nbLayers=nbLayers, layerMargin=layerMargin, tileSize=tileSize, halo=halo,
+                                      cacheFolder=cacheFolder, cacheSize=cacheSize, alphaEngine=alphaEngine,
+                                      voxelSize=voxelSize, pointBudget=pointBudget, lodRatios=lodRatios,
+                                      tileset=tileset, profile=profile, gridMode=gridMode)
+    else:
+        # Directory or glob : the files share the pool of processes, each of them being processed by one worker
+        input_paths = BatchMeshCreation.listInputFiles(input_path)
+        if len(input_paths) == 0:
+            parser.error("no las/laz file found for " + input_path)
+
+        BatchMeshCreation.batchVegetationToMesh(input_paths, output_path, cellSize, verbose, workers, chunkSize=chunkSize, zStatistic=zStatistic,
+                                                connectivity=connectivity, colorMode=colorMode, meshFormat=meshFormat, normalsMode=normalsMode,
+                                                nbLayers=nbLayers, layerMargin=layerMargin, tileSize=tileSize, halo=halo,
+                                                cacheFolder=cacheFolder, cacheSize=cacheSize, alphaEngine=alphaEngine,
+                                                voxelSize=voxelSize, pointBudget=pointBudget, lodRatios=lodRatios,
+                                                tileset=tileset, profile=profile, gridMode=gridMode)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import meshCreation
+import profiling as Profiling
+
+
+# Version of the meshing algorithms, to increase when they change the meshes : the meshes cached before are then ignored
+ALGORITHM_VERSION = 1
+
+# File of the output folder listing the islands it contains, with their key and files
+MANIFEST_NAME = "manifest.json"
+
+# File of a cache entry with the summary of the island (see meshCreation.islandMeshes) and its files
+ENTRY_NAME = "entry.json"
+
+# Name given to the islands in the files of the cache, replaced by the name of the island when they are copied
+CACHED_ISLAND_NAME = "island"
+
+
+def openCache(folder, output_path, cellSize, meshOptions, maxSize):
+    """ Prepare the cache of the meshes for a run writing in an output folder
+
+    The meshes of each island are saved in the cache folder under a key made from its points and the parameters
+    of the run (see islandKey). The manifest of the output folder tells which islands it already contains.
+
+    Parameters
+    ------
+    folder : str
+      Path of the cache folder, kept between runs
+    output_path : str
+      Path of the output folder
+    cellSize : float
+      Size of the cells of the grid
+    meshOptions : dict
+      Format, number of layers, levels of detail and other options of the meshing of the islands, part of their keys (see islandKey)
+    maxSize : int
+      Size of the cache folder (in bytes) above which the least recently used entries are removed (see closeCache)
+
+    Returns
+    -------
+    cache : dict
+        State of the cache for the run
+    """
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(output_path, exist_ok=True)
+
+    try:
+        with open(output_path + MANIFEST_NAME) as f:
+            manifest = json.load(f)
+        previous = manifest["islands"] if manifest.get("version") == ALGORITHM_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        previous = {}
+
+    return {
+        "folder": folder,
+        "output_path": output_path,
+        "cellSize": cellSize,
+        "meshOptions": meshOptions,
+        "maxSize": maxSize,
+        # Islands listed in the manifest of the previous run
+        "previous": previous,
+        # Islands of this run
+        "islands": {}
+    }
+
+
+def islandKey(cache, islandPoints, islandColors, islandSize):
+    """ Key of the meshes of an island : hash of its points, colors and size, and of the parameters of the run
+
+    The alpha of the island is computed from its points, so it is part of the key through them.
+
+    Parameters
+    ------
+    cache : dict
+      See openCache
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island
+    islandColors : 2d-array
+      The r, g and b values of the points of the island (between 0 and 1)
+    islandSize : int
+      Number of cells the island is spanning
+
+    Returns
+    -------
+    key : str
+        Hexadecimal hash
+    """
+    parameters = [ALGORITHM_VERSION, cache["cellSize"], int(islandSize), sorted(cache["meshOptions"].items())]
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(parameters).encode('utf-8'))
+    digest.update(np.ascontiguousarray(islandPoints, np.float64).tobytes())
+    digest.update(np.ascontiguousarray(islandColors, np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def islandFiles(cache, name):
+    """ Names of the files an island can have in the output folder
+
+    Parameters
+    ------
+    cache : dict
+      See openCache
+    name : str
+      Name of the island
+
+    Returns
+    -------
+    files : list
+        Names of the files (see meshCreation.islandFileNames)
+    """
+    meshOptions = cache["meshOptions"]
+    return meshCreation.islandFileNames(name, meshOptions.get("meshFormat", "obj"), meshOptions.get("nbLayers", 5),
+                                        len(meshOptions.get("lodRatios") or []))
+
+
+def fetchIsland(cache, name, key):
+    """ Get the meshes of an island from the output folder or the cache
+
+    The island is skipped when the output folder already has its meshes for the same key,
+    otherwise its meshes are copied from the cache if they are there.
+    When the island isn't found, its old files are removed so that it can be meshed again.
+
+    Parameters
+    ------
+    cache : dict
+      See openCache
+    name : str
+      Name of the island
+    key : str
+      Key of the island, see islandKey
+
+    Returns
+    -------
+    choice : str
+        Summary of the island (see meshCreation.islandMeshes), None if it must be meshed
+    """
+    name = str(name)
+    output_path = cache["output_path"]
+
+    previous = cache["previous"].get(name)
+    if previous is not None and previous["key"] == key and all(os.path.isfile(output_path + file) for file in previous["files"]):
+        cache["islands"][name] = previous
+        Profiling.recordCachedIsland(name)
+        return previous["choice"]
+
+    for file in islandFiles(cache, name):
+        if os.path.isfile(output_path + file):
+            os.remove(output_path + file)
+
+    entryPath = os.path.join(cache["folder"], key)
+    try:
+        with open(os.path.join(entryPath, ENTRY_NAME)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # Same order in both lists, the cached files are named after CACHED_ISLAND_NAME
+    outputNames = dict(zip(islandFiles(cache, CACHED_ISLAND_NAME), islandFiles(cache, name)))
+    files = []
+    try:
+        for cachedFile in entry["files"]:
+            shutil.copyfile(os.path.join(entryPath, cachedFile), output_path + outputNames[cachedFile])
+            files.append(outputNames[cachedFile])
+
+        # Used to remove the least recently used entries first
+        os.utime(entryPath)
+    except OSError:
+        # The entry was removed by another process in the meantime
+        for file in files:
+            os.remove(output_path + file)
+        return None
+
+    cache["islands"][name] = {"key": key, "files": files, "choice": entry["choice"]}
+    Profiling.recordCachedIsland(name)
+    return entry["choice"]
+
+
+def storeIsland(cache, name, key, choice):
+    """ Save the meshes of an island written in the output folder in the cache
+
+    Parameters
+    ------
+    cache : dict
+      See openCache
+    name : str
+      Name of the island
+    key : str
+      Key of the island, see islandKey
+    choice : str
+      Summary of the island, see meshCreation.islandMeshes
+    """
+    name = str(name)
+    output_path = cache["output_path"]
+
+    cachedNames = dict(zip(islandFiles(cache, name), islandFiles(cache, CACHED_ISLAND_NAME)))
+    files = [file for file in islandFiles(cache, name) if os.path.isfile(output_path + file)]
+    cache["islands"][name] = {"key": key, "files": files, "choice": choice}
+
+    entryPath = os.path.join(cache["folder"], key)
+    if os.path.isdir(entryPath):
+        return
+
+    # The entry is written aside and renamed once complete, several processes can store entries at the same time
+    temporaryPath = entryPath + ".tmp" + str(os.getpid())
+    os.makedirs(temporaryPath, exist_ok=True)
+    for file in files:
+        shutil.copyfile(output_path + file, os.path.join(temporaryPath, cachedNames[file]))
+    with open(os.path.join(temporaryPath, ENTRY_NAME), 'w') as f:
+        json.dump({"choice": choice, "files": [cachedNames[file] for file in files]}, f)
+
+    try:
+        os.rename(temporaryPath, entryPath)
+    except OSError:
+        shutil.rmtree(temporaryPath, ignore_errors=True)
+
+
+def closeCache(cache):
+    """ Write the manifest of the output folder, remove the files of the output folder that don't belong
+    to the islands of the run and remove the least recently used entries of the cache above its maximum size
+
+    Parameters
+    ------
+    cache : dict
+      See openCache
+    """
+    output_path = cache["output_path"]
+
+    with open(output_path + MANIFEST_NAME, 'w') as f:
+        json.dump({"version": ALGORITHM_VERSION, "islands": cache["islands"]}, f)
+
+    kept = {MANIFEST_NAME}
+    for island in cache["islands"].values():
+        kept.update(island["files"])
+    for file in os.listdir(output_path):
+        if file not in kept and os.path.isfile(output_path + file):
+            os.remove(output_path + file)
+
+    evictCache(cache["folder"], cache["maxSize"])
+
+
+def evictCache(folder, maxSize):
+    """ Remove the least recently used entries of a cache folder until its size is below maxSize
+
+    Parameters
+    ------
+    folder : str
+      Path of the cache folder
+    maxSize : int
+      Maximum size of the cache folder (in bytes)
+    """
+    entries = []
+    totalSize = 0
+    for entry in os.scandir(folder):
+        # Only the entries themselves : a link to a folder outside of the cache is neither counted nor removed
+        if entry.is_dir(follow_symlinks=False) and ".tmp" not in entry.name:
+            try:
+                size = sum(file.stat().st_size for file in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                totalSize += size
+            except OSError:
+                # Removed by another process in the meantime
+                continue
+
+    entries.sort()
+    for lastUse, size, path in entries:
+        if totalSize <= maxSize:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        totalSize -= size
@@ -1,14 +1,21 @@
-import laspy
 import numpy as np
-import math
 import time
-import open3d as o3d
-from alphashape import alphashape
 import meshCreationUtilities as MeshUtilities
+import meshExport as MeshExport
+import tilesetExport as TilesetExport
+import pointCloudUtilities as PointCloudUtilities
+import tiledMeshCreation as TiledMeshCreation
+import meshCache as MeshCache
+import vegetationPipeline as VegetationPipeline
+import profiling as Profiling
 import logging
+from multiprocessing import resource_tracker, shared_memory
 
 
-def vegetationToMesh(input_path, output_path, cellSize, verbose):
+log = logging.getLogger("my-logger")
+
+
+def vegetationToMesh(input_path, output_path, cellSize, verbose, *, chunkSize=None, zStatistic="mean", connectivity="corner", colorMode="cell", workers=1, meshFormat="obj", normalsMode="centroid", nbLayers=5, layerMargin=1/3, tileSize=None, halo=20, cacheFolder=None, cacheSize=1024, alphaEngine="library", voxelSize=None, pointBudget=None, lodRatios=None, tileset=False, profile=False, gridMode="auto"):
     startProg = time.time()
 
 
@@ -18,664 +25,669 @@ def vegetationToMesh(input_path, output_path, cellSize, verbose):
     else:
         logging.basicConfig(level=logging.WARNING, format='')
 
-    global log
-    log = logging.getLogger("my-logger")
-
-    MeshUtilities.clearFolders(output_path)
-
-    # To replace with CLI
-    las = laspy.read(input_path)
-
-    xmax=-math.inf
-    xmin=math.inf
-    ymax=-math.inf
-    ymin=math.inf
-
-    # Used to filter the point cloud (needs to be classified) 
-
-    pcFiltered = laspy.create(point_format=las.header.point_format, file_version=las.header.version)
-    pcFiltered.points = las.points[(las.classification == 3) | (las.classification == 4) | (las.classification == 5)]
-
-    # When the point cloud is already filtered
-    # pcFiltered = las
-
-
-    point_data = np.stack([pcFiltered.x, pcFiltered.y, pcFiltered.z], axis=0).transpose((1, 0))
-    # RGB colors which values vary between 0 and 255
-    point_data_color = np.stack([pcFiltered.red, pcFiltered.green, pcFiltered.blue], axis=0).transpose((1, 0))
-    # If the color is coded on 16 bits, force it back to 8 bits
-    if point_data_color[0][0] > 256:
-        point_data_color = point_data_color//256
-    # RGB colors which values vary between 0 and 1
-    point_data_color_normalized = point_data_color/255
-
-    xmax, ymax, zmax = np.max(point_data, axis=0)
-    xmin, ymin, zmin = np.min(point_data, axis=0)
-
-
-    boxWidth = xmax-xmin
-    boxHeight = ymax - ymin
-
-    cellCountWidth = math.ceil(boxWidth/cellSize)
-    cellCountHeight = math.ceil(boxHeight/cellSize)
-
-    # Init
-    cellsZmean = np.zeros((cellCountWidth, cellCountHeight))
-    cellsZCount = np.zeros((cellCountWidth, cellCountHeight))
-    cellsColorMean = np.ndarray([cellCountWidth, cellCountHeight, 3])
-    cellsNormalizedColorMean = np.ndarray([cellCountWidth, cellCountHeight, 3])
-
-    end = time.time()
-    log.info("Finished initialisation in " + str(end - startProg) + " seconds") # time in seconds
-
-    start = time.time()
-    log.info("Starting init of cellZMean")
- 
-    indexes = np.ndarray(point_data.shape, np.int32)
-
-    # Used to convert spacial coordinates to tab index
-    indexes[:,0] =  np.floor(((point_data[:,0]-xmin)/cellSize)-1)
-    indexes[:,1] =  np.floor(((point_data[:,1]-ymin)/cellSize)-1)
-
-
-    for i in range(indexes.shape[0]):
-        xi = indexes[i,0]
-        yi = indexes[i,1]
-
-        # Z max instead of mean (comment out the next two lines if you want to use Zmax)
-        # cellsZmean[xi][yi] = max(cellsZmean[xi][yi], point[2])
-
-        # Sum of the height in one cell
-        cellsZmean[xi][yi] += point_data[i,2]
-        cellsZCount[xi][yi] += 1
+    if profile:
+        Profiling.startProfile()
 
-        # Sum of the colors in one cell
-        cellsColorMean[xi][yi] += point_data_color[i]
-        cellsNormalizedColorMean[xi][yi] += point_data_color_normalized[i]
+    # The tileset references glb contents
+    if tileset:
+        meshFormat = "glb"
 
+    # Options of the meshing that change the files of the islands, part of the keys of the cache (see MeshCache.islandKey)
+    meshOptions = {"meshFormat": meshFormat, "normalsMode": normalsMode, "nbLayers": nbLayers, "layerMargin": layerMargin,
+                   "alphaEngine": alphaEngine, "lodRatios": list(lodRatios or [])}
 
+    # Same settings as the in-memory API, which makes the meshes of the islands (see VegetationPipeline.meshIslands)
+    pipeline = VegetationPipeline.createPipeline(cellSize, zStatistic, connectivity, colorMode, normalsMode, nbLayers, layerMargin, alphaEngine,
+                                                 voxelSize, pointBudget, lodRatios, workers, gridMode)
 
-    for i in range(cellsZmean.shape[0]):
-        for j in range(cellsZmean.shape[1]):
-            if(cellsZCount[i][j] > 0):
-                # Calculate the mean of height in one cell
-                cellsZmean[i][j] = cellsZmean[i][j]/cellsZCount[i][j]
-                # Same with colors
-                cellsColorMean[i][j] = cellsColorMean[i][j]/cellsZCount[i][j]
-                cellsNormalizedColorMean[i][j] = cellsNormalizedColorMean[i][j]/cellsZCount[i][j]
-
-    end = time.time()
-    log.info("Finished init of cellZMean in " + str(end - start) + " seconds") # time in seconds
-
-
-    start = time.time()
-    log.info("Starting process of vertices")
-
-    # This variable is used for the implementation of canopy reconstruction. It is no longer used so it has been commented out
-    #
-    # Creation of the obj file through a string
-    # objfile = "# Vegetation.obj \n# \n\n"
-
-    cellsVertexIndex = np.zeros((cellCountWidth, cellCountHeight), np.int32)
-
-    index = 1
-
-    # Warning : going through the tab by col and not by row 
-    for i in range(cellsZmean.shape[0]):
-        for j in range(cellsZmean.shape[1]):
-            if(cellsZmean[i][j] > 0.0):
-                xcoord = i * cellSize + xmin 
-                ycoord = j * cellSize + ymin
-                # objfile += "v " + str(xcoord) + " " + str(ycoord) + " " +  str(cellsZmean[i][j]) + "\n"
-                cellsVertexIndex[i][j] = index
-                index += 1
+    if cacheFolder:
+        # The meshes already in the output folder are kept, the manifest and the cache tell which ones are still valid
+        cache = MeshCache.openCache(cacheFolder, output_path, cellSize, meshOptions, cacheSize*1024*1024)
+    else:
+        cache = None
+        MeshUtilities.clearFolders(output_path)
+
+    if tileSize:
+        # The grid is built tile by tile instead of over the whole bounding box
+        pointCount, islandCount, droppedPoints = TiledMeshCreation.vegetationToMeshTiled(input_path, output_path, pipeline, tileSize, halo, chunkSize,
+                                                                                         meshFormat, cache)
+        return finishRun(output_path, cache, tileset, lodRatios, startProg,
+                         {"points": pointCount, "islands": islandCount, "dropped": droppedPoints}, voxelSize or pointBudget)
+
+    with Profiling.span("ingest"):
+        point_data, point_data_color = PointCloudUtilities.readVegetationPoints(input_path, chunkSize)
+
+        # If the color is coded on 16 bits, force it back to 8 bits
+        point_data_color = VegetationPipeline.eightBitColors(point_data_color)
+
+    # Separate islands of points and put the informations in different structures
+    # The grid starts at the minimum of the header, so that the cells are the ones of the tiled mode
+    split = VegetationPipeline.splitIslands(point_data, point_data_color, cellSize, zStatistic, connectivity, colorMode, pipeline["voxelWidth"],
+                                            pointBudget, gridMode, PointCloudUtilities.headerBounds(input_path)[0])
+    writeIslands(pipeline, split, output_path, meshFormat, cache)
+
+    return finishRun(output_path, cache, tileset, lodRatios, startProg,
+                     {"points": len(point_data), "islands": len(split["names"]), "dropped": int(split["dropped"].sum())}, voxelSize or pointBudget)
+
+
+def writeIslands(pipeline, islands, output_path, meshFormat="obj", cache=None):
+    """ Mesh islands (see VegetationPipeline.meshIslands) and save their meshes in the output folder, for both the untiled
+    and the tiled modes (see TiledMeshCreation.processTile)
+
+    With a cache, the islands whose meshes are already in the output folder or in the cache are taken from there
+    (see MeshCache.fetchIsland) and the meshes of the other ones are stored in it.
+
+    Parameters
+    ------
+    pipeline : dict
+      Settings of the meshing, see VegetationPipeline.createPipeline
+    islands : dict
+      The islands, see VegetationPipeline.splitIslands
+    output_path : str
+      Path of the output folder
+    meshFormat : str
+      Format of the output files, see MeshExport.MESH_FORMATS
+    cache : dict
+      Cache of the meshes (see MeshCache.openCache), None to mesh all the islands
+
+    Returns
+    -------
+    choices : list
+        Summary of the size of each island, the algorithm chosen and the errors that happened (see islandMeshes)
+    """
+    names = islands["names"]
+    offsets = islands["offsets"]
+    choices = [""] * len(names)
+
+    # Islands whose meshes are already in the output folder or in the cache are not meshed again
+    numbers = None
+    keys = {}
+    if cache is not None:
+        for k in range(len(names)):
+            key = MeshCache.islandKey(cache, islands["points"][offsets[k]:offsets[k+1]], islands["colors"][offsets[k]:offsets[k+1]], islands["sizes"][k])
+            choice = MeshCache.fetchIsland(cache, names[k], key)
+            if choice is None:
+                keys[k] = key
+            else:
+                choices[k] = choice
+        numbers = sorted(keys)
+
+    # Only the writing of the meshes is left here, so that the files hold the same meshes as the in-memory API
+    for k, island in VegetationPipeline.meshIslands(pipeline, islands, numbers):
+        writeIslandMeshes(island["meshes"], output_path, meshFormat)
+        choices[k] = island["choice"]
+        if cache is not None:
+            MeshCache.storeIsland(cache, names[k], keys[k], island["choice"])
+
+    for k in range(len(names)):
+        Profiling.recordIsland(names[k], offsets[k+1]-offsets[k], islands["sizes"][k], choices[k], islands["dropped"][k])
+
+    return choices
+
+
+def finishRun(output_path, cache, tileset, lodRatios, startProg, summary, downsampled):
+    """ End a run of vegetationToMesh : close the cache, write the tileset and the profile, and print the summary
+
+    Parameters
+    ------
+    output_path : str
+      Path of the output folder
+    cache : dict
+      Cache of the meshes (see MeshCache.openCache), None without cache
+    tileset : bool
+      Write the 3D Tiles tileset of the meshes (see TilesetExport.writeTileset)
+    lodRatios : list
+      Portion of the faces kept by each level of detail of the meshes
+    startProg : float
+      Time the run started at
+    summary : dict
+      Number of "points", "islands" and points "dropped" by the downsampling
+    downsampled : bool
+      The islands were downsampled
+
+    Returns
+    -------
+    summary : dict
+        The summary, with the "seconds" spent
+    """
+    if cache is not None:
+        MeshCache.closeCache(cache)
 
-    # objfile += "\n"
+    if tileset:
+        with Profiling.span("tileset"):
+            meshCount = TilesetExport.writeTileset(output_path, lodRatios)
+            log.info(str(meshCount) + " meshes in the tileset")
 
     end = time.time()
-    log.info("Finished process of vertices in " + str(end - start) + " seconds") # time in seconds
-
-
-    start = time.time()
-    log.info("Starting process of triangles")
-
-    cellsIsletIndex = np.zeros((cellCountWidth, cellCountHeight), np.int32)
-    index_islet = 1
-
-    # Currently, this part is only used to calculate the islet ids the parts used to calculate the canopy have been commented out
-    #
-    # Checking the current cell and the other three on a given corner (here curentx +1 and current y+1)
-    # If at least 3 of them have a height, draw a triangle using those cells' center as vertices
-    # If the four of them have a height, draw two triangles instead
-    for i in range(cellsZmean.shape[0]-1):
-        for j in range(cellsZmean.shape[1]-1):
-            if (cellsZmean[i][j] > 0 and cellsZmean[i+1][j] > 0 and cellsZmean[i+1][j+1] > 0 and cellsZmean[i][j+1] > 0):
-                # Double triangle
-                
-                # First triangle
-
-
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j]) + " "
-                # objfile += str(cellsVertexIndex[i][j+1]) + "\n"
-
-                # Second triangle
-
-
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j+1]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j+1]) + "\n"
-
-                # Indexing the islet number
-
-                # If the cell already has a tag, we spread it to the other cells
-                if(cellsIsletIndex[i][j] != 0):
-                    # If the cell we try to tag already has a tag we delete the other one
-                    # and replace it with the new one (on all the existing cells with that tag)
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
-
-
-                elif(cellsIsletIndex[i+1][j] != 0):
-
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
-                    
-                elif(cellsIsletIndex[i][j+1] != 0):
-                    
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
-
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
-                
-                elif(cellsIsletIndex[i+1][j+1] != 0):
-                    
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
-
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j+1]
-                
-                # Else, if none of the cells already have a tag we give them the next tag available in the list    
-                else :
-                    cellsIsletIndex[i][j] = index_islet
-                    cellsIsletIndex[i+1][j] = index_islet
-                    cellsIsletIndex[i][j+1] = index_islet
-                    cellsIsletIndex[i+1][j+1] = index_islet
-                    index_islet += 1
-
-            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) == 0):
-                # Main angle in the bottom right corner
-                
-
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j+1]) + "\n"
-
-                # Indexing the islet number
-
-                # If the cell already has a tag, we spread it to the other cells
-                if(cellsIsletIndex[i][j] != 0):
-
-                    # If the cell we try to tag already has a tag we delete the other one
-                    # and replace it with the new one (on all the existing cells with that tag)
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
-
-                elif(cellsIsletIndex[i+1][j] != 0):
-
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
-                    
-                elif(cellsIsletIndex[i+1][j+1] != 0):
-
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j+1]
+    log.info("Finished execution in " + str(end - startProg) + " seconds") # time in seconds
+    summary["seconds"] = end - startProg
 
-                # Else, if none of the cells already have a tag we give them the next tag available in the list    
-                else :
-                    cellsIsletIndex[i][j] = index_islet
-                    cellsIsletIndex[i+1][j] = index_islet
-                    cellsIsletIndex[i+1][j+1] = index_islet
-                    index_islet += 1
+    # The report replaces the summary of each island, for debuging purposes
+    Profiling.writeReport(output_path + Profiling.PROFILE_NAME, summary)
+    Profiling.stopProfile()
 
+    print('-------------')
+    if downsampled:
+        print(str(summary["dropped"]) + " of " + str(summary["points"]) + " points dropped by the downsampling")
+    print('Process finished !')
 
-                
-                
+    # Summary of the run (used by the batch mode)
+    return summary
+
+# Islands with at most MIN_POINTS points have no mesh. The other ones are meshed with a convex hull when they span
+# less than HULL_MAX_SIZE cells, an extruded 2D alpha shape when they span more than EXTRUDED_MIN_SIZE cells,
+# and a layered alpha shape in between
+MIN_POINTS = 8
+HULL_MAX_SIZE = 50
+EXTRUDED_MIN_SIZE = 10000
+
+# Maximum number of consecutive islands whose convex hulls are made together, see hullBatches
+HULL_BATCH_SIZE = 64
+
+
+def islandFileNames(index, meshFormat="obj", nbLayers=5, lodCount=0):
+    """ Names of all the files writeIslands can write for an island
+
+    Parameters
+    ------
+    index : str
+      Name of the island (see PointCloudUtilities.islandNames)
+    meshFormat : str
+      Format of the output files, see MeshExport.MESH_FORMATS
+    nbLayers : int
+      Number of layers of the layered alpha shapes
+    lodCount : int
+      Number of levels of detail written besides each full mesh (see MeshUtilities.writeMeshLods)
+
+    Returns
+    -------
+    names : list
+        Names of the files, in the output folder
+    """
+    names = ["hull_" + str(index) + "." + meshFormat,
+             "alpha_extruded_" + str(index) + "." + meshFormat,
+             "alpha_" + str(index) + "." + meshFormat]
+    for layer in range(1, nbLayers+1):
+        names.append("alpha_" + str(index) + "_" + str(layer) + "." + meshFormat)
+    return [MeshExport.lodPath(name, level) for name in names for level in range(lodCount+1)]
+
+
+def isLayeredIsland(islandPoints, islandSize):
+    """ Tell whether an island is meshed with a layered alpha shape (see islandMeshes)
+
+    Parameters
+    ------
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island
+    islandSize : int
+      Number of cells the island is spanning
+
+    Returns
+    -------
+    layered : bool
+        True if the island is meshed with a layered alpha shape
+    """
+    return len(islandPoints) > MIN_POINTS and HULL_MAX_SIZE <= islandSize <= EXTRUDED_MIN_SIZE
 
-            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) == 0 and (cellsZmean[i][j+1]) > 0):
-                # Main angle in the bottom left corner
-                
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j]) + " "
-                # objfile += str(cellsVertexIndex[i][j+1]) + "\n" 
-
-                # Indexing the islet number
-
-                # If the cell already has a tag, we spread it to the other cells
-                if(cellsIsletIndex[i][j] != 0):
-
-                    # If the cell we try to tag already has a tag we delete the other one
-                    # and replace it with the new one (on all the existing cells with that tag)
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
-
-                elif(cellsIsletIndex[i+1][j] != 0):
-                    
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
-                    
-                elif(cellsIsletIndex[i][j+1] != 0):
-
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
-
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
-
-
-                    cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
-                    cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
-
-                # Else, if none of the cells already have a tag we give them the next tag available in the list    
-                else :
-                    cellsIsletIndex[i][j] = index_islet
-                    cellsIsletIndex[i+1][j] = index_islet
-                    cellsIsletIndex[i][j+1] = index_islet
-                    index_islet += 1
 
+def isHullIsland(islandPoints, islandSize):
+    """ Tell whether an island is meshed with a convex hull (see islandMeshes)
 
-                
+    Parameters
+    ------
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island
+    islandSize : int
+      Number of cells the island is spanning
 
-            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) == 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) > 0):
-                # Main angle in the top left corner
+    Returns
+    -------
+    hull : bool
+        True if the island is meshed with a convex hull
+    """
+    return len(islandPoints) > MIN_POINTS and islandSize < HULL_MAX_SIZE
 
 
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j+1]) + " "
-                # objfile += str(cellsVertexIndex[i][j+1]) + "\n"
+def hullBatches(islands, batchSize=HULL_BATCH_SIZE):
+    """ Group islands meshed with a convex hull into batches of consecutive islands, meshed together by hullIslandsMeshes
+    (in a single task of the pool of processes)
 
-                # Indexing the islet number
+    Parameters
+    ------
+    islands : list
+      Numbers of the islands, in increasing order
+    batchSize : int
+      Maximum number of islands of a batch
 
-                # If the cell already has a tag, we spread it to the other cells
-                if(cellsIsletIndex[i][j] != 0):
+    Returns
+    -------
+    batches : list
+        The first and the last (excluded) number of the islands of each batch
+    """
+    batches = []
+    for k in islands:
+        if len(batches) > 0 and batches[-1][1] == k and k - batches[-1][0] < batchSize:
+            batches[-1][1] = k + 1
+        else:
+            batches.append([k, k + 1])
+    return [tuple(batch) for batch in batches]
+
+
+def layerBounds(islandPoints, nbLayers=5, layerMargin=1/3):
+    """ Divide an island in layers based on the z axis
+
+    The island is cut in nbLayers layers of the same height. Each layer also takes a portion (layerMargin)
+    of the layer above it to smooth the transition between the meshes.
+
+    Parameters
+    ------
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island, sorted by increasing z
+    nbLayers : int
+      Number of layers
+    layerMargin : float
+      Portion of the height of a layer added on top of each layer
+
+    Returns
+    -------
+    layers : list
+        (layer, start, end) for each layer having enough points to be meshed (at least 6),
+        the points of the layer being islandPoints[start:end]. The layers are numbered from 1
+    """
+    z = islandPoints[:,2]
+    zmin = z[0]
+    zmax = z[-1]
+
+    layerHeight = (zmax-zmin)/nbLayers
+    margin = layerHeight*layerMargin
+
+    layers = []
+    for layer in range(1, nbLayers+1):
+        # Compute the bounding heights, both excluded
+        thresholdmax = zmin + (layerHeight*layer)
+        thresholdmin = zmin + (layerHeight*(layer-1))
+        start = np.searchsorted(z, thresholdmin, side='right')
+        end = np.searchsorted(z, thresholdmax + margin, side='left')
+
+        # Not enough points in the layer
+        if end - start < 6:
+            continue
+
+        layers.append((layer, start, end))
+
+    return layers
+
+
+def writeIslandMeshes(meshes, output_path, meshFormat="obj", lodRatios=None):
+    """ Save the meshes of an island, each one in a file named after it
+
+    Parameters
+    ------
+    meshes : list
+      The meshes, see islandMeshes
+    output_path : str
+      Path of the output folder
+    meshFormat : str
+      Format of the output files, see MeshExport.MESH_FORMATS
+    lodRatios : list
+      Portion of the faces kept by each level of detail of the meshes, see MeshUtilities.writeMeshLods.
+      Not used by the meshes having their "lods" already (see VegetationPipeline.lodMesh)
+    """
+    for mesh in meshes:
+        MeshUtilities.writeMeshLods(output_path + mesh["name"] + "." + meshFormat, mesh["vertices"], mesh["colors"], mesh["faces"], lodRatios,
+                                    mesh.get("lods"))
 
-                    # If the cell we try to tag already has a tag we delete the other one
-                    # and replace it with the new one (on all the existing cells with that tag)
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
 
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
+def namedMesh(name, mesh):
+    """ Mesh of an island, see islandMeshes
 
-                elif(cellsIsletIndex[i][j+1] != 0):
+    Parameters
+    ------
+    name : str
+      Name of the mesh
+    mesh : tuple
+      The vertices, colors and faces of the mesh
 
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
+    Returns
+    -------
+    mesh : dict
+        The "name", "vertices", "colors" and "faces" of the mesh
+    """
+    vertices, colors, faces = mesh
+    return {"name": name, "vertices": np.asarray(vertices), "colors": np.asarray(colors), "faces": np.asarray(faces)}
+
+
+def hullIslandsMeshes(indexes, islandsPoints, islandsColors, islandsSize):
+    """ Create the convex hulls of islands meshed with a convex hull (see isHullIsland) together,
+    the same meshes as islandMeshes makes for each of them
+
+    Parameters
+    ------
+    indexes : list
+      Name of each island (see PointCloudUtilities.islandNames)
+    islandsPoints : list
+      The x, y and z coordinates of the points of each island
+    islandsColors : list
+      The r, g and b values of the points of each island (between 0 and 1)
+    islandsSize : list
+      Number of cells each island is spanning
+
+    Returns
+    -------
+    results : list
+        The meshes and the choice of each island, see islandMeshes
+    """
+    results = []
+    for index, islandSize, mesh in zip(indexes, islandsSize, MeshUtilities.convexHullMeshes(islandsPoints, islandsColors)):
+        if isinstance(mesh, Exception):
+            # Sometimes, error happens due to the shape of the point cloud
+            log.info("[Warning] : error when creating the convex hull, aborting")
+            log.info(mesh)
+            results.append(([], str(islandSize) + " convex hull ERROR\n"))
+        else:
+            results.append(([namedMesh("hull_" + str(index), mesh)], str(islandSize) + " convex hull\n"))
+    return results
+
+
+def islandMeshes(index, islandPoints, islandColors, islandSize, normalsMode="centroid", nbLayers=5, layerMargin=1/3, alphaEngine="library"):
+    """ Create the mesh(es) of an island
+
+    The algorithm depends on the size of the island (convex hull, layered alpha shape or extruded 2D alpha shape).
+    When an algorithm fails, the next one of the chain is tried : layered alpha shape, alpha shape then convex hull
+    (extruded 2D alpha shape then convex hull for the large islands).
+
+    Parameters
+    ------
+    index : str
+      Name of the island (see PointCloudUtilities.islandNames), used in the name of the meshes
+    islandPoints : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    islandColors : 2d-array
+      In column, index of the point (same order as the points).
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    islandSize : int
+      Number of cells the island is spanning
+    normalsMode : str
+      How the faces of the alpha shapes are oriented, see MeshUtilities.NORMALS_MODES
+    nbLayers : int
+      Number of layers of the layered alpha shapes
+    layerMargin : float
+      Portion of the height of a layer added on top of each layer, see layerBounds
+    alphaEngine : str
+      Implementation of the alpha shapes, see MeshUtilities.ALPHA_ENGINES
+
+    Returns
+    -------
+    meshes : list
+        The meshes (see namedMesh), named like their file without the extension (see islandFileNames)
+    choice : str
+        Summary of the size of the island, the algorithm chosen and the errors that happened (for debuging purposes)
+    """
+    meshes = []
+    choice = ""
 
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
+    # If the island is too small, don't create a mesh for it
+    if(len(islandPoints) > MIN_POINTS):
+        # If the island has an area of less than 50 cells, the mesh will be a convex hull, else it'll be an alpha shape 
+        if(islandSize < HULL_MAX_SIZE):
+            try:
+                log.info("convex hull")
+
+                meshes.append(namedMesh("hull_" + str(index), MeshUtilities.convexHullMesh(islandPoints, islandColors)))
+
+                choice += str(islandSize) + " convex hull\n"
+
+            except Exception as exce:
+                # Sometimes, error happens due to the shape of the point cloud
+                # we use the alpha shape algorithm instead
+                log.info("[Warning] : error when creating the convex hull, aborting")
+                log.info(exce)
+                choice += str(islandSize) + " convex hull ERROR\n"
+        # If the island is too big, create an extruded 2D alpha shape
+        elif(islandSize > EXTRUDED_MIN_SIZE):
+            # Alpha parameter
+            alpha = MeshUtilities.computeAlpha(islandPoints)
+
+            try:
+                meshes.append(namedMesh("alpha_extruded_" + str(index), MeshUtilities.extruded2DAlphaShapeMesh(islandPoints, islandColors, alpha, alphaEngine)))
+
+                choice += str(islandSize) + " extruded alpha shape\n"
+            except Exception as exce:
+                # e.g. the outline of the alpha shape can't be triangulated, a convex hull is created instead
+                log.info("[Warning] : error when creating the extruded alphashape, aborting")
+                log.info(exce)
+                try:
+                    meshes.append(namedMesh("hull_" + str(index), MeshUtilities.convexHullMesh(islandPoints, islandColors)))
+
+                    choice += str(islandSize) + " extruded alpha shape ERROR convex hull OK\n"
+                except Exception:
+                    choice += str(islandSize) + " extruded alpha shape ERROR convex hull ERROR\n"
+        # If it's not too big or too small, try doing a layered alpha shape
+        else:
+            # The same alpha is used for all the layers of the island
+            alpha = MeshUtilities.computeAlpha(islandPoints)
+
+            # Geometry of the island shared by the strategies of the fallback chain
+            geometry = MeshUtilities.islandGeometry(islandPoints)
+
+            # The layers are slices of the island sorted by height
+            if not MeshUtilities.geometryZStatistics(geometry)["sorted"]:
+                zOrder = np.argsort(islandPoints[:,2], kind='stable')
+                islandPoints = islandPoints[zOrder]
+                islandColors = islandColors[zOrder]
+                geometry = MeshUtilities.islandGeometry(islandPoints)
+
+            try:
+                for layer, start, end in layerBounds(islandPoints, nbLayers, layerMargin):
+                    meshes.append(layerMesh(index, islandPoints[start:end], islandColors[start:end], layer, alpha, normalsMode, alphaEngine))
                 
-                elif(cellsIsletIndex[i+1][j+1] != 0):
+                choice += str(islandSize) + " sliced alpha shape\n"
+            except Exception as exce:
+                # Sometimes, error happens due to the shape of the point cloud (needs to be confirmed)
+                log.info("[Warning] : error when creating the layered alphashape, aborting")
+                log.info(exce)
+                meshes, fallbackChoice = islandFallbackMeshes(index, islandPoints, islandColors, islandSize, alpha, normalsMode, alphaEngine, geometry)
+                choice += fallbackChoice
+
+    return meshes, choice
+
+
+def layerMesh(index, layerPoints, layerColors, layer, alpha, normalsMode="centroid", alphaEngine="library"):
+    """ Create the alpha shape of a layer of an island
+
+    Parameters
+    ------
+    index : str
+      Name of the island (see PointCloudUtilities.islandNames), used in the name of the mesh
+    layerPoints : 2d-array
+      The x, y and z coordinates of the points of the layer
+    layerColors : 2d-array
+      The r, g and b values of the points of the layer (between 0 and 1)
+    layer : int
+      Number of the layer, used in the name of the mesh
+    alpha : float
+      Alpha parameter of the island, see MeshUtilities.computeAlpha
+    normalsMode : str
+      How the faces of the alpha shape are oriented, see MeshUtilities.NORMALS_MODES
+    alphaEngine : str
+      Implementation of the alpha shape, see MeshUtilities.ALPHA_ENGINES
+
+    Returns
+    -------
+    mesh : dict
+        See namedMesh
+    """
+    return namedMesh("alpha_" + str(index) + "_" + str(layer), MeshUtilities.alphaShapeMesh(layerPoints, alpha, layerColors, normalsMode, alphaEngine))
+
+
+def islandFallbackMeshes(index, islandPoints, islandColors, islandSize, alpha, normalsMode="centroid", alphaEngine="library", geometry=None):
+    """ Mesh an island whose layered alpha shape failed : alpha shape of the whole island, then convex hull
+
+    Both strategies share the geometry of the island : the convex hull is the boundary of the tetrahedralization
+    computed for the alpha shape.
+
+    Parameters
+    ------
+    index : str
+      Name of the island (see PointCloudUtilities.islandNames), used in the name of the meshes
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island
+    islandColors : 2d-array
+      The r, g and b values of the points of the island (between 0 and 1)
+    islandSize : int
+      Number of cells the island is spanning
+    alpha : float
+      Alpha parameter of the island, see MeshUtilities.computeAlpha
+    normalsMode : str
+      How the faces of the alpha shape are oriented, see MeshUtilities.NORMALS_MODES
+    alphaEngine : str
+      Implementation of the alpha shape, see MeshUtilities.ALPHA_ENGINES
+    geometry : dict
+      Geometric context of the island (see MeshUtilities.islandGeometry), None to create it
+
+    Returns
+    -------
+    meshes : list
+        See islandMeshes
+    choice : str
+        See islandMeshes
+    """
+    if geometry is None:
+        geometry = MeshUtilities.islandGeometry(islandPoints)
 
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
+    try:
+        # Simple alpha shape
+        mesh = MeshUtilities.alphaShapeMesh(islandPoints, alpha, islandColors, normalsMode, alphaEngine, geometry)
 
-                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j+1]
+        return [namedMesh("alpha_" + str(index), mesh)], str(islandSize) + " sliced alpha shape ERROR alpha shape OK\n"
+    except Exception as exce:
+        try:
+            log.info("[Warning] : error when creating the alphashape, aborting")
+            log.info(exce)
+            # If even the simple alpha shape failed, try creating a convex hull
 
-                # Else, if none of the cells already have a tag we give them the next tag available in the list
-                else :
-                    cellsIsletIndex[i][j] = index_islet
-                    cellsIsletIndex[i][j+1] = index_islet
-                    cellsIsletIndex[i+1][j+1] = index_islet
-                    index_islet += 1
+            mesh = MeshUtilities.convexHullMesh(islandPoints, islandColors, geometry)
 
-                
-            elif ((cellsZmean[i][j]) == 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) > 0):
-                # Main angle in the top right corner
-                
+            return [namedMesh("hull_" + str(index), mesh)], str(islandSize) + " sliced alpha shape ERROR alpha shape ERROR convex hull OK\n"
 
-                # objfile += "f "
-                # objfile += str(cellsVertexIndex[i][j+1]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j]) + " "
-                # objfile += str(cellsVertexIndex[i+1][j+1]) + "\n"
-
-                # Indexing the islet number
-
-                # If the cell already has a tag, we spread it to the other cells
-                if(cellsIsletIndex[i+1][j] != 0):
-
-                    # If the cell we try to tag already has a tag we delete the other one
-                    # and replace it with the new one (on all the existing cells with that tag)
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
-                    
-                elif(cellsIsletIndex[i][j+1] != 0):
-
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
-
-                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
-                
-                elif(cellsIsletIndex[i+1][j+1] != 0):
-
-                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
-
-                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
-                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
-                    else:
-                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
-
-
-                    cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
-                    cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
-            
-            # Else, if none of the cells already have a tag we give them the next tag available in the list
-                else :
-                    cellsIsletIndex[i+1][j] = index_islet
-                    cellsIsletIndex[i][j+1] = index_islet
-                    cellsIsletIndex[i+1][j+1] = index_islet
-                    index_islet += 1
-            
+        except Exception:
+            return [], str(islandSize) + " sliced alpha shape ERROR alpha shape ERROR convex hull ERROR\n"
 
-    end = time.time()
-    log.info("Finished process of triangles in " + str(end - start) + " seconds") # time in seconds
-
-    start = time.time()
-    log.info("Starting separating islets")
-
-    # Separate islands of points based on the island id calculated above
-    # and put the informations in different structures
-
-    # Dict containing in keys the id of the island and in values the list of points of the island (x, y, z) 
-    islands = {}
-    # Used a bit bellow, contains in keys the island's id and in value its size (based on the cellsize)
-    islands_size = {}
-    # Dict containing the color associated with the point
-    # The key is obtained by passing the coordinates to the 'pointToColor' function
-    # The value is the RGB value of the point, ranging from 0 to 255
-    islands_color = {}
-    # Dict containing the normalized color associated with the point
-    # The key is obtained by passing the coordinates to the 'pointToColor' function
-    # The value is the RGB value of the point, ranging from 0 to 1
-    islands_color_normalized = {}
-
-    for i in range(indexes.shape[0]):
-        # Translate the point index to grind index
-        xi = indexes[i,0]+1
-        yi = indexes[i,1]+1
-
-        # If the 
-        if cellsIsletIndex[xi][yi] != 0:
-            
-            if cellsIsletIndex[xi][yi] not in islands:
-                islands[cellsIsletIndex[xi][yi]] = []
-    
-            islands[cellsIsletIndex[xi][yi]].append(point_data[i])
-            
-            # Each point has the mean of colors inside a cell
-            islands_color[MeshUtilities.pointToColor(point_data[i])] = cellsColorMean[xi][yi]
-            islands_color_normalized[MeshUtilities.pointToColor(point_data[i])] = cellsNormalizedColorMean[xi][yi]
-
-            # OR
-
-            # Each point has the color information provided with the LIDAR
-            # islands_color[MeshUtilities.pointToColor(point_data[i])] = point_data_color[i]
-            # islands_color_normalized[MeshUtilities.pointToColor(point_data[i])] = point_data_color_normalized[i]
-            
 
+def shareArray(array):
+    """ Copy an array into a new block of shared memory, so that worker processes can read it without pickling it
 
-    end = time.time()
-    log.info("Finished separating islets in " + str(end - start) + " seconds") # time in seconds
-
-    startoutput = time.time()
-    log.info("Starting output of islets convex hull/alpha shapes")
+    Parameters
+    ------
+    array : array
+      The float64 array to share
 
-    # For debuging purposes
-    choice = ""
+    Returns
+    -------
+    sharedMemory : SharedMemory
+        The block of shared memory, to close and unlink once the workers are done
+    """
+    sharedMemory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, np.float64, buffer=sharedMemory.buf)[:] = array
+    return sharedMemory
 
-    for index in islands:
 
-        condition = cellsIsletIndex == index
-        # Count the number of cells the island is spanning 
-        islands_size[index] = np.count_nonzero(condition)
-        
-        # If the island is too small, don't create a mesh for it
-        if(len(islands[index]) > 8):
-            # If the island has an area of less than 50 cells, the mesh will be a convex hull, else it'll be an alpha shape 
-            if(islands_size[index] < 50):
-                try:
-                    log.info("convex hull")
-                    
-                    path = output_path+"hull_"+ str(index) +".obj"
-
-                    MeshUtilities.createConvexHull(islands[index], islands_color_normalized, path)
-
-                    choice += str(islands_size[index]) + " convex hull\n"
-
-                except Exception as exce:
-                    # Sometimes, error happens due to the shape of the point cloud
-                    # we use the alpha shape algorithm instead
-                    log.info("[Warning] : error when creating the convex hull, aborting")
-                    log.info(exce)
-                    choice += str(islands_size[index]) + " convex hull ERROR\n"
-            # If the island is too big, create an extruded 2D alpha shape
-            elif(islands_size[index] > 10000):
-                # Alpha parameter
-                alpha = MeshUtilities.computeAlpha(islands[index])
-                
-                path = output_path+"alpha_extruded_"+ str(index) + ".obj"
-                        
-                MeshUtilities.createExtruded2DAlphaShape(islands[index], islands_color_normalized, alpha, path)
-            # If it's not too big or too small, try doing a layered alpha shape
-            else:
-                try:
+def attachSharedArray(name):
+    """ Open, inside a worker process, a block of shared memory created by the main process (see shareArray)
 
-                    # Divide the island in layers based on the z axis
-                    foo, foo, zmax = np.max(islands[index], axis=0)
-                    foo, foo, zmin = np.min(islands[index], axis=0)
-                    
-                    # number of slices we want from our island
-                    nbLayers = 5
-                    # We take a portion of the upper slice to smooth the transition between the meshes
-                    margin = ((zmax-zmin)/nbLayers)/3
-
-                    for layer in range(1,(nbLayers+1)):
-                        # Compute the bounding heights 
-                        thresholdmax = zmin + (((zmax-zmin)/nbLayers)*layer)
-                        thresholdmin = zmin + (((zmax-zmin)/(nbLayers))*(layer-1))
-                        layerPoints = []
-                        for point in islands[index]:
-                            if(point[2] > thresholdmin and point[2] < thresholdmax + margin):
-                                layerPoints.append(point)
-
-                        # Not enough points in the layer
-                        if len(layerPoints) < 6:
-                            continue
-                        
-                        alpha = MeshUtilities.computeAlpha(islands[index])
-
-                        path = output_path+"alpha_"+ str(index) + "_" + str(layer) + ".obj"
-                        
-                        MeshUtilities.createAlphashape(layerPoints, alpha, islands_color, path)
-                    
-                    choice += str(islands_size[index]) + " sliced alpha shape\n"
-                except Exception as exce:
-                    # Sometimes, error happens due to the shape of the point cloud (needs to be confirmed)
-                    log.info("[Warning] : error when creating the layered alphashape, aborting")
-                    log.info(exce)
-                    try:
-                        # Simple alpha shape
-
-                        alpha = MeshUtilities.computeAlpha(islands[index])
-                        path = output_path+"alpha_"+ str(index) + ".obj"
-
-                        MeshUtilities.createAlphashape(islands[index], alpha, islands_color, path)
-
-                        choice += str(islands_size[index]) + " sliced alpha shape ERROR alpha shape OK\n"
-                    except Exception as exce:
-                        try:
-                            log.info("[Warning] : error when creating the alphashape, aborting")
-                            log.info(exce)
-                            # If even the simple alpha shape failed, try creating a convex hull
-
-                            path = output_path+"hull_"+ str(index) +".obj"
-
-                            MeshUtilities.createConvexHull(islands[index], islands_color_normalized, path)
-
-                            choice += str(islands_size[index]) + " sliced alpha shape ERROR alpha shape ERROR convex hull OK\n"
-
-                        except Exception:
-                            return
-                        choice += str(islands_size[index]) + " sliced alpha shape ERROR alpha shape ERROR convex hull ERROR\n"
-
-            
+    The block isn't registered in the resource tracker : the main process owns it and unlinks it. Before Python 3.13,
+    opening a block always registers it, and unregistering it afterwards would remove the registration of the main process
+    from the tracker it shares with the workers of the pool.
 
+    Parameters
+    ------
+    name : str
+      Name of the block of shared memory
 
-    end = time.time()
-    log.info("Finished output of islets convex hull/alpha shapes in " + str(end - startoutput) + " seconds") # time in seconds
-
-    start = time.time()
-    log.info("Starting writing of output file")
-    
-    # For debug
-    #
-    # Summary of the size of the island, the script's algorithm choice and if there was an error
+    Returns
+    -------
+    sharedMemory : SharedMemory
+        The block, to close once read
     """
-    with open('choice.txt', 'w') as f:
-        for line in choice:
-            f.write(line)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def readSharedArray(name, pointCount, start, end):
+    """ Copy, inside a worker process, lines of the (pointCount, 3) array stored in a block of shared memory
+
+    Parameters
+    ------
+    name : str
+      Name of the block of shared memory
+    pointCount : int
+      Number of lines of the array
+    start, end : int
+      First and last (excluded) lines to copy
+
+    Returns
+    -------
+    array : 2d-array
+        Copy of the lines, the block being closed
     """
-            
-    # Export for the canopy algorithm
-    #
-    # Write all the lines in the obj file
+    sharedMemory = attachSharedArray(name)
+    try:
+        return np.ndarray((pointCount, 3), np.float64, buffer=sharedMemory.buf)[start:end].copy()
+    finally:
+        sharedMemory.close()
+
+
+def initMeshingWorker(level, profile=False):
+    """ Set up the logging and the profiling of a worker process (needed when the workers are spawned and not forked)
+
+    Parameters
+    ------
+    level : int
+      Logging level of the main process
+    profile : bool
+      The run is profiled, the records of each task are sent back with its result (see Profiling.takeRecords)
     """
-    with open('output.obj', 'w') as f:
-        for line in objfile:
-            f.write(line)
+    logging.basicConfig(level=level, format='')
+    log.setLevel(level)
+    if profile:
+        Profiling.startProfile()
+
+
+def meshTask(task):
+    """ Run a meshing function of VegetationPipeline.pooledIslands inside a worker process
+
+    Parameters
+    ------
+    task : tuple
+      The function, names of the shared points and colors, total number of points, start and end of the points to mesh
+      in the shared arrays, name of the island, then the positional (tuple) and keyword (dict) arguments of the function
+      following the points and colors. The name is None for the batches of VegetationPipeline.hullIslandsTask, which take no name
+      and count the work of their islands themselves
+
+    Returns
+    -------
+    result
+        What the function returns
+    records : dict
+        What was recorded during the task when the run is profiled (see Profiling.mergeResults)
     """
+    function, pointsName, colorsName, pointCount, start, end, index, args, kwargs = task
+    points = readSharedArray(pointsName, pointCount, start, end)
+    colors = readSharedArray(colorsName, pointCount, start, end)
+    if index is None:
+        return function(points, colors, *args, **kwargs), Profiling.takeRecords()
+    with Profiling.islandWork(index):
+        result = function(index, points, colors, *args, **kwargs)
+    return result, Profiling.takeRecords()
 
-    end = time.time()
-    log.info("Finished writing of output file in " + str(end - start) + " seconds") # time in seconds
-    log.info("Finished execution in " + str(end - startProg) + " seconds") # time in seconds
-    print('-------------')
-    print('Process finished !')
 
 """
 if __name__ == "__main__":
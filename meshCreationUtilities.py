@@ -1,32 +1,20 @@
 from os import listdir, remove, mkdir
 from os.path import isfile, join
 from alphashape import alphashape
+from shapely.geometry.polygon import orient
 
 import numpy as np
 import open3d as o3d
-import time
 import math
 import scipy
+import scipy.spatial
 import trimesh
 import triangulate
+import meshExport
 import meshCreation
+import profiling as Profiling
 
 
-def pointToColor(point):
-    """ Returns a string that can be used as a key based on a point's coordinates (for example the color dict)
-    
-    Parameters
-    ------
-    point : array
-      Array that contains the x, y and z coordinates of the point
-
-    Returns
-    -------
-    index : str
-        String that can be used as a key
-    """
-    return str(point[0])+str(point[1])+str(point[2])
-
 def clearFolders(path):
     """ Clear all of the existing files inside a folder
     
@@ -43,74 +31,145 @@ def clearFolders(path):
         mkdir(path)
     
 
-    
-def exportHullInOBJ(vertices, colors, triangles, outputpath):
-    """ Create an obj file using vertices, colors and triangles provided
-    
+def convexHullMesh(pointCloud, colors_normalized, geometry=None):
+    """ Create a convex hull mesh based on a provided point cloud
+
     Parameters
     ------
+    pointCloud : 2d-array
+        In column, index of the point.  
+        In line, array that contains the x, y and z coordinates of the point.
+    colors_normalized : 2d-array
+        In column, index of the point (same order as the point cloud).  
+        In line, array that contains the r, g and b values of the point (between 0 and 1).
+    geometry : dict
+        Geometric context of the point cloud (see islandGeometry), reusing the hull or the tetrahedralization
+        already computed by another strategy. None to compute the hull with Open3D
+
+    Returns
+    -------
     vertices : 2d-array
-      In column, index of the point.  
-      In line, array that contains the x, y and z coordinates of the point.
+        The x, y and z coordinates of each vertex
     colors : 2d-array
-      In column, index of the point.  
-      In line, array that contains the r, g and b values of the point.
-    triangles : 2d-array
-      In column, index of the triangle.  
-      In line, array that contains the indexes of points making the triangle.
-    path : str
-        Path to save the obj file
+        The r, g and b values of each vertex (between 0 and 1)
+    faces : 2d-array
+        The indexes of the vertices making each triangle
+    """
+    if geometry is not None:
+        with Profiling.span("creation of convex hull"):
+            vertexIndexes, faces = geometryConvexHull(geometry)
+        return pointCloud[vertexIndexes], colors_normalized[vertexIndexes], faces
+
+    with Profiling.span("creation of convex hull"):
+        return open3dConvexHull(pointCloud, colors_normalized)
+
+
+def convexHullMeshes(pointClouds, colors_normalized):
+    """ Create the convex hull meshes of a batch of point clouds (usually small islands), under a single span
 
+    Parameters
+    ------
+    pointClouds : list
+        The x, y and z coordinates of the points of each point cloud
+    colors_normalized : list
+        The r, g and b values (between 0 and 1) of the points of each point cloud
+
+    Returns
+    -------
+    meshes : list
+        For each point cloud, its vertices, colors and faces (see convexHullMesh), or the error raised by the hull
     """
+    meshes = []
+    with Profiling.span("creation of convex hull"):
+        for pointCloud, colors in zip(pointClouds, colors_normalized):
+            try:
+                meshes.append(open3dConvexHull(pointCloud, colors))
+            except Exception as exce:
+                meshes.append(exce)
+    return meshes
+
+
+def open3dConvexHull(pointCloud, colors_normalized):
+    """ Convex hull of a point cloud computed by Open3D (qhull), see convexHullMesh """
+    geom = o3d.geometry.PointCloud()
+    geom.points = o3d.utility.Vector3dVector(pointCloud)
+    hull, pointIndexes = geom.compute_convex_hull()
+
+    # Reconnecting the color to the vertices : the hull gives the index of the input point of each vertex
+    return np.asarray(hull.vertices), colors_normalized[np.asarray(pointIndexes)].astype(np.float64), np.asarray(hull.triangles)
+
+
+def writeMeshLods(path, vertices, colors, faces, lodRatios=None, lods=None):
+    """ Save a mesh and its levels of detail, see meshLods (and MeshExport.lodPath for their names)
 
-    obj = ""
-    
-    # Vertex coordinates + color
-    for i in range(len(vertices)):
-        # Formating to always have 8 digits in the decimals
-        obj += "v " + "{:.8f}".format(vertices[i][0]) + " " + "{:.8f}".format(vertices[i][1]) + " " + "{:.8f}".format(vertices[i][2]) + " "
-        obj += "{:.8f}".format(colors[i][0]) + " " + "{:.8f}".format(colors[i][0]) + " " + "{:.8f}".format(colors[i][0]) + "\n"
-
-    # Triangles
-    for face in triangles:
-        # Careful : the index start at 0 in the input but must start at 1 in the output
-        obj += "f " + str(face[0]+1) + " " + str(face[1]+1) + " " + str(face[2]+1) + "\n"
-
-    # Output
-    with open(outputpath, 'w') as f:
-        for line in obj:
-            f.write(line)
-
-def createConvexHull(pointCloud, colors_normalized, path):
-    """ Create a convex hull mesh based on a provided point cloud and save it as an obj file
-    
     Parameters
     ------
-    pointCloud : 2d-array
-        In column, index of the point.  
-        In line, array that contains the x, y and z coordinates of the point.
-    colors_normalized : 2d-array
-        In column, index of the point.  
-        In line, array that contains the r, g and b values of the point (between 0 and 1).
     path : str
-        Path to save the obj file
+        Path to save the full mesh file (obj, ply or glb, depending on its extension)
+    vertices : 2d-array
+        The x, y and z coordinates of each vertex
+    colors : 2d-array
+        The r, g and b values of each vertex (between 0 and 1)
+    faces : 2d-array
+        The indexes of the vertices making each triangle
+    lodRatios : list
+        Portion of the faces of the full mesh kept by each level of detail (between 0 and 1, decreasing)
+    lods : list
+        The levels of detail when they are already made (see meshLods), None to make them from lodRatios
+    """
+    # A mesh without triangles has no file (it would be an invalid glb), nor its levels of detail
+    if len(faces) == 0:
+        return
+
+    meshExport.writeMesh(path, vertices, colors, faces)
+    Profiling.recordMesh(len(vertices), len(faces))
+
+    if lods is None:
+        lods = meshLods(vertices, colors, faces, lodRatios)
+    for level, lod in enumerate(lods, 1):
+        # The coarser levels are decimated from this one, they have no triangles either
+        if len(lod[2]) == 0:
+            break
+        meshExport.writeMesh(meshExport.lodPath(path, level), *lod)
+
 
+def meshLods(vertices, colors, faces, lodRatios=None):
+    """ Levels of detail of a mesh, made by quadric decimation
+
+    Each level is decimated from the previous one, which is cheaper than decimating the full mesh each time.
+
+    Parameters
+    ------
+    vertices : 2d-array
+        The x, y and z coordinates of each vertex
+    colors : 2d-array
+        The r, g and b values of each vertex (between 0 and 1)
+    faces : 2d-array
+        The indexes of the vertices making each triangle
+    lodRatios : list
+        Portion of the faces of the full mesh kept by each level of detail (between 0 and 1, decreasing)
+
+    Returns
+    -------
+    lods : list
+        The vertices, colors and faces of each level of detail
     """
-    # Creating the hull
-    geom = o3d.geometry.PointCloud()
+    if not lodRatios:
+        return []
 
-    geom.points = o3d.utility.Vector3dVector(pointCloud)
-    hull, _ = geom.compute_convex_hull()
-    
-    # Reconnecting the color to the vertices
-    pointColors = []
-    for vertice in np.asarray(hull.vertices):
-        pointColors.append(colors_normalized[pointToColor(vertice)])
-    hull.vertex_colors = o3d.utility.Vector3dVector(pointColors)
+    lods = []
+    with Profiling.span("levels of detail"):
+        # Decimated around the origin to keep the precision with large coordinates
+        origin = meshExport.localOrigin(vertices)
+        mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(np.asarray(vertices, np.float64) - origin),
+                                         o3d.utility.Vector3iVector(np.asarray(faces, np.int32).reshape(-1, 3)))
+        mesh.vertex_colors = o3d.utility.Vector3dVector(np.asarray(colors, np.float64))
 
-    #o3d.visualization.draw_geometries([hull])
-    
-    exportHullInOBJ(hull.vertices, hull.vertex_colors, hull.triangles, path)
+        for ratio in lodRatios:
+            mesh = mesh.simplify_quadric_decimation(max(4, int(len(faces)*ratio)))
+            mesh.remove_unreferenced_vertices()
+            lods.append((np.asarray(mesh.vertices) + origin, np.asarray(mesh.vertex_colors), np.asarray(mesh.triangles)))
+    return lods
 
 
 def computeAlpha(pointCloud):
@@ -139,8 +198,277 @@ def computeAlpha(pointCloud):
 
     return alpha
 
-def createExtruded2DAlphaShape(pointCloud, colors, alpha, path):
-    """Create an extruded 2D alpha shape mesh based on a provided point cloud and alpha parameter and save it as an obj file 
+# Implementations of the alpha shape
+# "native" : alphaComplex, computed with array operations on the Delaunay triangulation
+# "library" : the alphashape package
+ALPHA_ENGINES = ["native", "library"]
+
+
+def circumradii(simplexPoints):
+    """ Compute the circumradius of triangles (in 2D) or tetrahedra (in 3D) in batch
+
+    Parameters
+    ------
+    simplexPoints : 3d-array
+        In first dimension, index of the simplex.
+        In second dimension, the 3 (in 2D) or 4 (in 3D) points of the simplex.
+        In last dimension, the coordinates of the point.
+
+    Returns
+    -------
+    radii : array
+        Circumradius of each simplex, infinite for the flat ones
+    """
+    # Circumcenter relative to the first point : solution of 2 * edges . center = |edges|^2
+    edges = simplexPoints[:,1:] - simplexPoints[:,:1]
+    squaredLengths = np.sum(edges*edges, axis=2)
+
+    if edges.shape[2] == 2:
+        u, v = edges[:,0], edges[:,1]
+        determinant = 2*(u[:,0]*v[:,1] - u[:,1]*v[:,0])
+        centers = np.column_stack([v[:,1]*squaredLengths[:,0] - u[:,1]*squaredLengths[:,1],
+                                   u[:,0]*squaredLengths[:,1] - v[:,0]*squaredLengths[:,0]])
+    else:
+        u, v, w = edges[:,0], edges[:,1], edges[:,2]
+        vw = np.cross(v, w)
+        determinant = 2*np.einsum('ij,ij->i', u, vw)
+        centers = (squaredLengths[:,0,None]*vw + squaredLengths[:,1,None]*np.cross(w, u)
+                   + squaredLengths[:,2,None]*np.cross(u, v))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radii = np.linalg.norm(centers, axis=1) / np.abs(determinant)
+    radii[~np.isfinite(radii)] = np.inf
+    return radii
+
+
+def orientedBoundary(points, simplices):
+    """ Orient simplices positively and find the boundary of their union
+
+    Parameters
+    ------
+    points : 2d-array
+        In column, index of the point.
+        In line, array that contains the x, y (and z) coordinates of the point.
+    simplices : 2d-array
+        Tetrahedra (in 3D) or triangles (in 2D), as indexes in points
+
+    Returns
+    -------
+    simplices : 2d-array
+        The simplices, positively oriented (anti-clockwise in 2D)
+    boundary : 2d-array
+        Triangles (in 3D) or edges (in 2D) belonging to a single simplex, as indexes in points.
+        The triangles are anti-clockwise seen from outside, the edges have the union on their left
+    """
+    dimension = points.shape[1]
+    simplices = np.array(simplices, np.int64).reshape(-1, dimension+1)
+
+    # Positive orientation for all the simplices, so that their faces can be oriented outward
+    edges = points[simplices[:,1:]] - points[simplices[:,:1]]
+    if dimension == 2:
+        negative = edges[:,0,0]*edges[:,1,1] - edges[:,0,1]*edges[:,1,0] < 0
+        # Edges of a triangle (a, b, c) having it on their left
+        faceCorners = [[0, 1], [1, 2], [2, 0]]
+    else:
+        negative = np.einsum('ij,ij->i', edges[:,0], np.cross(edges[:,1], edges[:,2])) < 0
+        # Faces of a tetrahedron (a, b, c, d) anti-clockwise seen from outside
+        faceCorners = [[1, 2, 3], [0, 3, 2], [0, 1, 3], [0, 2, 1]]
+    simplices[negative, :2] = simplices[negative, 1::-1]
+
+    # The faces shared by two simplices are inside the union
+    faces = simplices[:, faceCorners].reshape(-1, dimension)
+    sortedFaces = np.sort(faces, axis=1)
+    order = np.lexsort(sortedFaces.T)
+    sortedFaces = sortedFaces[order]
+    firstOfRun = np.r_[True, np.any(sortedFaces[1:] != sortedFaces[:-1], axis=1)]
+    runs = np.cumsum(firstOfRun) - 1
+    single = np.bincount(runs)[runs] == 1
+
+    return simplices, faces[np.sort(order[single])]
+
+
+def alphaComplex(points, alpha, simplices=None):
+    """ Compute the alpha shape of a 2D or 3D point cloud with array operations
+
+    The simplices of the Delaunay triangulation with a circumradius below 1/alpha are kept (like the alphashape package),
+    the boundary of the shape is made of the faces (in 3D) or edges (in 2D) belonging to a single kept simplex.
+
+    Parameters
+    ------
+    points : 2d-array
+        In column, index of the point.
+        In line, array that contains the x, y (and z) coordinates of the point.
+    alpha : float
+        Value dictating the level of detail of the alpha shape
+    simplices : 2d-array
+        Delaunay triangulation of the points if already computed (see geometryDelaunay), None to compute it
+
+    Returns
+    -------
+    boundary : 2d-array
+        Triangles (in 3D) or edges (in 2D) of the boundary, as indexes in points.
+        The triangles are anti-clockwise seen from outside, the edges have the shape on their left
+    simplices : 2d-array
+        Kept tetrahedra (in 3D) or triangles (in 2D, anti-clockwise), as indexes in points.
+        Their vertices include the points inside the shape, see referencedVertices to keep only the ones of the boundary
+    """
+    points = np.asarray(points, np.float64)
+
+    # Centered to keep the precision with large coordinates
+    centered = points - points.mean(axis=0)
+    if simplices is None:
+        simplices = scipy.spatial.Delaunay(centered).simplices
+
+    simplices = simplices[circumradii(centered[simplices]) < 1.0/alpha]
+    simplices, boundary = orientedBoundary(centered, simplices)
+    return boundary, simplices
+
+
+def referencedVertices(faces):
+    """ Vertices used by faces given as indexes in a point cloud
+
+    Parameters
+    ------
+    faces : 2d-array
+        Triangles (or edges), as indexes in the points
+
+    Returns
+    -------
+    vertexIndexes : array
+        Index in the points of each vertex used by the faces, in increasing order
+    faces : 2d-array
+        The faces, as indexes in vertexIndexes
+    """
+    vertexIndexes = np.unique(faces)
+    return vertexIndexes, np.searchsorted(vertexIndexes, faces)
+
+
+def islandGeometry(pointCloud):
+    """ Create the geometric context of a point cloud (usually an island), shared by the meshing strategies tried on it
+
+    The geometry is computed on first use and kept in the context (see geometryBounds, geometryZStatistics,
+    geometryDelaunay and geometryConvexHull), so that a strategy failing doesn't make the next one start from scratch.
+    The errors are kept too : a tetrahedralization that failed isn't tried again.
+
+    Parameters
+    ------
+    pointCloud : 2d-array
+        In column, index of the point.
+        In line, array that contains the x, y and z coordinates of the point.
+
+    Returns
+    -------
+    geometry : dict
+        Context of the point cloud, its "points" and the values already computed
+    """
+    return {"points": np.asarray(pointCloud, np.float64)}
+
+
+def memoizedGeometry(geometry, name, compute):
+    """ Get a value of a geometric context, computing it (or its error) the first time
+
+    Parameters
+    ------
+    geometry : dict
+        See islandGeometry
+    name : str
+        Name of the value
+    compute : function
+        Computes the value from the context
+
+    Returns
+    -------
+    value
+        The value, the error raised by compute is raised again on each call
+    """
+    if name not in geometry:
+        try:
+            geometry[name] = (compute(geometry), None)
+        except Exception as exce:
+            geometry[name] = (None, exce)
+
+    value, error = geometry[name]
+    if error is not None:
+        raise error
+    return value
+
+
+def geometryBounds(geometry):
+    """ Bounding box of the points of a geometric context (see islandGeometry)
+
+    Returns
+    -------
+    bounds : 2d-array
+        The minimum then the maximum x, y and z coordinates
+    """
+    return memoizedGeometry(geometry, "bounds", lambda geometry: np.array([np.min(geometry["points"], axis=0), np.max(geometry["points"], axis=0)]))
+
+
+def geometryZStatistics(geometry):
+    """ Statistics of the heights of the points of a geometric context (see islandGeometry)
+
+    Returns
+    -------
+    statistics : dict
+        "min", "max" and "mean" of the heights, and whether the points are "sorted" by increasing height
+    """
+    def compute(geometry):
+        z = geometry["points"][:,2]
+        bounds = geometryBounds(geometry)
+        return {"min": bounds[0][2], "max": bounds[1][2], "mean": np.mean(z), "sorted": not np.any(np.diff(z) < 0)}
+
+    return memoizedGeometry(geometry, "zStatistics", compute)
+
+
+def geometryDelaunay(geometry):
+    """ Delaunay tetrahedralization of the points of a geometric context (see islandGeometry),
+    computed on the points centered on their mean to keep the precision with large coordinates
+
+    Returns
+    -------
+    simplices : 2d-array
+        Tetrahedra, as indexes in the points
+    """
+    def compute(geometry):
+        points = geometry["points"]
+        return scipy.spatial.Delaunay(points - points.mean(axis=0)).simplices
+
+    return memoizedGeometry(geometry, "delaunay", compute)
+
+
+def geometryConvexHull(geometry):
+    """ Convex hull of the points of a geometric context (see islandGeometry)
+
+    When the tetrahedralization is already known, the hull is the boundary of its tetrahedra,
+    otherwise it is computed directly (cheaper than the tetrahedralization).
+
+    Returns
+    -------
+    vertexIndexes : array
+        Index in the points of each vertex of the hull
+    faces : 2d-array
+        Triangles of the hull (anti-clockwise seen from outside), as indexes in vertexIndexes
+    """
+    def compute(geometry):
+        points = geometry["points"]
+        centered = points - points.mean(axis=0)
+        if geometry.get("delaunay", (None, None))[0] is not None:
+            _, faces = orientedBoundary(centered, geometryDelaunay(geometry))
+        else:
+            hull = scipy.spatial.ConvexHull(centered)
+            faces = hull.simplices
+            # Turn the faces whose winding doesn't match the outward normal given by qhull
+            normals = np.cross(centered[faces[:,1]] - centered[faces[:,0]], centered[faces[:,2]] - centered[faces[:,0]])
+            inward = np.einsum('ij,ij->i', normals, hull.equations[:,:3]) < 0
+            faces[inward, :2] = faces[inward, 1::-1]
+
+        return referencedVertices(faces)
+
+    return memoizedGeometry(geometry, "convexHull", compute)
+
+
+def extruded2DAlphaShapeMesh(pointCloud, colors, alpha, alphaEngine="library"):
+    """Create an extruded 2D alpha shape mesh based on a provided point cloud and alpha parameter
     
     Parameters
     ------
@@ -148,108 +476,93 @@ def createExtruded2DAlphaShape(pointCloud, colors, alpha, path):
         In column, index of the point.  
         In line, array that contains the x, y and z coordinates of the point.
     colors : 2d-array
-        In column, index of the point.  
-        In line, array that contains the r, g and b values of the point (between 0 and 255).
+        In column, index of the point (same order as the point cloud).  
+        In line, array that contains the r, g and b values of the point (between 0 and 1).
     alpha : float
         Value dictating the level of detail of the result of the alpha shape algorithm 
-    path : str
-        Path to save the obj file
+    alphaEngine : str
+        Implementation of the alpha shape, see ALPHA_ENGINES
 
+    Returns
+    -------
+    vertices, colors, faces
+        See convexHullMesh
     """
-    minZ = np.PINF
-    maxZ = np.NINF
+    if alphaEngine not in ALPHA_ENGINES:
+        raise ValueError("Unknown alpha engine '" + str(alphaEngine) + "', expected one of " + str(ALPHA_ENGINES))
 
     # Get the min an max of z coordinates
-    for point in pointCloud:
-        if point[2] < minZ:
-            minZ = point[2]
-        if point[2] > maxZ:
-            maxZ = point[2]
-
-    start = time.time()
-    meshCreation.log.info("Starting creation of 2D alpha shape")
-
-    alphashapeTree = alphashape([x[:-1] for x in pointCloud], alpha)
-
-    end = time.time()
-    meshCreation.log.info("Finished creation of 2D alpha shape in " + str(end - start) + " seconds") # time in seconds
-
-    start = time.time()
-    meshCreation.log.info("Starting triangulation of 2D alpha shape")
-
-    triangles = triangulate.triangulate(alphashapeTree.exterior.coords[:-1])
-
-    index = 1
-    vertices = {}
-    obj = ""
-
-    # Creation of the obj file
-    for tri in triangles:
-        for vertex in tri:
-            if vertex not in vertices:
-
-                color = [0.46,0.49,0.39]
-                """
-                for point in pointCloud:
-                    if vertex[0]==point[0] and vertex[1]==point[1]:
-                        color = colors[pointToColor(point)]
-                        break    
-                """
-                        
-                # Adding the top points
-                obj += "v " + "{:.8f}".format(vertex[0]) + " " + "{:.8f}".format(vertex[1]) + " " + "{:.8f}".format(maxZ) + " "
-                obj += "{:.8f}".format(color[0]) + " " + "{:.8f}".format(color[1]) + " " + "{:.8f}".format(color[2]) + "\n"
-                vertices[vertex] = index
-                index += 1
-
-
-    for coord in vertices.keys():
-
-        color = [0.46,0.49,0.39]
-        """
-        for point in pointCloud:
-                    if coord[0]==point[0] and coord[1]==point[1]:
-                        color = colors[pointToColor(point)]
-                        break
-        """
-                        
-        # Adding the bottom points 
-        # Note : it was done this way to have the bottom point at the top point index + the number of point in total at the top
-        # e.g. The top point is stored at the index 2 and there are 10 points, the bottom corresponding point is stored at the index 12
-        obj += "v " + "{:.8f}".format(coord[0]) + " " + "{:.8f}".format(coord[1]) + " " + "{:.8f}".format(minZ) + " "
-        obj += "{:.8f}".format(color[0]) + " " + "{:.8f}".format(color[1]) + " " + "{:.8f}".format(color[2]) + "\n"
-
-    
-    # Adding the top flat part
-    for tri in triangles:
-        obj += "f"
-        for vertex in tri:
-            obj += " " + str(vertices[vertex])
-        obj += "\n" 
-
-
-    length = len(vertices.keys())
+    minZ = np.min(pointCloud[:,2])
+    maxZ = np.max(pointCloud[:,2])
+
+    if alphaEngine == "native":
+        with Profiling.span("creation of 2D alpha shape"):
+            # The kept triangles are the top flat part, the boundary edges (with the shape on their left) make the sides
+            boundary, simplices = alphaComplex(pointCloud[:,:2], alpha)
+            vertexIndexes, topFaces = referencedVertices(simplices)
+            sideEdges = np.searchsorted(vertexIndexes, boundary)
+            outline = pointCloud[vertexIndexes, :2]
+            length = len(outline)
+
+            # Only the vertices of the boundary are extruded, the points inside the shape are only used by the top
+            extruded = np.unique(sideEdges)
+    else:
+        with Profiling.span("creation of 2D alpha shape"):
+            alphashapeTree = alphashape(pointCloud[:,:2], alpha)
+
+        # The alpha shape can be made of several polygons, each of them possibly with holes
+        with Profiling.span("triangulation of 2D alpha shape"):
+            polygons = getattr(alphashapeTree, "geoms", [alphashapeTree])
+
+            outline = []
+            topFaces = []
+            sideEdges = []
+            length = 0
+            for polygon in polygons:
+                # Exterior anti-clockwise and holes clockwise, so that the side triangles face outward
+                polygon = orient(polygon, 1.0)
+                rings = [np.asarray(polygon.exterior.coords[:-1])] + [np.asarray(hole.coords[:-1]) for hole in polygon.interiors]
+
+                # Adding the top flat part
+                topFaces.append(triangulate.triangulate(rings[0], rings[1:]) + length)
+
+                # Each point of a ring is linked to the next one by the side triangles
+                for ring in rings:
+                    current = np.arange(length, length + len(ring))
+                    sideEdges.append(np.column_stack([current, np.roll(current, -1)]))
+                    outline.append(ring)
+                    length += len(ring)
+
+            outline = np.vstack(outline)
+            topFaces = np.vstack(topFaces)
+            sideEdges = np.vstack(sideEdges)
+
+            # All the points of the rings are on the boundary
+            extruded = np.arange(length)
+
+    # Adding the top points then the bottom points of the extruded vertices
+    # Note : the bottom point of the k-th extruded vertex is stored at the index length + k, so that when every vertex is
+    # extruded, the bottom point is at the top point index + the number of point in total at the top
+    # e.g. The top point is stored at the index 2 and there are 10 points, the bottom corresponding point is stored at the index 12
+    meshVertices = np.vstack([np.column_stack([outline, np.full(length, maxZ)]),
+                              np.column_stack([outline[extruded], np.full(len(extruded), minZ)])])
+    bottom = np.zeros(length, np.int64)
+    bottom[extruded] = length + np.arange(len(extruded))
+
+    # The vertices of the 2D alpha shape aren't matched back to the points, they all get the same color
+    meshColors = np.tile([0.46,0.49,0.39], (len(meshVertices), 1))
 
     # Adding the side triangles
-    for i in vertices.values():
-        if i == length:
-            obj += "f " + str(i) + " " + str(i + length) + " " + str(length+1) + "\n"
-            obj += "f " + str(i) + " " + str(length+1) + " " + str(1) + "\n"
-        else:
-            obj += "f " + str(i) + " " + str(i + length) + " " + str((i + 1) + length) + "\n"
-            obj += "f " + str(i) + " " + str((i + 1) + length) + " " + str((i + 1)) + "\n"
+    current = sideEdges[:,0]
+    following = sideEdges[:,1]
+    sideFaces = np.stack([np.column_stack([current, bottom[current], bottom[following]]),
+                          np.column_stack([current, bottom[following], following])], axis=1).reshape(-1, 3)
 
-
-    with open(path, 'w') as f:
-            for line in obj:
-                f.write(line)
-    
-    end = time.time()
-    meshCreation.log.info("Finished triangulation of 2D alpha shape in " + str(end - start) + " seconds") # time in seconds
+    return meshVertices, meshColors, np.vstack([topFaces, sideFaces])
 
 
-def createAlphashape(pointCloud, alpha, colors, path):
-    """Create an alpha shape mesh based on a provided point cloud and alpha parameter and save it as an obj file 
+def alphaShapeMesh(pointCloud, alpha, colors, normalsMode="centroid", alphaEngine="library", geometry=None):
+    """Create an alpha shape mesh based on a provided point cloud and alpha parameter
     
     Parameters
     ------
@@ -257,99 +570,128 @@ def createAlphashape(pointCloud, alpha, colors, path):
         In column, index of the point.  
         In line, array that contains the x, y and z coordinates of the point.
     colors : 2d-array
-        In column, index of the point.  
-        In line, array that contains the r, g and b values of the point (between 0 and 255).
+        In column, index of the point (same order as the point cloud).  
+        In line, array that contains the r, g and b values of the point (between 0 and 1).
     alpha : float
         Value dictating the level of detail of the result of the alpha shape algorithm 
-    path : str
-        Path to save the obj file
+    normalsMode : str
+        How the faces are oriented, see NORMALS_MODES
+    alphaEngine : str
+        Implementation of the alpha shape, see ALPHA_ENGINES
+    geometry : dict
+        Geometric context of the point cloud (see islandGeometry), its tetrahedralization is reused by the native engine.
+        None to use a new one
 
+    Returns
+    -------
+    vertices, colors, faces
+        See convexHullMesh
     """
-    start = time.time()
-    meshCreation.log.info("Starting creation of alpha shape")
-    alphashapeTree = alphashape(pointCloud, alpha)
+    if alphaEngine not in ALPHA_ENGINES:
+        raise ValueError("Unknown alpha engine '" + str(alphaEngine) + "', expected one of " + str(ALPHA_ENGINES))
 
+    if geometry is None:
+        geometry = islandGeometry(pointCloud)
+
+    with Profiling.span("creation of alpha shape"):
+        if alphaEngine == "native":
+            # Only the points on the boundary are vertices of the mesh
+            vertexIndexes, faces = referencedVertices(alphaComplex(pointCloud, alpha, geometryDelaunay(geometry))[0])
+            alphashapeTree = trimesh.Trimesh(vertices=pointCloud[vertexIndexes], faces=faces, process=False)
+        else:
+            alphashapeTree = alphashape(pointCloud, alpha)
+            vertexIndexes = None
 
-    end = time.time()
-    meshCreation.log.info("Finished creation of alpha shape in " + str(end - start) + " seconds") # time in seconds
-    
     # Doesn't seem to affect to mesh much but isn't costly
     alphashapeTree.fill_holes()
 
-    end = time.time()
-    
-    
-    start = time.time()
-    meshCreation.log.info("Starting repairing alpha shape's normals")
+    with Profiling.span("repairing alpha shape's normals"):
+        alphashapeTree = repairAlphaShapeNormals(alphashapeTree, normalsMode)
 
-    alphashapeTree = repairAlphaShapeNormals(alphashapeTree)
+    with Profiling.span("coloring alpha shape"):
+        if vertexIndexes is not None:
+            # The native alpha shape keeps the index of the point of each vertex
+            pointIndexes = vertexIndexes
+        else:
+            # Reconnecting the color to the vertices : the vertices of the alpha shape are input points
+            # so the nearest input point of each vertex is the vertex itself
+            _, pointIndexes = scipy.spatial.cKDTree(pointCloud).query(alphashapeTree.vertices)
 
-    end = time.time()
-    meshCreation.log.info("Finished reparing alpha shape's normals in " + str(end - start) + " seconds") # time in seconds
+    return alphashapeTree.vertices, colors[pointIndexes], alphashapeTree.faces
 
-    start = time.time()
-    meshCreation.log.info("Starting coloring alpha shape")
-    # Reconnecting the color to the vertices
-    pointColors = []
-    for vertice in alphashapeTree.vertices:
-        pointColors.append(colors[pointToColor(vertice)])
-    alphashapeTree.visual.vertex_colors = pointColors
-    end = time.time()
-    meshCreation.log.info("Finished coloring alpha shape in " + str(end - start) + " seconds") # time in seconds
 
-    alphashapeTree.export(path)
-    
-    return
+# Ways of orienting the faces of the alpha shapes
+# "centroid" : each face is turned away from the center of the bounding box of the mesh
+# "winding" : the faces are first given a consistent winding through their shared edges, then each connected part
+#             of the mesh is turned outward as a whole (works for non convex canopies)
+NORMALS_MODES = ["centroid", "winding"]
 
 
-def repairAlphaShapeNormals(mesh: trimesh.Trimesh):
-    """Make all normals face away from the center of the bounding box of the mesh 
+def repairAlphaShapeNormals(mesh: trimesh.Trimesh, mode="centroid"):
+    """Make the normals of the mesh face outward, see NORMALS_MODES
     
     Parameters
     ------
     mesh : Trimesh
         The mesh with normals to work with (using face normals) 
+    mode : str
+        How the faces are oriented ("centroid" or "winding")
 
     """
+    if mode not in NORMALS_MODES:
+        raise ValueError("Unknown normals mode '" + str(mode) + "', expected one of " + str(NORMALS_MODES))
+
     boundingCenter = (mesh.bounds[0]+mesh.bounds[1])/2
 
-    for index in range(mesh.faces.shape[0]):
-        faceIndexes = mesh.faces[index]
-        face = [mesh.vertices[faceIndexes[0]], mesh.vertices[faceIndexes[1]], mesh.vertices[faceIndexes[2]]]
-        normal = mesh.face_normals[index]
-        triangleCenter = (face[0] + face[1] + face[2])/3
-        if needToReverseFace(boundingCenter, triangleCenter, normal):
-            # Flipping the normal
-            mesh.faces[index] = np.ascontiguousarray(np.flipud(mesh.faces[index]))
+    if mode == "winding":
+        trimesh.repair.fix_winding(mesh)
+
+        # Each connected part is flipped as a whole if most of its area faces the center of the bounding box
+        direction = mesh.triangles_center - boundingCenter
+        outward = np.einsum('ij,ij->i', direction, mesh.face_normals) * mesh.area_faces
+        faces = mesh.faces.copy()
+        for component in trimesh.graph.connected_components(mesh.face_adjacency, nodes=np.arange(len(faces))):
+            if np.sum(outward[component]) < 0:
+                faces[component] = faces[component][:, ::-1]
+        mesh.faces = faces
+
+        return mesh
+
+    triangleCenters = mesh.vertices[mesh.faces].mean(axis=1)
+    flip = needToReverseFaces(boundingCenter, triangleCenters, mesh.face_normals)
+
+    # Flipping the normals
+    faces = mesh.faces.copy()
+    faces[flip] = faces[flip][:, ::-1]
+    mesh.faces = faces
 
     return mesh
 
 
-def needToReverseFace(boundingCenter, triangleCenter, normal):
-    """Given the center of the bounding box, the center of the triangle and the normal, returns whether the normal needs to be flipped
+def needToReverseFaces(boundingCenter, triangleCenters, normals):
+    """Given the center of the bounding box, the centers of the triangles and their normals, returns which normals need to be flipped
     
     Parameters
     ------
     boundingCenter : array
         The coordinates (x, y, z) of the bounding box
-    triangleCenter : array
-        The coordinates (x, y, z) of the triangle center
-    normal : array
-        The values (x, y, z) of the normal
+    triangleCenters : 2d-array
+        The coordinates (x, y, z) of each triangle center
+    normals : 2d-array
+        The values (x, y, z) of each normal
     
     Returns
     ------
-    needToBeReversed : bool
-        True if the normal is pointing towards the center of the bounding box
+    needToBeReversed : array
+        True for the normals pointing towards the center of the bounding box
     """
-    direction = triangleCenter - boundingCenter
-    direction /= scipy.linalg.norm(direction)
+    direction = triangleCenters - boundingCenter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        direction /= np.linalg.norm(direction, axis=1)[:, None]
 
-    res = np.dot(direction, normal)
+    res = np.einsum('ij,ij->i', direction, normals)
 
-    if res>=0:
-        return False
-    else:
-        return True
+    # Written this way so that a triangle centered on the bounding box (undefined direction) is flipped, as before
+    return ~(res >= 0)
     
 
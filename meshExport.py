@@ -0,0 +1,313 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+
+# Number of lines formatted at once when writing a file
+BLOCK_SIZE = 65536
+
+
+def writeOBJ(path, vertices, colors, faces):
+    """ Write a mesh with vertex colors in an obj file
+
+    The lines are formatted by blocks of BLOCK_SIZE with a single string formatting per block
+    and written through a buffered file, instead of one string concatenation per value.
+
+    Parameters
+    ------
+    path : str
+      Path to save the obj file
+    vertices : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    colors : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    faces : 2d-array
+      In column, index of the triangle.
+      In line, array that contains the indexes of points making the triangle (starting at 0).
+    """
+    vertices = np.asarray(vertices, np.float64).reshape(-1, 3)
+    colors = np.asarray(colors, np.float64).reshape(-1, 3)
+    # Careful : the index start at 0 in the input but must start at 1 in the output
+    faces = np.asarray(faces, np.int64).reshape(-1, 3) + 1
+
+    with open(path, 'w', buffering=1 << 20) as f:
+        # Vertex coordinates + color, always with 8 digits in the decimals
+        vertexData = np.hstack([vertices, colors])
+        for start in range(0, len(vertexData), BLOCK_SIZE):
+            block = vertexData[start:start+BLOCK_SIZE]
+            f.write(("v %.8f %.8f %.8f %.8f %.8f %.8f\n" * len(block)) % tuple(block.ravel().tolist()))
+
+        # Triangles
+        for start in range(0, len(faces), BLOCK_SIZE):
+            block = faces[start:start+BLOCK_SIZE]
+            f.write(("f %d %d %d\n" * len(block)) % tuple(block.ravel().tolist()))
+
+
+# Formats a mesh can be saved in, the format is given by the extension of the output file
+MESH_FORMATS = ["obj", "ply", "glb"]
+
+
+def writeMesh(path, vertices, colors, faces):
+    """ Save a mesh with vertex colors, in the format given by the extension of the path (see MESH_FORMATS)
+
+    Parameters
+    ------
+    path : str
+      Path to save the mesh file
+    vertices : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    colors : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    faces : 2d-array
+      In column, index of the triangle.
+      In line, array that contains the indexes of points making the triangle (starting at 0).
+    """
+    meshFormat = os.path.splitext(path)[1][1:].lower()
+
+    if meshFormat == "obj":
+        writeOBJ(path, vertices, colors, faces)
+    elif meshFormat == "ply":
+        writePLY(path, vertices, colors, faces)
+    elif meshFormat == "glb":
+        writeGLB(path, vertices, colors, faces)
+    else:
+        raise ValueError("Unknown mesh format '" + meshFormat + "', expected one of " + str(MESH_FORMATS))
+
+
+def lodPath(path, level):
+    """ Path of a level of detail of a mesh file : "_lod<level>" is added before the extension (e.g. alpha_3_1_lod2.obj).
+    The level 0 is the full mesh, saved at the path itself
+
+    Parameters
+    ------
+    path : str
+      Path of the full mesh file
+    level : int
+      Level of detail, from 0 (full mesh) to the coarsest
+
+    Returns
+    -------
+    path : str
+        Path of the level of detail
+    """
+    if level == 0:
+        return path
+    root, extension = os.path.splitext(path)
+    return root + "_lod" + str(level) + extension
+
+
+def localOrigin(vertices):
+    """ Origin used to store the coordinates of a mesh as float32 without losing precision
+
+    Parameters
+    ------
+    vertices : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+
+    Returns
+    -------
+    origin : array
+        The x, y and z coordinates of the origin (rounded down minimum of the coordinates)
+    """
+    if len(vertices) == 0:
+        return np.zeros(3)
+    return np.floor(np.min(vertices, axis=0))
+
+
+def colorsToBytes(colors):
+    """ Convert colors between 0 and 1 to 8 bits colors
+
+    Parameters
+    ------
+    colors : 2d-array
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+
+    Returns
+    -------
+    colors : 2d-array
+        Colors as uint8 (between 0 and 255)
+    """
+    return np.clip(np.round(np.asarray(colors, np.float64) * 255), 0, 255).astype(np.uint8)
+
+
+def writePLY(path, vertices, colors, faces):
+    """ Write a mesh with vertex colors in a binary (little endian) ply file
+
+    The coordinates are stored as float32 relative to a local origin, written in the header
+    as a comment ("comment origin x y z"). The colors are stored on 8 bits.
+
+    Parameters
+    ------
+    path : str
+      Path to save the ply file
+    vertices : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    colors : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    faces : 2d-array
+      In column, index of the triangle.
+      In line, array that contains the indexes of points making the triangle (starting at 0).
+    """
+    vertices = np.asarray(vertices, np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, np.int32).reshape(-1, 3)
+    origin = localOrigin(vertices)
+
+    vertexData = np.empty(len(vertices), [('position', '<f4', 3), ('color', 'u1', 3)])
+    vertexData['position'] = vertices - origin
+    vertexData['color'] = colorsToBytes(colors).reshape(-1, 3)
+
+    faceData = np.empty(len(faces), [('count', 'u1'), ('indexes', '<i4', 3)])
+    faceData['count'] = 3
+    faceData['indexes'] = faces
+
+    header = ("ply\n"
+              "format binary_little_endian 1.0\n"
+              "comment origin %.8f %.8f %.8f\n"
+              "element vertex %d\n"
+              "property float x\n"
+              "property float y\n"
+              "property float z\n"
+              "property uchar red\n"
+              "property uchar green\n"
+              "property uchar blue\n"
+              "element face %d\n"
+              "property list uchar int vertex_indices\n"
+              "end_header\n") % (origin[0], origin[1], origin[2], len(vertexData), len(faceData))
+
+    with open(path, 'wb') as f:
+        f.write(header.encode('ascii'))
+        f.write(vertexData.tobytes())
+        f.write(faceData.tobytes())
+
+
+def writeGLB(path, vertices, colors, faces):
+    """ Write a mesh with vertex colors in a binary glTF (glb) file
+
+    The coordinates are stored as float32 relative to a local origin, which is the translation of the node.
+    As required by glTF, the mesh is converted from z-up to y-up. The colors are stored on 8 bits.
+    A mesh without triangles raises a ValueError (see encodeGLB) and no file is written.
+
+    Parameters
+    ------
+    path : str
+      Path to save the glb file
+    vertices : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    colors : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    faces : 2d-array
+      In column, index of the triangle.
+      In line, array that contains the indexes of points making the triangle (starting at 0).
+    """
+    content = encodeGLB(vertices, colors, faces)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def toYUp(coordinates):
+    """ Convert z-up coordinates (x, y, z) to the y-up coordinates (x, z, -y) used by glTF
+
+    Parameters
+    ------
+    coordinates : array
+      Coordinates (or array of coordinates) in z-up
+
+    Returns
+    -------
+    coordinates : array
+        Coordinates in y-up
+    """
+    coordinates = np.asarray(coordinates)
+    return np.stack([coordinates[...,0], coordinates[...,2], -coordinates[...,1]], axis=-1)
+
+
+def encodeGLB(vertices, colors, faces):
+    """ Encode a mesh with vertex colors as a binary glTF (see writeGLB)
+
+    glTF doesn't allow empty accessors nor empty buffer views : a mesh without triangles raises a ValueError.
+
+    Parameters
+    ------
+    vertices : 2d-array
+      The x, y and z coordinates of each point
+    colors : 2d-array
+      The r, g and b values of each point (between 0 and 1)
+    faces : 2d-array
+      The indexes of points making each triangle (starting at 0)
+
+    Returns
+    -------
+    content : bytes
+        Content of the glb file
+    """
+    vertices = np.asarray(vertices, np.float64).reshape(-1, 3)
+    faces = np.asarray(faces, np.uint32).reshape(-1, 3)
+    if len(faces) == 0:
+        raise ValueError("A glb mesh must have at least one triangle")
+    origin = localOrigin(vertices)
+
+    positions = toYUp(vertices - origin).astype('<f4')
+    # Vertex attributes must be aligned on 4 bytes, so the colors are stored as RGBA
+    rgba = np.full((len(vertices), 4), 255, np.uint8)
+    rgba[:,:3] = colorsToBytes(colors).reshape(-1, 3)
+
+    binary = positions.tobytes() + rgba.tobytes() + faces.astype('<u4').tobytes()
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "UD-VCity-Vegetation-LasToMesh"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": toYUp(origin).tolist()}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0, "COLOR_0": 1}, "indices": 2, "mode": 4}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": rgba.nbytes, "target": 34962},
+            {"buffer": 0, "byteOffset": positions.nbytes + rgba.nbytes, "byteLength": faces.nbytes, "target": 34963}
+        ],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": 5121, "normalized": True, "count": len(rgba), "type": "VEC4"},
+            {"bufferView": 2, "componentType": 5125, "count": faces.size, "type": "SCALAR"}
+        ]
+    }
+
+    return packGLB(gltf, binary)
+
+
+def packGLB(gltf, binary):
+    """ Pack the json part and the binary buffer of a glTF into a glb
+
+    Parameters
+    ------
+    gltf : dict
+      The json part of the glTF
+    binary : bytes
+      The content of the buffer 0
+
+    Returns
+    -------
+    content : bytes
+        Content of the glb file
+    """
+    # Both chunks must be aligned on 4 bytes : the json is padded with spaces, the binary with zeros
+    jsonChunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    jsonChunk += b' ' * (-len(jsonChunk) % 4)
+    binChunk = binary + b'\x00' * (-len(binary) % 4)
+
+    totalLength = 12 + 8 + len(jsonChunk) + 8 + len(binChunk)
+    return (struct.pack('<4sII', b'glTF', 2, totalLength)
+            + struct.pack('<I4s', len(jsonChunk), b'JSON') + jsonChunk
+            + struct.pack('<I4s', len(binChunk), b'BIN\x00') + binChunk)
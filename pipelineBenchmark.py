@@ -0,0 +1,408 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import laspy
+import numpy as np
+import trimesh
+
+import meshCreation
+import meshCreationUtilities as MeshUtilities
+import profiling as Profiling
+import triangulate
+
+
+# Georeferenced origin of the synthetic clouds (same order of magnitude as the sample datas, to keep the precision issues)
+SYNTHETIC_ORIGIN = (1848000.0, 5170000.0)
+
+# For each vegetation class (low, medium and high vegetation), the radius of its crowns relative to the crown radius
+# and the height of the bottom of its crowns relative to their radius
+VEGETATION_SHAPES = {3: (0.25, 0.0), 4: (0.5, 0.5), 5: (1.0, 1.0)}
+
+# Classification of the ground points
+GROUND_CLASS = 2
+
+# Number of points generated at once when writing a synthetic cloud
+GENERATION_CHUNK = 1000000
+
+# Stage changes shorter than this are never reported as slowdowns, being mostly noise
+MIN_SLOWDOWN_SECONDS = 0.05
+
+
+def treePointCounts(rng, treeClasses, crownRadius, density):
+    """ Number of points of each tree : the density times the area of its crown seen from above
+
+    Parameters
+    ------
+    rng : Generator
+      Random generator
+    treeClasses : array
+      Vegetation class of each tree (see VEGETATION_SHAPES)
+    crownRadius : float
+      Radius of the crowns of the high vegetation
+    density : float
+      Number of points per square unit of crown
+
+    Returns
+    -------
+    counts : array
+        Number of points of each tree
+    """
+    scales = np.array([VEGETATION_SHAPES[c][0] for c in treeClasses])
+    return rng.poisson(density * math.pi * (scales*crownRadius)**2) + 1
+
+
+def treeCountFor(pointCount, crownRadius=3.0, density=20.0, classMix=(0.1, 0.2, 0.7), groundRatio=0.2):
+    """ Number of trees giving about pointCount points to writeSyntheticVegetation
+
+    Parameters
+    ------
+    pointCount : int
+      Number of points wanted, ground included
+    crownRadius, density, classMix, groundRatio
+      See writeSyntheticVegetation
+
+    Returns
+    -------
+    treeCount : int
+        Number of trees
+    """
+    mix = np.asarray(classMix, np.float64) / np.sum(classMix)
+    meanScale = np.dot(mix, [VEGETATION_SHAPES[c][0]**2 for c in sorted(VEGETATION_SHAPES)])
+    pointsPerTree = density * math.pi * crownRadius**2 * meanScale + 1
+    return max(1, round(pointCount * (1 - groundRatio) / pointsPerTree))
+
+
+def crownPoints(rng, centers, radiuses, counts):
+    """ Points hit by the LIDAR in crowns : mostly near the surface of a slightly flattened sphere
+
+    Parameters
+    ------
+    rng : Generator
+      Random generator
+    centers : 2d-array
+      Center of each crown
+    radiuses : array
+      Radius of each crown
+    counts : array
+      Number of points of each crown
+
+    Returns
+    -------
+    points : 2d-array
+        The x, y and z coordinates of the points, crown after crown
+    """
+    total = int(np.sum(counts))
+    directions = rng.normal(size=(total, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    depth = 1 - 0.3*rng.random(total)**2
+    radius = np.repeat(radiuses, counts) * depth
+    return np.repeat(centers, counts, axis=0) + directions * radius[:, None] * [1, 1, 0.8]
+
+
+def writeSyntheticVegetation(path, treeCount, crownRadius=3.0, density=20.0, classMix=(0.1, 0.2, 0.7), groundRatio=0.2, seed=0):
+    """ Write a synthetic classified and colored las file of trees scattered on a flat ground
+
+    The trees are placed at random in a square sized so that the crowns of neighbouring trees sometimes touch,
+    making islands of one or several trees. Each tree belongs to one vegetation class (3, 4 or 5), which sets
+    the size and the height of its crown (see VEGETATION_SHAPES). The points are written by chunks, so that
+    the memory stays bounded for the largest clouds.
+
+    Parameters
+    ------
+    path : str
+      Path of the las file
+    treeCount : int
+      Number of trees
+    crownRadius : float
+      Radius of the crowns of the high vegetation (class 5)
+    density : float
+      Number of points per square unit of crown
+    classMix : tuple
+      Portion of the trees in the class 3, 4 and 5
+    groundRatio : float
+      Portion of the points on the ground (class 2, filtered out by the meshing)
+    seed : int
+      Seed of the random generator
+
+    Returns
+    -------
+    pointCount : int
+        Number of points written
+    """
+    rng = np.random.default_rng(seed)
+    mix = np.asarray(classMix, np.float64) / np.sum(classMix)
+    treeClasses = rng.choice(sorted(VEGETATION_SHAPES), size=treeCount, p=mix)
+    treeCounts = treePointCounts(rng, treeClasses, crownRadius, density)
+    side = math.sqrt(treeCount) * 2.5 * crownRadius
+    groundCount = round(treeCounts.sum() * groundRatio / max(1 - groundRatio, 1e-9))
+
+    header = laspy.LasHeader(point_format=3, version="1.2")
+    header.scales = np.array([0.01, 0.01, 0.01])
+    header.offsets = np.array([SYNTHETIC_ORIGIN[0], SYNTHETIC_ORIGIN[1], 0.0])
+
+    def write(writer, points, classification, colors):
+        record = laspy.ScaleAwarePointRecord.zeros(len(points), header=header)
+        record.x = points[:,0]
+        record.y = points[:,1]
+        record.z = points[:,2]
+        record.classification = classification
+        # Colors on 16 bits, like the LIDAR of the sample datas
+        record.red, record.green, record.blue = (np.clip(colors, 0, 255).astype(np.uint16) * 256).T
+        writer.write_points(record)
+
+    with laspy.open(path, mode="w", header=header) as writer:
+        # Trees by chunks of about GENERATION_CHUNK points
+        chunkEnds = np.searchsorted(np.cumsum(treeCounts), np.arange(GENERATION_CHUNK, treeCounts.sum(), GENERATION_CHUNK))
+        for trees in np.split(np.arange(treeCount), chunkEnds):
+            if len(trees) == 0:
+                continue
+            radiuses = np.array([VEGETATION_SHAPES[c][0] for c in treeClasses[trees]]) * crownRadius
+            bottoms = np.array([VEGETATION_SHAPES[c][1] for c in treeClasses[trees]]) * radiuses
+            centers = np.column_stack([SYNTHETIC_ORIGIN[0] + rng.random(len(trees))*side, SYNTHETIC_ORIGIN[1] + rng.random(len(trees))*side,
+                                       bottoms + radiuses])
+            points = crownPoints(rng, centers, radiuses, treeCounts[trees])
+            points[:,2] = np.maximum(points[:,2], 0)
+
+            # A shade of green per tree, with some noise per point
+            treeColors = np.column_stack([rng.uniform(60, 110, len(trees)), rng.uniform(90, 150, len(trees)), rng.uniform(50, 90, len(trees))])
+            colors = np.repeat(treeColors, treeCounts[trees], axis=0) + rng.normal(0, 8, (len(points), 3))
+            write(writer, points, np.repeat(treeClasses[trees], treeCounts[trees]), colors)
+
+        for start in range(0, groundCount, GENERATION_CHUNK):
+            count = min(GENERATION_CHUNK, groundCount - start)
+            points = np.column_stack([SYNTHETIC_ORIGIN[0] + rng.random(count)*side, SYNTHETIC_ORIGIN[1] + rng.random(count)*side,
+                                      rng.normal(0, 0.05, count)])
+            write(writer, points, np.full(count, GROUND_CLASS), rng.normal([120, 110, 90], 10, (count, 3)))
+
+    return int(treeCounts.sum()) + groundCount
+
+
+def syntheticPolygon(vertexCount, holeCount=8, seed=0):
+    """ Polygon looking like the outline of a large 2D alpha shape : a jagged ring with small holes inside
+
+    Parameters
+    ------
+    vertexCount : int
+      Number of vertices of the exterior ring (the holes have about a tenth of them in total)
+    holeCount : int
+      Number of holes
+    seed : int
+      Seed of the random generator
+
+    Returns
+    -------
+    exterior : 2d-array
+        The x and y coordinates of the exterior ring (anti-clockwise)
+    holes : list
+        The rings of the holes
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2*math.pi, vertexCount, endpoint=False)
+    radius = 100 * (1 + 0.2*np.sin(7*angles)) + rng.uniform(0, 10, vertexCount)
+    exterior = np.column_stack([np.cos(angles)*radius, np.sin(angles)*radius])
+
+    holes = []
+    holeVertices = max(3, vertexCount // (10*holeCount))
+    holeAngles = np.linspace(0, 2*math.pi, holeVertices, endpoint=False)
+    for k in range(holeCount):
+        center = 50 * np.array([math.cos(2*math.pi*k/holeCount), math.sin(2*math.pi*k/holeCount)])
+        holeRadius = 5 + rng.uniform(0, 1, holeVertices)
+        holes.append(center + np.column_stack([np.cos(holeAngles)*holeRadius, -np.sin(holeAngles)*holeRadius]))
+    return exterior, holes
+
+
+def scrambledAlphaShape(pointCount, seed=0):
+    """ Alpha shape of a synthetic crown with half of its faces flipped, as given to MeshUtilities.repairAlphaShapeNormals
+
+    Parameters
+    ------
+    pointCount : int
+      Number of points of the crown
+    seed : int
+      Seed of the random generator
+
+    Returns
+    -------
+    mesh : Trimesh
+        The alpha shape
+    """
+    rng = np.random.default_rng(seed)
+    points = crownPoints(rng, np.array([[SYNTHETIC_ORIGIN[0], SYNTHETIC_ORIGIN[1], 10.0]]), np.array([5.0]), np.array([pointCount]))
+    vertexIndexes, faces = MeshUtilities.referencedVertices(MeshUtilities.alphaComplex(points, MeshUtilities.computeAlpha(points))[0])
+    flipped = rng.random(len(faces)) < 0.5
+    faces[flipped] = faces[flipped][:, ::-1]
+    return trimesh.Trimesh(vertices=points[vertexIndexes], faces=faces, process=False)
+
+
+def bestTime(function, repeat):
+    """ Best wall time of several calls of a function, in seconds """
+    seconds = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = min(seconds, time.perf_counter() - start)
+    return seconds
+
+
+def benchmarkCase(input_path, output_path, pointCount, cellSize, workers, repeat):
+    """ Time the stages of meshCreation.vegetationToMesh on a file (see Profiling.span),
+    and triangulate.triangulate and MeshUtilities.repairAlphaShapeNormals on inputs of a matching size
+
+    Parameters
+    ------
+    input_path : str
+      Path of the las file
+    output_path : str
+      Folder of the meshes
+    pointCount : int
+      Number of points of the file
+    cellSize : float
+      Size of the cells of the grid
+    workers : int
+      Number of processes meshing the islands
+    repeat : int
+      Number of runs of each measure, the best time is kept
+
+    Returns
+    -------
+    seconds : dict
+        Wall time of each stage, "total" being the whole run of vegetationToMesh
+    summary : dict
+        Summary of the last run (see Profiling.writeReport)
+    """
+    seconds = {}
+    for _ in range(repeat):
+        summary = meshCreation.vegetationToMesh(input_path, output_path, cellSize, False, workers=workers, profile=True)
+        with open(output_path + Profiling.PROFILE_NAME) as f:
+            report = json.load(f)
+        measures = {span["name"]: span["wallSeconds"] for span in report["spans"]}
+        measures["total"] = summary["seconds"]
+        for name, value in measures.items():
+            seconds[name] = min(seconds.get(name, math.inf), value)
+
+    exterior, holes = syntheticPolygon(min(max(pointCount // 100, 100), 100000))
+    seconds["triangulate"] = bestTime(lambda: triangulate.triangulate(exterior, holes), repeat)
+
+    mesh = scrambledAlphaShape(min(max(pointCount // 10, 1000), 50000))
+    for mode in MeshUtilities.NORMALS_MODES:
+        seconds["repairAlphaShapeNormals " + mode] = bestTime(lambda: MeshUtilities.repairAlphaShapeNormals(mesh.copy(), mode), repeat)
+
+    return seconds, report["summary"]
+
+
+def compareToBaseline(results, baseline, threshold):
+    """ Find the stages slower than in a baseline
+
+    The cases are matched by their number of points. A stage is slower when it takes more than (1 + threshold)
+    times its baseline time, and at least MIN_SLOWDOWN_SECONDS more.
+
+    Parameters
+    ------
+    results : dict
+      Results of the benchmark, see main
+    baseline : dict
+      Results of a previous run of the benchmark
+    threshold : float
+      Relative slowdown tolerated
+
+    Returns
+    -------
+    slowdowns : list
+        For each slower stage, the number of points of the case, the name of the stage, its baseline time and its time
+    """
+    baselineCases = {case["points"]: case["seconds"] for case in baseline["cases"]}
+    slowdowns = []
+    for case in results["cases"]:
+        reference = baselineCases.get(case["points"], {})
+        for name, seconds in case["seconds"].items():
+            if name in reference and seconds > reference[name]*(1 + threshold) and seconds - reference[name] >= MIN_SLOWDOWN_SECONDS:
+                slowdowns.append((case["points"], name, reference[name], seconds))
+    return slowdowns
+
+
+def printCase(case, baseline=None):
+    """ Print the time of each stage of a case, with its change from the baseline case when there is one """
+    line = "%-36s %12s %12s %9s"
+    print("%d points, %d trees, %d islands, %.1f MB" % (case["points"], case["trees"], case["islands"], case["processPeakMemoryMB"] or 0))
+    print(line % ("Stage", "Seconds", "Baseline", "Change"))
+    for name, seconds in case["seconds"].items():
+        if baseline is not None and name in baseline["seconds"]:
+            reference = baseline["seconds"][name]
+            print(line % (name, "%.4f" % seconds, "%.4f" % reference, "%+.0f%%" % (100*(seconds/max(reference, 1e-12) - 1))))
+        else:
+            print(line % (name, "%.4f" % seconds, "", ""))
+    print('-------------')
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Time the stages of the meshing on synthetic vegetation clouds of increasing sizes")
+
+    parser.add_argument("-n", "--points", help="Number of points of each synthetic cloud, ground included (default = 1e4 1e5 1e6)",
+                        nargs="+", default=[1e4, 1e5, 1e6], type=float)
+    parser.add_argument("-t", "--trees", help="Number of trees of a single synthetic cloud, instead of -n", default=None, type=int)
+    parser.add_argument("-r", "--crownradius", help="Radius of the crowns of the high vegetation (default = 3.0)", default=3.0, type=float)
+    parser.add_argument("-d", "--density", help="Number of points per square unit of crown (default = 20)", default=20.0, type=float)
+    parser.add_argument("-m", "--classmix", help="Portion of the trees in the classes 3, 4 and 5 (default = 0.1 0.2 0.7)",
+                        nargs=3, default=[0.1, 0.2, 0.7], type=float)
+    parser.add_argument("-g", "--ground", help="Portion of ground points (default = 0.2)", default=0.2, type=float)
+    parser.add_argument("-e", "--seed", help="Seed of the synthetic clouds (default = 0)", default=0, type=int)
+    parser.add_argument("-c", "--cellsize", help="Cell size (default = 2.0)", default=2.0, type=float)
+    parser.add_argument("-w", "--workers", help="Number of processes meshing the islands (default = 1)", default=1, type=int)
+    parser.add_argument("-x", "--repeat", help="Number of runs of each measure, the best time is kept (default = 1)", default=1, type=int)
+    parser.add_argument("-f", "--folder", help="Folder where the synthetic clouds are kept (default = a temporary folder, removed at the end)", default=None)
+    parser.add_argument("-o", "--output", help="Json file where the results are written (default = ./benchmark.json)", default="./benchmark.json")
+    parser.add_argument("-b", "--baseline", help="Json file of previous results, the stages slower than in it are reported", default=None)
+    parser.add_argument("-s", "--threshold", help="Relative slowdown tolerated before a stage is reported (default = 0.25)", default=0.25, type=float)
+
+    args = parser.parse_args()
+
+    if args.trees:
+        treeCounts = [args.trees]
+    else:
+        treeCounts = [treeCountFor(int(points), args.crownradius, args.density, args.classmix, args.ground) for points in args.points]
+
+    folder = args.folder or tempfile.mkdtemp(prefix="vegetation_benchmark_")
+    os.makedirs(folder, exist_ok=True)
+    results = {"settings": {"crownRadius": args.crownradius, "density": args.density, "classMix": args.classmix, "ground": args.ground,
+                            "seed": args.seed, "cellSize": args.cellsize, "workers": args.workers},
+               "cases": []}
+    try:
+        for treeCount in treeCounts:
+            input_path = os.path.join(folder, "synthetic_%d.las" % treeCount)
+            pointCount = writeSyntheticVegetation(input_path, treeCount, args.crownradius, args.density, args.classmix, args.ground, args.seed)
+            output_path = os.path.join(folder, "output_%d" % treeCount) + "/"
+            seconds, summary = benchmarkCase(input_path, output_path, pointCount, args.cellsize, args.workers, args.repeat)
+            results["cases"].append({"points": pointCount, "trees": treeCount, "islands": summary["islands"],
+                                     "processPeakMemoryMB": summary["processPeakMemoryMB"], "seconds": seconds})
+    finally:
+        if args.folder is None:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    baselineCases = {case["points"]: case for case in baseline["cases"]} if baseline else {}
+
+    for case in results["cases"]:
+        printCase(case, baselineCases.get(case["points"]))
+
+    if baseline:
+        slowdowns = compareToBaseline(results, baseline, args.threshold)
+        for points, name, reference, seconds in slowdowns:
+            print("[Slowdown] " + name + " on " + str(points) + " points : " + "%.4f" % seconds + " seconds instead of " + "%.4f" % reference)
+        if slowdowns:
+            raise SystemExit(1)
+        print("No slowdown beyond " + "%.0f%%" % (100*args.threshold))
+
+if __name__ == "__main__":
+    main()
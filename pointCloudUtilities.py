@@ -0,0 +1,910 @@
+import math
+import os
+
+import laspy
+import numpy as np
+import scipy.ndimage
+import scipy.sparse
+import scipy.sparse.csgraph
+
+
+# Standard las classes used for the vegetation (low, medium and high vegetation)
+VEGETATION_CLASSES = [3, 4, 5]
+
+
+# Number of points of a memory mapped file handled at once when no chunk size is given (see vegetationChunks)
+MAPPED_BLOCK_SIZE = 1 << 20
+
+# Point formats whose classification is the 5 low bits of 'raw_classification' (the others have a whole 'classification' byte)
+LEGACY_POINT_FORMATS = range(6)
+
+
+def mappedPointRecords(input_path):
+    """ Memory map the point records of an uncompressed las file, without reading them
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+
+    Returns
+    -------
+    records : memmap
+        The point records, as stored in the file. None when the file can't be mapped (compressed, without colors,
+        or with a point data not matching its header), it is then read with laspy
+    scales : array
+        Scales of the x, y and z coordinates
+    offsets : array
+        Offsets of the x, y and z coordinates
+    legacyClassification : bool
+        The classification is stored in the 5 low bits of 'raw_classification'
+    """
+    with laspy.open(input_path) as reader:
+        header = reader.header
+    if header.are_points_compressed:
+        return None, None, None, None
+
+    # The record length of the file may be larger than its point format, the remaining bytes being skipped
+    with open(input_path, 'rb') as f:
+        f.seek(105)
+        recordLength = int(np.frombuffer(f.read(2), '<u2')[0])
+    formatDtype = header.point_format.dtype()
+    if recordLength < formatDtype.itemsize or "red" not in formatDtype.names:
+        return None, None, None, None
+    recordDtype = np.dtype({"names": formatDtype.names, "formats": [formatDtype.fields[name][0] for name in formatDtype.names],
+                            "offsets": [formatDtype.fields[name][1] for name in formatDtype.names], "itemsize": recordLength})
+
+    pointCount = header.point_count
+    if header.offset_to_point_data + pointCount*recordLength > os.path.getsize(input_path):
+        return None, None, None, None
+
+    records = np.memmap(input_path, recordDtype, mode='r', offset=header.offset_to_point_data, shape=(pointCount,))
+    return records, np.asarray(header.scales), np.asarray(header.offsets), header.point_format.id in LEGACY_POINT_FORMATS
+
+
+def vegetationChunks(input_path, chunkSize=None):
+    """ Read the vegetation points (classes 3, 4 and 5) of a las/laz file chunk by chunk
+
+    Uncompressed files are memory mapped (see mappedPointRecords) : only the coordinates, colors and classification
+    of the points are read from the file, the other dimensions are never loaded. The other files are read with laspy,
+    in one go or with its chunk iterator.
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+    chunkSize : int
+      Number of points read at once. If None (or 0), compressed files are read in one go
+
+    Returns
+    -------
+    chunks : generator
+        For each chunk with vegetation, the x, y and z coordinates and the raw r, g and b values of its vegetation points
+    """
+    records, scales, offsets, legacyClassification = mappedPointRecords(input_path)
+    if records is not None:
+        step = chunkSize or MAPPED_BLOCK_SIZE
+        for start in range(0, len(records), step):
+            block = records[start:start+step]
+            if legacyClassification:
+                classification = block["raw_classification"] & 0x1F
+            else:
+                classification = block["classification"]
+            mask = np.isin(classification, VEGETATION_CLASSES)
+            if not np.any(mask):
+                continue
+
+            # Same arithmetic as laspy's scaled coordinates
+            points = np.stack([block[name][mask] * scales[k] + offsets[k] for k, name in enumerate("XYZ")], axis=1)
+            yield points, np.stack([block["red"][mask], block["green"][mask], block["blue"][mask]], axis=1)
+        return
+
+    if not chunkSize:
+        las = laspy.read(input_path)
+
+        # Used to filter the point cloud (needs to be classified)
+        mask = np.isin(las.classification, VEGETATION_CLASSES)
+        yield np.stack([las.x[mask], las.y[mask], las.z[mask]], axis=1), np.stack([las.red[mask], las.green[mask], las.blue[mask]], axis=1)
+        return
+
+    with laspy.open(input_path) as reader:
+        for chunk in reader.chunk_iterator(chunkSize):
+            mask = np.isin(chunk.classification, VEGETATION_CLASSES)
+            if not np.any(mask):
+                continue
+
+            yield np.stack([chunk.x[mask], chunk.y[mask], chunk.z[mask]], axis=1), np.stack([chunk.red[mask], chunk.green[mask], chunk.blue[mask]], axis=1)
+
+
+def readVegetationPoints(input_path, chunkSize=None):
+    """ Read the vegetation points (classes 3, 4 and 5) of a las/laz file
+
+    The points are read chunk by chunk (see vegetationChunks) and only the vegetation points of each chunk are kept,
+    so the peak memory depends on the amount of vegetation instead of the size of the whole file.
+    All the modes return the same arrays.
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+    chunkSize : int
+      Number of points read at once. If None (or 0), compressed files are read in one go
+
+    Returns
+    -------
+    point_data : 2d-array
+        In column, index of the point.
+        In line, array that contains the x, y and z coordinates of the point.
+    point_data_color : 2d-array
+        In column, index of the point.
+        In line, array that contains the raw r, g and b values of the point (as stored in the file).
+    """
+    pointChunks = []
+    colorChunks = []
+    for points, colors in vegetationChunks(input_path, chunkSize):
+        pointChunks.append(points)
+        colorChunks.append(colors)
+
+    if len(pointChunks) == 0:
+        return np.empty((0, 3)), np.empty((0, 3), np.uint16)
+    if len(pointChunks) == 1:
+        return pointChunks[0], colorChunks[0]
+
+    return np.concatenate(pointChunks), np.concatenate(colorChunks)
+
+
+def headerBounds(input_path):
+    """ Bounding box of the points of a las/laz file, as written in its header
+
+    The grid of cells of a file starts at the minimum of the header, in the tiled mode and the untiled one alike
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+
+    Returns
+    -------
+    mins : array
+        Minimum of the x and y coordinates
+    maxs : array
+        Maximum of the x and y coordinates
+    """
+    with laspy.open(input_path) as reader:
+        return reader.header.mins[:2], reader.header.maxs[:2]
+
+
+# Colors given to the points of the islands
+# "cell" : each point has the mean of the colors of the cell containing it
+# "point" : each point has the color provided with the LIDAR
+COLOR_MODES = ["cell", "point"]
+
+
+# Statistics that can be used to give a height to each cell of the grid
+CELL_STATISTICS = ["mean", "max", "min", "count"]
+
+
+def aggregateCells(indexes, point_data, point_data_color, point_data_color_normalized, gridShape, zStatistic="mean"):
+    """ Compute, for each cell of the grid, a height statistic, the number of points and the mean colors
+
+    The points are reduced in batch over their flattened cell id (bincount / ufunc.at) instead of
+    being added one by one to the grid.
+
+    Parameters
+    ------
+    indexes : 2d-array
+      In column, index of the point.
+      In line, the x and y index of the cell containing the point (-1 wraps to the last cell, like numpy indexing).
+    point_data : 2d-array
+      In column, index of the point.
+      In line, array that contains the x, y and z coordinates of the point.
+    point_data_color : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 255).
+    point_data_color_normalized : 2d-array
+      In column, index of the point.
+      In line, array that contains the r, g and b values of the point (between 0 and 1).
+    gridShape : tuple
+      Number of cells along the x and the y axis
+    zStatistic : str
+      Height given to a cell : "mean", "max" or "min" of the z coordinates, or "count" of points.
+      Empty cells always have a height of 0
+
+    Returns
+    -------
+    cellsZ : 2d-array
+        Height statistic of each cell
+    cellsZCount : 2d-array
+        Number of points in each cell
+    cellsColorMean : 3d-array
+        Mean of the colors (between 0 and 255) in each cell
+    cellsNormalizedColorMean : 3d-array
+        Mean of the normalized colors (between 0 and 1) in each cell
+    """
+    if zStatistic not in CELL_STATISTICS:
+        raise ValueError("Unknown cell statistic '" + str(zStatistic) + "', expected one of " + str(CELL_STATISTICS))
+
+    cellCount = gridShape[0] * gridShape[1]
+
+    # Flattened id of the cell containing each point
+    cellIds = np.ravel_multi_index((indexes[:,0], indexes[:,1]), gridShape, mode='wrap')
+
+    cellsZ, cellsZCount, cellsColorMean, cellsNormalizedColorMean = reduceCells(
+        cellIds, cellCount, point_data, point_data_color, point_data_color_normalized, zStatistic)
+
+    return (cellsZ.reshape(gridShape), cellsZCount.reshape(gridShape),
+            cellsColorMean.reshape(gridShape + (3,)), cellsNormalizedColorMean.reshape(gridShape + (3,)))
+
+
+def reduceCells(cellIds, cellCount, point_data, point_data_color, point_data_color_normalized, zStatistic="mean"):
+    """ Reduce the points over the id of their cell, see aggregateCells
+
+    Parameters
+    ------
+    cellIds : array
+      Id of the cell containing each point, between 0 and cellCount
+    cellCount : int
+      Number of cells
+
+    Returns
+    -------
+    cellsZ : array
+        Height statistic of each cell
+    cellsZCount : array
+        Number of points in each cell
+    cellsColorMean : 2d-array
+        Mean of the colors (between 0 and 255) in each cell
+    cellsNormalizedColorMean : 2d-array
+        Mean of the normalized colors (between 0 and 1) in each cell
+    """
+    cellsZCount = np.bincount(cellIds, minlength=cellCount).astype(np.float64)
+    occupied = cellsZCount > 0
+
+    if zStatistic == "mean":
+        cellsZ = np.bincount(cellIds, weights=point_data[:,2], minlength=cellCount)
+        cellsZ[occupied] /= cellsZCount[occupied]
+    elif zStatistic == "count":
+        cellsZ = cellsZCount.copy()
+    elif zStatistic == "max":
+        cellsZ = np.full(cellCount, -np.inf)
+        np.maximum.at(cellsZ, cellIds, point_data[:,2])
+        cellsZ[~occupied] = 0
+    else:
+        cellsZ = np.full(cellCount, np.inf)
+        np.minimum.at(cellsZ, cellIds, point_data[:,2])
+        cellsZ[~occupied] = 0
+
+    cellsColorMean = np.zeros((cellCount, 3))
+    cellsNormalizedColorMean = np.zeros((cellCount, 3))
+    for channel in range(3):
+        cellsColorMean[:,channel] = np.bincount(cellIds, weights=point_data_color[:,channel], minlength=cellCount)
+        cellsNormalizedColorMean[:,channel] = np.bincount(cellIds, weights=point_data_color_normalized[:,channel], minlength=cellCount)
+    cellsColorMean[occupied] /= cellsZCount[occupied, None]
+    cellsNormalizedColorMean[occupied] /= cellsZCount[occupied, None]
+
+    return cellsZ, cellsZCount, cellsColorMean, cellsNormalizedColorMean
+
+
+# Storage of the grid of cells
+# "dense" : arrays over all the cells of the bounding box
+# "sparse" : compact arrays over the occupied cells only, sorted by cell id (see aggregateSparseCells)
+# "auto" : sparse when the grid is big and at most SPARSE_GRID_OCCUPANCY of its cells can be occupied
+GRID_MODES = ["auto", "dense", "sparse"]
+
+# Maximum portion of occupied cells for which "auto" picks the sparse grid
+SPARSE_GRID_OCCUPANCY = 0.05
+
+# Number of cells under which "auto" always picks the dense grid (a few MB per array)
+SPARSE_GRID_MIN_CELLS = 1 << 20
+
+
+def gridBackend(pointCount, gridShape, gridMode="auto"):
+    """ Storage used for a grid of cells, see GRID_MODES
+
+    The number of points bounds the number of occupied cells, so that the choice is made before aggregating them.
+
+    Parameters
+    ------
+    pointCount : int
+      Number of points put in the grid
+    gridShape : tuple
+      Number of cells along the x and the y axis
+    gridMode : str
+      One of GRID_MODES
+
+    Returns
+    -------
+    backend : str
+        "dense" or "sparse"
+    """
+    if gridMode not in GRID_MODES:
+        raise ValueError("Unknown grid mode '" + str(gridMode) + "', expected one of " + str(GRID_MODES))
+    if gridMode != "auto":
+        return gridMode
+
+    cellCount = gridShape[0] * gridShape[1]
+    if cellCount >= SPARSE_GRID_MIN_CELLS and pointCount <= SPARSE_GRID_OCCUPANCY*cellCount:
+        return "sparse"
+    return "dense"
+
+
+def aggregateSparseCells(indexes, point_data, point_data_color, point_data_color_normalized, gridShape, zStatistic="mean"):
+    """ Same as aggregateCells, only over the occupied cells of the grid : the memory used grows with the number of
+    occupied cells instead of the size of the grid
+
+    Returns
+    -------
+    occupiedIds : array
+        Flattened id of each occupied cell, in increasing order
+    cellsZ : array
+        Height statistic of each occupied cell
+    cellsZCount : array
+        Number of points in each occupied cell
+    cellsColorMean : 2d-array
+        Mean of the colors (between 0 and 255) in each occupied cell
+    cellsNormalizedColorMean : 2d-array
+        Mean of the normalized colors (between 0 and 1) in each occupied cell
+    """
+    if zStatistic not in CELL_STATISTICS:
+        raise ValueError("Unknown cell statistic '" + str(zStatistic) + "', expected one of " + str(CELL_STATISTICS))
+
+    cellIds = np.ravel_multi_index((indexes[:,0], indexes[:,1]), gridShape, mode='wrap')
+    occupiedIds, pointCells = np.unique(cellIds, return_inverse=True)
+
+    return (occupiedIds,) + reduceCells(pointCells.ravel(), len(occupiedIds), point_data, point_data_color,
+                                         point_data_color_normalized, zStatistic)
+
+
+def occupiedCellIndex(occupiedIds, cellsX, cellsY, gridShape):
+    """ Look up cells of a sparse grid by their coordinates
+
+    Parameters
+    ------
+    occupiedIds : array
+      Flattened id of each occupied cell, in increasing order (see aggregateSparseCells)
+    cellsX : array
+      X index of the cells looked up
+    cellsY : array
+      Y index of the cells looked up
+    gridShape : tuple
+      Number of cells along the x and the y axis
+
+    Returns
+    -------
+    index : array
+        Index of each cell in occupiedIds, -1 if it is empty or outside of the grid
+    """
+    inside = (cellsX >= 0) & (cellsX < gridShape[0]) & (cellsY >= 0) & (cellsY < gridShape[1])
+    ids = np.where(inside, cellsX.astype(np.int64)*gridShape[1] + cellsY, -1)
+    index = np.minimum(np.searchsorted(occupiedIds, ids), max(len(occupiedIds) - 1, 0))
+    found = inside & (len(occupiedIds) > 0)
+    found[found] = occupiedIds[index[found]] == ids[found]
+    return np.where(found, index, -1)
+
+
+# Rules used to decide whether two cells belong to the same islet
+# "corner" : cells are linked when they are part of a 2x2 square of cells where at least 3 cells have a height
+# "4" / "8" : cells are linked to their 4 (sides) or 8 (sides and diagonals) neighbours that have a height
+CONNECTIVITY_MODES = ["corner", "4", "8"]
+
+
+def labelIslets(cellsZ, connectivity="corner"):
+    """ Give an islet id to each cell of the grid using connected components
+
+    Parameters
+    ------
+    cellsZ : 2d-array
+      Height of each cell, cells with a height of 0 are empty
+    connectivity : str
+      Rule used to link the cells, see CONNECTIVITY_MODES
+
+    Returns
+    -------
+    cellsIsletIndex : 2d-array
+        Islet id of each cell (from 1 to the number of islets), 0 if the cell isn't part of an islet.
+        The ids are given in the order the islets are met when going through the grid
+    isletCount : int
+        Number of islets
+    """
+    if connectivity not in CONNECTIVITY_MODES:
+        raise ValueError("Unknown connectivity '" + str(connectivity) + "', expected one of " + str(CONNECTIVITY_MODES))
+
+    if connectivity != "corner":
+        structure = scipy.ndimage.generate_binary_structure(2, 1 if connectivity == "4" else 2)
+        cellsIsletIndex, isletCount = scipy.ndimage.label(cellsZ > 0, structure)
+        return cellsIsletIndex.astype(np.int32), isletCount
+
+    width, height = cellsZ.shape
+    cellsIsletIndex = np.zeros((width, height), np.int32)
+    if width < 2 or height < 2:
+        return cellsIsletIndex, 0
+
+    filled = cellsZ > 0
+    empty = cellsZ == 0
+
+    # The four corners of each 2x2 square, the square (i, j) being made of the cells (i, j), (i+1, j), (i, j+1) and (i+1, j+1)
+    cornersFilled = [filled[:-1,:-1], filled[1:,:-1], filled[:-1,1:], filled[1:,1:]]
+    filledCount = sum(corner.astype(np.int8) for corner in cornersFilled)
+    emptyCount = empty[:-1,:-1].astype(np.int8) + empty[1:,:-1] + empty[:-1,1:] + empty[1:,1:]
+
+    # A square links its cells when the four of them have a height, or three of them and the last one is empty
+    squares = (filledCount == 4) | ((filledCount == 3) & (emptyCount == 1))
+    squareIds = np.flatnonzero(squares)
+    if len(squareIds) == 0:
+        return cellsIsletIndex, 0
+
+    # Graph linking each square to its filled corners : squares are numbered after the cells
+    squareX, squareY = np.unravel_index(squareIds, squares.shape)
+    cellCount = width * height
+    edgesFrom = []
+    edgesTo = []
+    for corner, (dx, dy) in zip(cornersFilled, [(0, 0), (1, 0), (0, 1), (1, 1)]):
+        linked = corner[squareX, squareY]
+        edgesFrom.append(cellCount + np.flatnonzero(linked))
+        edgesTo.append(np.ravel_multi_index((squareX[linked] + dx, squareY[linked] + dy), (width, height)))
+    edgesFrom = np.concatenate(edgesFrom)
+    edgesTo = np.concatenate(edgesTo)
+
+    nodeCount = cellCount + len(squareIds)
+    graph = scipy.sparse.coo_matrix((np.ones(len(edgesFrom), np.int8), (edgesFrom, edgesTo)), shape=(nodeCount, nodeCount))
+    _, components = scipy.sparse.csgraph.connected_components(graph, directed=False)
+
+    # Number the islets in the order of their first square (squares are already sorted)
+    squareComponents = components[cellCount:]
+    isletComponents, firstSquare = np.unique(squareComponents, return_index=True)
+    isletIds = np.zeros(components.max() + 1, np.int32)
+    isletIds[isletComponents[np.argsort(firstSquare)]] = np.arange(1, len(isletComponents) + 1)
+
+    linkedCells = np.unique(edgesTo)
+    cellsIsletIndex.ravel()[linkedCells] = isletIds[components[linkedCells]]
+
+    return cellsIsletIndex, len(isletComponents)
+
+
+def labelSparseIslets(occupiedIds, cellsZ, gridShape, connectivity="corner"):
+    """ Same as labelIslets, over the occupied cells of a sparse grid (see aggregateSparseCells) : the neighbours of
+    each cell are looked up in the sorted ids of the occupied cells instead of in a dense grid
+
+    Parameters
+    ------
+    occupiedIds : array
+      Flattened id of each occupied cell, in increasing order
+    cellsZ : array
+      Height of each occupied cell, cells with a height of 0 are empty
+    gridShape : tuple
+      Number of cells along the x and the y axis
+    connectivity : str
+      Rule used to link the cells, see CONNECTIVITY_MODES
+
+    Returns
+    -------
+    cellsIsletIndex : array
+        Islet id of each occupied cell, numbered like labelIslets does
+    isletCount : int
+        Number of islets
+    """
+    if connectivity not in CONNECTIVITY_MODES:
+        raise ValueError("Unknown connectivity '" + str(connectivity) + "', expected one of " + str(CONNECTIVITY_MODES))
+
+    width, height = gridShape
+    cellCount = len(occupiedIds)
+    cellsIsletIndex = np.zeros(cellCount, np.int32)
+    filled = cellsZ > 0
+    filledCells = np.flatnonzero(filled)
+    cellsX, cellsY = np.unravel_index(occupiedIds[filledCells], gridShape)
+
+    if connectivity != "corner":
+        # Filled cells linked to their filled neighbours, half of the neighbours being enough for an undirected graph
+        offsets = [(1, 0), (0, 1)] if connectivity == "4" else [(1, 0), (0, 1), (1, 1), (1, -1)]
+        edgesFrom = []
+        edgesTo = []
+        for dx, dy in offsets:
+            neighbours = occupiedCellIndex(occupiedIds, cellsX + dx, cellsY + dy, gridShape)
+            linked = neighbours >= 0
+            linked[linked] = filled[neighbours[linked]]
+            edgesFrom.append(filledCells[linked])
+            edgesTo.append(neighbours[linked])
+        edgesFrom = np.concatenate(edgesFrom)
+        edgesTo = np.concatenate(edgesTo)
+        graph = scipy.sparse.coo_matrix((np.ones(len(edgesFrom), np.int8), (edgesFrom, edgesTo)), shape=(cellCount, cellCount))
+        _, components = scipy.sparse.csgraph.connected_components(graph, directed=False)
+
+        # Number the islets in the order of their first cell, like scipy.ndimage.label
+        isletComponents, firstCell = np.unique(components[filledCells], return_index=True)
+        isletIds = np.zeros(components.max() + 1, np.int32)
+        isletIds[isletComponents[np.argsort(firstCell)]] = np.arange(1, len(isletComponents) + 1)
+        cellsIsletIndex[filledCells] = isletIds[components[filledCells]]
+        return cellsIsletIndex, len(isletComponents)
+
+    if width < 2 or height < 2:
+        return cellsIsletIndex, 0
+
+    # The squares having a filled corner, numbered like in labelIslets (square (i, j) is made of the cells (i, j), (i+1, j),
+    # (i, j+1) and (i+1, j+1))
+    squareX = np.concatenate([cellsX - dx for dx in (0, 1) for dy in (0, 1)])
+    squareY = np.concatenate([cellsY - dy for dx in (0, 1) for dy in (0, 1)])
+    valid = (squareX >= 0) & (squareX < width - 1) & (squareY >= 0) & (squareY < height - 1)
+    squareIds = np.unique(squareX[valid].astype(np.int64)*(height - 1) + squareY[valid])
+    squareX, squareY = np.unravel_index(squareIds, (width - 1, height - 1))
+
+    # State of the corners of each square : the cells that aren't occupied are empty
+    corners = [occupiedCellIndex(occupiedIds, squareX + dx, squareY + dy, gridShape) for dx, dy in [(0, 0), (1, 0), (0, 1), (1, 1)]]
+    cornersFilled = [(corner >= 0) & filled[corner] for corner in corners]
+    filledCount = sum(cornerFilled.astype(np.int8) for cornerFilled in cornersFilled)
+    emptyCount = sum(((corner < 0) | (cellsZ[corner] == 0)).astype(np.int8) for corner in corners)
+
+    # A square links its cells when the four of them have a height, or three of them and the last one is empty
+    squares = (filledCount == 4) | ((filledCount == 3) & (emptyCount == 1))
+    if not np.any(squares):
+        return cellsIsletIndex, 0
+
+    # Graph linking each square to its filled corners : squares are numbered after the cells
+    squareCount = np.count_nonzero(squares)
+    edgesFrom = []
+    edgesTo = []
+    for corner, cornerFilled in zip(corners, cornersFilled):
+        linked = cornerFilled[squares]
+        edgesFrom.append(cellCount + np.flatnonzero(linked))
+        edgesTo.append(corner[squares][linked])
+    edgesFrom = np.concatenate(edgesFrom)
+    edgesTo = np.concatenate(edgesTo)
+
+    nodeCount = cellCount + squareCount
+    graph = scipy.sparse.coo_matrix((np.ones(len(edgesFrom), np.int8), (edgesFrom, edgesTo)), shape=(nodeCount, nodeCount))
+    _, components = scipy.sparse.csgraph.connected_components(graph, directed=False)
+
+    # Number the islets in the order of their first square (squares are already sorted)
+    isletComponents, firstSquare = np.unique(components[cellCount:], return_index=True)
+    isletIds = np.zeros(components.max() + 1, np.int32)
+    isletIds[isletComponents[np.argsort(firstSquare)]] = np.arange(1, len(isletComponents) + 1)
+
+    linkedCells = np.unique(edgesTo)
+    cellsIsletIndex[linkedCells] = isletIds[components[linkedCells]]
+
+    return cellsIsletIndex, len(isletComponents)
+
+
+def partitionIslands(pointsIsletIndex):
+    """ Group the points by islet by sorting them on their islet id
+
+    Parameters
+    ------
+    pointsIsletIndex : array
+      Islet id of each point, 0 if the point isn't part of an islet
+
+    Returns
+    -------
+    order : array
+        Indexes of the points that are part of an islet, sorted by islet id.
+        Inside an islet, the points keep the order they had in the input
+    isletIds : array
+        Id of each islet, in increasing order
+    offsets : array
+        The points of the islet isletIds[k] are order[offsets[k]:offsets[k+1]]
+    """
+    order = np.argsort(pointsIsletIndex, kind='stable')
+    sortedIds = pointsIsletIndex[order]
+
+    # Points outside of any islet are sorted first
+    firstInIslet = np.searchsorted(sortedIds, 1)
+    order = order[firstInIslet:]
+    sortedIds = sortedIds[firstInIslet:]
+
+    isletIds, starts = np.unique(sortedIds, return_index=True)
+    offsets = np.append(starts, len(order))
+
+    return order, isletIds, offsets
+
+
+def heightOrder(pointsIsletIndex, points, colors):
+    """ Sort the points by islet, then by height inside each islet
+
+    The points at the same height are sorted by their y and x coordinates and their colors, so that the order
+    doesn't depend on the order of the input : the tiled mode, which reads the points tile by tile, gives the same
+    points in the same order to the meshing of an island.
+
+    Parameters
+    ------
+    pointsIsletIndex : array
+      Islet id of each point
+    points : 2d-array
+      The x, y and z coordinates of the points
+    colors : 2d-array
+      The r, g and b values of the points
+
+    Returns
+    -------
+    order : array
+        Indexes of the points, sorted
+    """
+    return np.lexsort((colors[:,2], colors[:,1], colors[:,0], points[:,0], points[:,1], points[:,2], pointsIsletIndex))
+
+
+def islandNames(cellsX, cellsY):
+    """ Names of islands in the output files : index of their first cell in the grid (smallest x, then smallest y)
+
+    The name doesn't depend on the tiling (see TiledMeshCreation), the same island always gets the same name.
+    It has no "_", so that it can't be mistaken for the number of a layer in the names of the files
+    (e.g. "alpha_x12y7_3" is the third layer of the island "x12y7").
+
+    Parameters
+    ------
+    cellsX : array
+      X index of the first cell of each island
+    cellsY : array
+      Y index of the first cell of each island
+
+    Returns
+    -------
+    names : list
+        "x<x>y<y>" for each island
+    """
+    return ["x%dy%d" % (x, y) for x, y in zip(np.asarray(cellsX).tolist(), np.asarray(cellsY).tolist())]
+
+
+def firstCells(cellsIsletIndex, isletIds, cellIds=None):
+    """ First cell of islets, the one with the smallest id
+
+    Parameters
+    ------
+    cellsIsletIndex : array
+      Islet id of the cells sorted by id (e.g. the flattened grid), 0 if the cell isn't part of an islet
+    isletIds : array
+      Ids of the islets
+    cellIds : array
+      Flattened id of the cells (e.g. the occupied cells of a sparse grid), None when it is their position
+
+    Returns
+    -------
+    firstIds : array
+        Flattened id of the first cell of each islet
+    """
+    linked = np.flatnonzero(cellsIsletIndex)
+    labels, first = np.unique(cellsIsletIndex[linked], return_index=True)
+    firstIds = np.zeros(labels.max() + 1 if len(labels) > 0 else 1, np.int64)
+    firstIds[labels] = linked[first] if cellIds is None else np.asarray(cellIds)[linked[first]]
+    return firstIds[isletIds]
+
+
+def voxelKeys(relative, voxelSize):
+    """ Key of the voxel of a regular grid containing each point
+
+    Parameters
+    ------
+    relative : 2d-array
+      The x, y and z coordinates of the points, relative to their minimum
+    voxelSize : float
+      Width of the voxels
+
+    Returns
+    -------
+    keys : array
+        Integer key of the voxel of each point, the same for the points of the same voxel
+    """
+    voxels = np.floor(relative / voxelSize).astype(np.int64)
+    shape = voxels.max(axis=0) + 1
+    if np.prod(shape.astype(np.float64)) < 2**62:
+        return np.ravel_multi_index(voxels.T, shape)
+    # Too many voxels to number them all
+    return np.unique(voxels, axis=0, return_inverse=True)[1].ravel()
+
+
+def voxelRepresentatives(points, voxelSize):
+    """ Keep one point per voxel of a regular grid : the point nearest to the centroid of the points of the voxel
+
+    Parameters
+    ------
+    points : 2d-array
+      The x, y and z coordinates of the points
+    voxelSize : float
+      Width of the voxels
+
+    Returns
+    -------
+    kept : array
+        Indexes of the kept points, in increasing order (the kept points keep their order)
+    """
+    relative = points - points.min(axis=0)
+    keys = voxelKeys(relative, voxelSize)
+
+    # Points sorted by voxel, each run of equal keys being the points of a voxel
+    order = np.argsort(keys, kind='stable')
+    sortedKeys = keys[order]
+    runs = np.cumsum(np.r_[True, sortedKeys[1:] != sortedKeys[:-1]]) - 1
+
+    counts = np.bincount(runs)
+    centroids = np.column_stack([np.bincount(runs, relative[order, axis]) for axis in range(3)]) / counts[:,None]
+    distances = np.sum((relative[order] - centroids[runs])**2, axis=1)
+
+    # Nearest point of each voxel : first of its run once sorted by distance
+    nearest = np.lexsort((distances, runs))
+    firsts = nearest[np.r_[True, runs[nearest][1:] != runs[nearest][:-1]]]
+
+    return np.sort(order[firsts])
+
+
+# Number of voxel sizes tried to get as close as possible to the point budget of an island (see downsampleIsland)
+BUDGET_SEARCH_STEPS = 8
+
+
+def downsampleIsland(islandPoints, voxelSize=None, pointBudget=None):
+    """ Choose the points of an island given to the meshing algorithms, one point per voxel (see voxelRepresentatives)
+
+    The points are kept, not averaged, so that each of them keeps its color and the envelope isn't shrunk.
+    With a point budget, the voxels are enlarged (starting from voxelSize) until the island fits in the budget,
+    then the size is refined to keep as many points as the budget allows.
+
+    Parameters
+    ------
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island
+    voxelSize : float
+      Width of the voxels, None to only apply the budget
+    pointBudget : int
+      Maximum number of points of the island, None for no maximum
+
+    Returns
+    -------
+    kept : array
+        Indexes of the kept points, in increasing order
+    """
+    if len(islandPoints) == 0 or not (voxelSize or (pointBudget and len(islandPoints) > pointBudget)):
+        return np.arange(len(islandPoints))
+
+    relative = islandPoints - islandPoints.min(axis=0)
+
+    def voxelCount(size):
+        return len(np.unique(voxelKeys(relative, size)))
+
+    size = voxelSize
+    if pointBudget and (not voxelSize or voxelCount(voxelSize) > pointBudget):
+        # First guess : voxels of the volume of the bounding box divided by the budget
+        extent = relative.max(axis=0)
+        extent = np.maximum(extent, extent.max()*1e-3)
+        fitting = max(voxelSize or 0, (np.prod(extent)/pointBudget)**(1/3))
+        tooFine = voxelSize or 0
+
+        # Enlarge the voxels until the island fits (a single voxel always does)
+        while voxelCount(fitting) > pointBudget:
+            tooFine = fitting
+            fitting *= 2
+
+        # Then get closer to the budget between the sizes keeping too many points and the size fitting in it
+        if tooFine == 0:
+            tooFine = fitting/2**BUDGET_SEARCH_STEPS
+        for _ in range(BUDGET_SEARCH_STEPS):
+            middle = math.sqrt(tooFine*fitting)
+            if voxelCount(middle) > pointBudget:
+                tooFine = middle
+            else:
+                fitting = middle
+        size = fitting
+
+    return voxelRepresentatives(islandPoints, size)
+
+
+# Layout of the points written in the tile files : coordinates and raw colors
+TILE_POINT_DTYPE = np.dtype([('position', '<f8', 3), ('color', '<u2', 3)])
+
+
+def tilePath(folder, tile):
+    """ Path of the file containing the points of a tile
+
+    Parameters
+    ------
+    folder : str
+      Folder containing the tile files
+    tile : tuple
+      The x and y index of the tile
+
+    Returns
+    -------
+    path : str
+        Path of the tile file
+    """
+    return os.path.join(folder, "tile_%d_%d.bin" % tile)
+
+
+def bucketVegetationPoints(input_path, origin, tileExtent, folder, chunkSize=1000000):
+    """ Stream the vegetation points of a las/laz file and write them in one file per tile
+
+    Only one chunk of points is in memory at once, so any size of file can be split.
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+    origin : array
+      The x and y coordinates of the corner of the tile (0, 0)
+    tileExtent : float
+      Width and height of a tile
+    folder : str
+      Folder where the tile files are written (see tilePath and TILE_POINT_DTYPE)
+    chunkSize : int
+      Number of points read at once
+
+    Returns
+    -------
+    tiles : list
+        The x and y index of the tiles containing at least one point
+    pointCount : int
+        Number of vegetation points
+    maxColor : int
+        Highest value of the raw colors, to know whether they are coded on 8 or 16 bits
+    """
+    tiles = set()
+    pointCount = 0
+    maxColor = 0
+
+    for chunkPoints, chunkColors in vegetationChunks(input_path, chunkSize):
+        points = np.empty(len(chunkPoints), TILE_POINT_DTYPE)
+        points['position'] = chunkPoints
+        points['color'] = chunkColors
+        pointCount += len(points)
+        maxColor = max(maxColor, int(points['color'].max()))
+
+        tileX = np.floor((points['position'][:,0] - origin[0]) / tileExtent).astype(np.int64)
+        tileY = np.floor((points['position'][:,1] - origin[1]) / tileExtent).astype(np.int64)
+
+        # Group the points of the chunk by tile and append each group to its file
+        order = np.lexsort((tileY, tileX))
+        tileX = tileX[order]
+        tileY = tileY[order]
+        starts = np.flatnonzero(np.r_[True, (np.diff(tileX) != 0) | (np.diff(tileY) != 0)])
+        ends = np.append(starts[1:], len(order))
+        for start, end in zip(starts, ends):
+            tile = (int(tileX[start]), int(tileY[start]))
+            tiles.add(tile)
+            with open(tilePath(folder, tile), 'ab') as f:
+                points[order[start:end]].tofile(f)
+
+    return sorted(tiles), pointCount, maxColor
+
+
+def readTilePoints(folder, tiles, tileExtent, origin, bounds):
+    """ Read the points of the tile files lying inside a rectangle
+
+    The tile files are memory mapped, so only the points inside the rectangle are copied in memory.
+
+    Parameters
+    ------
+    folder : str
+      Folder containing the tile files
+    tiles : set
+      The x and y index of the tiles having a file
+    tileExtent : float
+      Width and height of a tile
+    origin : array
+      The x and y coordinates of the corner of the tile (0, 0)
+    bounds : tuple
+      Rectangle (xmin, ymin, xmax, ymax) to read, the maximums are excluded
+
+    Returns
+    -------
+    point_data : 2d-array
+        The x, y and z coordinates of the points
+    point_data_color : 2d-array
+        The raw r, g and b values of the points (as stored in the file)
+    """
+    xmin, ymin, xmax, ymax = bounds
+    pointChunks = []
+    colorChunks = []
+
+    for tileX in range(math.floor((xmin - origin[0]) / tileExtent), math.floor((xmax - origin[0]) / tileExtent) + 1):
+        for tileY in range(math.floor((ymin - origin[1]) / tileExtent), math.floor((ymax - origin[1]) / tileExtent) + 1):
+            if (tileX, tileY) not in tiles:
+                continue
+
+            points = np.memmap(tilePath(folder, (tileX, tileY)), TILE_POINT_DTYPE, mode='r')
+            x = points['position'][:,0]
+            y = points['position'][:,1]
+            inside = np.flatnonzero((x >= xmin) & (x < xmax) & (y >= ymin) & (y < ymax))
+
+            pointChunks.append(np.array(points['position'][inside]))
+            colorChunks.append(np.array(points['color'][inside]))
+            del points
+
+    if len(pointChunks) == 0:
+        return np.empty((0, 3)), np.empty((0, 3), np.uint16)
+
+    return np.concatenate(pointChunks), np.concatenate(colorChunks)
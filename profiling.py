@@ -0,0 +1,305 @@
+import contextlib
+import json
+import logging
+import re
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory isn't reported there
+    resource = None
+
+
+# Same logger as meshCreation
+log = logging.getLogger("my-logger")
+
+# Name of the report written in the output folder by a profiled run
+PROFILE_NAME = "profile.json"
+
+# Profile of the run in the current process, None when the run isn't profiled (see startProfile)
+profile = None
+
+# Work on an island in progress in the current process, see islandWork
+currentWork = None
+
+
+def startProfile():
+    """ Start recording the spans and the islands of a run in the current process """
+    global profile
+    profile = {"spans": {}, "work": [], "islands": {}, "cached": []}
+
+
+def stopProfile():
+    """ Stop recording
+
+    Returns
+    -------
+    profile : dict
+        What was recorded since startProfile, None if nothing was
+    """
+    global profile
+    records, profile = profile, None
+    return records
+
+
+def peakMemory():
+    """ Peak resident memory of the current process so far
+
+    It is the high-water mark of the whole process since it started : it never decreases, and a stage only raises it
+    when it uses more memory than all the stages before it.
+
+    Returns
+    -------
+    peak : float
+        In MB, None when it can't be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024*1024 if sys.platform == "darwin" else 1024)
+
+
+def addSpan(spans, name, calls, wallSeconds, cpuSeconds, peak, errors=0):
+    """ Add calls of a span to the spans of a profile : the times and the errors are summed and the peak memory
+    of the process (see peakMemory) is the maximum """
+    total = spans.setdefault(name, {"calls": 0, "errors": 0, "wallSeconds": 0.0, "cpuSeconds": 0.0, "processPeakMemoryMB": None})
+    total["calls"] += calls
+    total["errors"] += errors
+    total["wallSeconds"] += wallSeconds
+    total["cpuSeconds"] += cpuSeconds
+    if peak is not None:
+        total["processPeakMemoryMB"] = max(total["processPeakMemoryMB"] or 0, peak)
+
+
+@contextlib.contextmanager
+def span(name):
+    """ Time a stage of the run, logged at its start and its end
+
+    When the run is profiled, its wall time, CPU time and the peak memory of the process at its end (see peakMemory)
+    are added to the profile, the calls of the spans with the same name being summed. A call stopped by an exception
+    is recorded too, and counted in the "errors" of the span.
+
+    Parameters
+    ------
+    name : str
+      Name of the stage
+    """
+    log.info("Starting " + name)
+    wallStart = time.perf_counter()
+    cpuStart = time.process_time()
+    failed = True
+
+    try:
+        yield
+        failed = False
+    finally:
+        wallSeconds = time.perf_counter() - wallStart
+        if failed:
+            log.info("Stopped " + name + " by an error after " + str(wallSeconds) + " seconds")
+        else:
+            log.info("Finished " + name + " in " + str(wallSeconds) + " seconds") # time in seconds
+        if profile is not None:
+            addSpan(profile["spans"], name, 1, wallSeconds, time.process_time() - cpuStart, peakMemory(), int(failed))
+
+
+@contextlib.contextmanager
+def islandWork(name):
+    """ Count, when the run is profiled, the time spent meshing an island and the vertices and faces
+    of the meshes written meanwhile (see recordMesh)
+
+    Parameters
+    ------
+    name : str
+      Name of the island
+    """
+    global currentWork
+    if profile is None:
+        yield
+        return
+
+    work = {"island": str(name), "vertices": 0, "faces": 0, "seconds": 0.0}
+    previous, currentWork = currentWork, work
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        work["seconds"] = time.perf_counter() - start
+        currentWork = previous
+        profile["work"].append(work)
+
+
+def recordMesh(vertexCount, faceCount):
+    """ Count a mesh written for the island in progress, see islandWork
+
+    Parameters
+    ------
+    vertexCount : int
+      Number of vertices of the mesh
+    faceCount : int
+      Number of faces of the mesh
+    """
+    if currentWork is not None:
+        currentWork["vertices"] += int(vertexCount)
+        currentWork["faces"] += int(faceCount)
+
+
+def recordIsland(name, points, cells, choice, dropped=0):
+    """ Record an island of the run, when it is profiled
+
+    Parameters
+    ------
+    name : str
+      Name of the island
+    points : int
+      Number of points given to the meshing
+    cells : int
+      Number of cells the island is spanning
+    choice : str
+      Summary of the meshing of the island (see meshCreation.islandMeshes)
+    dropped : int
+      Number of points dropped by the downsampling
+    """
+    if profile is not None:
+        profile["islands"][str(name)] = {"points": int(points), "dropped": int(dropped), "cells": int(cells), "choice": choice}
+
+
+def recordCachedIsland(name):
+    """ Record that the meshes of an island were taken from the cache, when the run is profiled """
+    if profile is not None:
+        profile["cached"].append(str(name))
+
+
+def takeRecords():
+    """ Take what was recorded by a worker process, to send it to the main process (see mergeRecords)
+
+    Returns
+    -------
+    records : dict
+        The records, None if the run isn't profiled
+    """
+    if profile is None:
+        return None
+    records = stopProfile()
+    startProfile()
+    return records
+
+
+def mergeRecords(records):
+    """ Add the records of a worker process (see takeRecords) to the profile of the current process
+
+    Parameters
+    ------
+    records : dict
+      The records, None for nothing
+    """
+    if profile is None or records is None:
+        return
+    for name, total in records["spans"].items():
+        addSpan(profile["spans"], name, total["calls"], total["wallSeconds"], total["cpuSeconds"], total["processPeakMemoryMB"], total["errors"])
+    profile["work"].extend(records["work"])
+    profile["islands"].update(records["islands"])
+    profile["cached"].extend(records["cached"])
+
+
+def profiledCall(function, *args):
+    """ Call a function inside a worker process
+
+    Returns
+    -------
+    result
+        What the function returns
+    records : dict
+        What was recorded during the call, see takeRecords
+    """
+    return function(*args), takeRecords()
+
+
+def mergeResults(results):
+    """ Merge the records of calls made through profiledCall and keep their results
+
+    Parameters
+    ------
+    results : iterable
+      Result and records of each call
+
+    Returns
+    -------
+    results : list
+        Result of each call
+    """
+    merged = []
+    for result, records in results:
+        mergeRecords(records)
+        merged.append(result)
+    return merged
+
+
+def choiceAttempts(choice):
+    """ Read the algorithms tried on an island from its summary (see meshCreation.islandMeshes)
+
+    Parameters
+    ------
+    choice : str
+      Summary of the island, e.g. "120 sliced alpha shape ERROR alpha shape OK"
+
+    Returns
+    -------
+    algorithm : str
+        Algorithm that made the meshes, None if there are none
+    fallbacks : list
+        Algorithms that failed before it
+    """
+    words = choice.strip().split(" ", 1)
+    if len(words) < 2:
+        return None, []
+
+    # Each algorithm is followed by its outcome, except the last one when there was no fallback
+    parts = re.split(r" (ERROR|OK)(?: |$)", words[1])
+    attempts = []
+    for k in range(0, len(parts), 2):
+        if parts[k]:
+            attempts.append((parts[k], parts[k+1] if k+1 < len(parts) else "OK"))
+
+    failed = [algorithm for algorithm, outcome in attempts if outcome == "ERROR"]
+    succeeded = [algorithm for algorithm, outcome in attempts if outcome == "OK"]
+    return (succeeded[-1] if succeeded else None), failed
+
+
+def writeReport(path, summary):
+    """ Write the report of a profiled run as json : the summary of the run, the spans and a table of the islands
+
+    Parameters
+    ------
+    path : str
+      Path of the report
+    summary : dict
+      Summary of the run (number of points, islands, seconds...)
+    """
+    if profile is None:
+        return
+
+    work = {}
+    for entry in profile["work"]:
+        total = work.setdefault(entry["island"], {"vertices": 0, "faces": 0, "seconds": 0.0})
+        for key in total:
+            total[key] += entry[key]
+
+    cached = set(profile["cached"])
+    islands = []
+    for name, island in profile["islands"].items():
+        algorithm, fallbacks = choiceAttempts(island["choice"])
+        total = work.get(name, {"vertices": 0, "faces": 0, "seconds": 0.0})
+        islands.append({"island": name, "points": island["points"], "dropped": island["dropped"], "cells": island["cells"],
+                        "algorithm": algorithm, "fallbacks": fallbacks, "cached": name in cached,
+                        "vertices": total["vertices"], "faces": total["faces"], "seconds": total["seconds"]})
+
+    report = {
+        "summary": dict(summary, processPeakMemoryMB=peakMemory()),
+        "spans": [dict(name=name, **total) for name, total in profile["spans"].items()],
+        "islands": islands
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1)
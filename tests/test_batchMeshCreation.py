@@ -0,0 +1,13 @@
+import batchMeshCreation as BatchMeshCreation
+
+
+def testListInputFiles(tmp_path):
+    for name in ["b.laz", "a.las", "notes.txt"]:
+        (tmp_path / name).write_bytes(b"")
+    folder = str(tmp_path)
+
+    assert BatchMeshCreation.listInputFiles(folder) == [str(tmp_path / "a.las"), str(tmp_path / "b.laz")]
+    assert BatchMeshCreation.listInputFiles(folder + "/*.laz") == [str(tmp_path / "b.laz")]
+    assert BatchMeshCreation.listInputFiles(folder + "/a.las") == [str(tmp_path / "a.las")]
+    assert BatchMeshCreation.listInputFiles(folder + "/missing.las") == []
+    assert BatchMeshCreation.listInputFiles(folder + "/*.ply") == []
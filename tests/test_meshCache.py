@@ -0,0 +1,104 @@
+import filecmp
+import json
+import os
+
+import pytest
+
+import meshCache as MeshCache
+import meshCreation
+import pipelineBenchmark
+
+
+@pytest.fixture(scope="module")
+def syntheticLas(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("input") / "vegetation.las")
+    pipelineBenchmark.writeSyntheticVegetation(path, pipelineBenchmark.treeCountFor(10000), seed=2)
+    return path
+
+
+def cachedRun(input_path, output_path, cache, **options):
+    meshCreation.vegetationToMesh(input_path, output_path, 2.0, False, cacheFolder=cache, alphaEngine="native", profile=True, **options)
+    with open(output_path + "profile.json") as f:
+        islands = json.load(f)["islands"]
+    assert len(islands) > 0
+    return [island["cached"] for island in islands]
+
+
+def meshFiles(folder):
+    return sorted(file for file in os.listdir(folder) if file not in ("profile.json", MeshCache.MANIFEST_NAME))
+
+
+def testSecondRunHitsTheCache(syntheticLas, tmp_path):
+    cache = str(tmp_path / "cache")
+    first = str(tmp_path / "first") + "/"
+    second = str(tmp_path / "second") + "/"
+    assert not any(cachedRun(syntheticLas, first, cache))
+
+    # From the cache into a new output folder, then from the manifest of the output folder itself
+    assert all(cachedRun(syntheticLas, second, cache))
+    assert all(cachedRun(syntheticLas, first, cache))
+
+    files = meshFiles(first)
+    assert meshFiles(second) == files
+    assert filecmp.cmpfiles(first, second, files, shallow=False)[0] == files
+
+
+def testChangedParameterMissesTheCache(syntheticLas, tmp_path):
+    cache = str(tmp_path / "cache")
+    output = str(tmp_path / "output") + "/"
+    cachedRun(syntheticLas, output, cache)
+
+    assert not any(cachedRun(syntheticLas, output, cache, nbLayers=4))
+    assert not any(cachedRun(syntheticLas, str(tmp_path / "other") + "/", cache, nbLayers=3))
+
+
+def testChangedAlgorithmVersionMissesTheCache(syntheticLas, tmp_path, monkeypatch):
+    cache = str(tmp_path / "cache")
+    output = str(tmp_path / "output") + "/"
+    cachedRun(syntheticLas, output, cache)
+
+    # Neither the manifest of the output folder nor the entries of the cache are used
+    monkeypatch.setattr(MeshCache, "ALGORITHM_VERSION", MeshCache.ALGORITHM_VERSION + 1)
+    assert not any(cachedRun(syntheticLas, output, cache))
+
+
+def writeEntry(folder, name, size, lastUse):
+    os.makedirs(os.path.join(folder, name))
+    with open(os.path.join(folder, name, MeshCache.ENTRY_NAME), 'wb') as f:
+        f.write(b"0" * size)
+    os.utime(os.path.join(folder, name), (lastUse, lastUse))
+
+
+def folderSize(folder):
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(folder) for file in files)
+
+
+def testEvictionKeepsTheCacheWithinItsSize(tmp_path):
+    folder = str(tmp_path / "cache")
+    for k in range(10):
+        writeEntry(folder, "entry%d" % k, 1000, 1000000 + k)
+
+    MeshCache.evictCache(folder, 4500)
+
+    # The least recently used entries are removed first
+    assert folderSize(folder) <= 4500
+    assert sorted(os.listdir(folder)) == ["entry%d" % k for k in range(6, 10)]
+
+
+def testEvictionNeverDeletesFilesOutsideTheCache(tmp_path):
+    folder = str(tmp_path / "cache")
+    writeEntry(folder, "entry", 1000, 1000000)
+
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "mesh.obj").write_bytes(b"0" * 1000)
+    (tmp_path / "next to the cache.obj").write_bytes(b"0" * 1000)
+    (tmp_path / "cache" / "notes.txt").write_bytes(b"0" * 1000)
+    (tmp_path / "cache" / "entry.tmp123").mkdir()
+    os.symlink(str(outside), os.path.join(folder, "link"))
+
+    MeshCache.evictCache(folder, 0)
+
+    assert sorted(os.listdir(folder)) == ["entry.tmp123", "link", "notes.txt"]
+    assert (outside / "mesh.obj").is_file()
+    assert (tmp_path / "next to the cache.obj").is_file()
@@ -0,0 +1,16 @@
+import numpy as np
+
+import meshCreation
+import meshCreationUtilities as MeshUtilities
+
+
+def testExtrudedAlphaShapeFallsBackToConvexHull(monkeypatch):
+    def failingTriangulation(*args):
+        raise ValueError("triangulate(): the polygon isn't simple")
+    monkeypatch.setattr(MeshUtilities, "extruded2DAlphaShapeMesh", failingTriangulation)
+
+    points = np.random.default_rng(0).random((200, 3)) * [100, 100, 10]
+    colors = np.zeros((len(points), 3))
+    meshes, choice = meshCreation.islandMeshes(7, points, colors, meshCreation.EXTRUDED_MIN_SIZE + 1)
+    assert [mesh["name"] for mesh in meshes] == ["hull_7"]
+    assert choice == str(meshCreation.EXTRUDED_MIN_SIZE + 1) + " extruded alpha shape ERROR convex hull OK\n"
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import meshCreationUtilities as MeshUtilities
+
+
+def randomCloud(seed, pointCount=400, dimension=3):
+    """ Random points in two clusters (so that the alpha shape has several parts), and their alpha (see computeAlpha) """
+    rng = np.random.default_rng(seed)
+    points = np.vstack([rng.normal(0, 1, (pointCount // 2, dimension)), rng.normal(6, 1, (pointCount - pointCount // 2, dimension))])
+    return points, MeshUtilities.computeAlpha(np.column_stack([points, np.zeros((len(points), 3 - dimension))]) if dimension == 2 else points)
+
+
+def directedEdges(faces):
+    """ Directed edges of triangles (or the edges themselves), as a set of (start, end) """
+    faces = np.asarray(faces)
+    edges = np.vstack([faces[:, [k, (k + 1) % faces.shape[1]]] for k in range(faces.shape[1])]) if faces.shape[1] == 3 else faces
+    return [tuple(edge) for edge in edges]
+
+
+def undirectedEdgeCounts(faces):
+    """ Number of triangles using each edge, whatever its direction """
+    edges, counts = np.unique(np.sort(directedEdges(faces), axis=1), axis=0, return_counts=True)
+    return edges, counts
+
+
+def assertClosed(faces):
+    """ Each directed edge is met once, and its reverse once : the boundary is closed and consistently oriented """
+    edges = directedEdges(faces)
+    assert len(set(edges)) == len(edges)
+    assert set(edges) == {(b, a) for a, b in edges}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def testAlphaComplex3DBoundaryIsClosed(seed):
+    points, alpha = randomCloud(seed)
+    boundary, simplices = MeshUtilities.alphaComplex(points, alpha)
+    assert len(boundary) > 0
+    assertClosed(boundary)
+
+    # The boundary faces outward : the volume it encloses is the volume of the kept tetrahedra
+    a, b, c = points[boundary[:,0]], points[boundary[:,1]], points[boundary[:,2]]
+    enclosed = np.einsum("ij,ij->i", a, np.cross(b, c)).sum() / 6
+    p = points[simplices]
+    tetrahedra = np.abs(np.einsum("ij,ij->i", p[:,1] - p[:,0], np.cross(p[:,2] - p[:,0], p[:,3] - p[:,0]))).sum() / 6
+    assert enclosed == pytest.approx(tetrahedra)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def testAlphaComplex2DBoundaryIsClosed(seed):
+    points, alpha = randomCloud(seed, dimension=2)
+    boundary, simplices = MeshUtilities.alphaComplex(points, alpha)
+    assert len(boundary) > 0
+
+    # Each vertex of the outline starts as many edges as it ends
+    starts = np.bincount(boundary[:,0], minlength=len(points))
+    ends = np.bincount(boundary[:,1], minlength=len(points))
+    assert np.array_equal(starts, ends)
+
+    # The shape is on the left of the edges : they enclose the area of the kept triangles
+    a, b = points[boundary[:,0]], points[boundary[:,1]]
+    enclosed = (a[:,0] * b[:,1] - b[:,0] * a[:,1]).sum() / 2
+    p = points[simplices]
+    triangles = ((p[:,1,0] - p[:,0,0]) * (p[:,2,1] - p[:,0,1]) - (p[:,1,1] - p[:,0,1]) * (p[:,2,0] - p[:,0,0])) / 2
+    assert np.all(triangles > 0)
+    assert enclosed == pytest.approx(triangles.sum())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def testNativeAlphaShapeMeshReferencesEveryVertex(seed):
+    points, alpha = randomCloud(seed)
+    colors = np.random.default_rng(seed).random((len(points), 3))
+    vertices, vertexColors, faces = MeshUtilities.alphaShapeMesh(points, alpha, colors, alphaEngine="native")
+    assert len(vertices) == len(vertexColors)
+    assert np.array_equal(np.unique(faces), np.arange(len(vertices)))
+
+    # The normals are fixed afterwards (see normalsMode), only the closure of the surface is checked here
+    _, counts = undirectedEdgeCounts(faces)
+    assert np.all(counts % 2 == 0)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def testNativeExtrudedAlphaShapeMeshReferencesEveryVertex(seed):
+    points, alpha = randomCloud(seed)
+    vertices, _, faces = MeshUtilities.extruded2DAlphaShapeMesh(points, np.zeros((len(points), 3)), alpha, "native")
+    assert np.array_equal(np.unique(faces), np.arange(len(vertices)))
+
+    # The extrusion has no bottom : the top and the sides are closed, except along the bottom outline
+    edges, counts = undirectedEdgeCounts(faces)
+    assert np.any(counts % 2 == 1)
+    assert np.all(vertices[edges[counts % 2 == 1], 2] == points[:,2].min())
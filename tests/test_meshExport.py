@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+import trimesh
+
+import meshExport as MeshExport
+import meshCreationUtilities as MeshUtilities
+
+
+def testEmptyMeshIsNotWrittenAsGLB(tmp_path):
+    path = str(tmp_path / "empty.glb")
+    with pytest.raises(ValueError):
+        MeshExport.writeGLB(path, np.zeros((3, 3)), np.zeros((3, 3)), np.zeros((0, 3), int))
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("meshFormat", MeshExport.MESH_FORMATS)
+def testMeshWithoutTrianglesHasNoFile(tmp_path, meshFormat):
+    path = str(tmp_path / ("alpha_x0y0_1." + meshFormat))
+    MeshUtilities.writeMeshLods(path, np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3), int), [0.5])
+    assert os.listdir(tmp_path) == []
+
+
+def sampleMesh():
+    rng = np.random.default_rng(3)
+    hull = trimesh.convex.convex_hull(rng.random((60, 3)) * [20, 20, 8])
+    # Georeferenced coordinates, as in the las files
+    vertices = np.asarray(hull.vertices) + [843210.0, 6519870.0, 210.0]
+    colors = rng.integers(0, 256, (len(vertices), 3)) / 255
+    return vertices, colors, np.asarray(hull.faces)
+
+
+@pytest.mark.parametrize("meshFormat", MeshExport.MESH_FORMATS)
+def testMeshRoundTripsThroughTrimesh(tmp_path, meshFormat):
+    vertices, colors, faces = sampleMesh()
+    path = str(tmp_path / ("mesh." + meshFormat))
+    MeshExport.writeMesh(path, vertices, colors, faces)
+
+    mesh = trimesh.load(path, force="mesh", process=False, maintain_order=True)
+    expected = vertices
+    tolerance = 1e-6
+    if meshFormat == "glb":
+        # Stored in y-up as float32 around a local origin, the translation of the node
+        expected = MeshExport.toYUp(vertices)
+        tolerance = 1e-3
+    elif meshFormat == "ply":
+        # Stored as float32 around the local origin written in the header
+        with open(path, 'rb') as f:
+            origin = [line for line in f if line.startswith(b"comment origin ")][0].split()[2:]
+        expected = vertices - np.array(origin, np.float64)
+        tolerance = 1e-3
+
+    assert np.abs(np.asarray(mesh.vertices) - expected).max() < tolerance
+    assert np.array_equal(np.asarray(mesh.faces), faces)
+    assert np.array_equal(np.asarray(mesh.visual.vertex_colors)[:,:3], MeshExport.colorsToBytes(colors).reshape(-1, 3))
@@ -0,0 +1,335 @@
+import laspy
+import numpy as np
+import pytest
+
+import pointCloudUtilities as PointCloudUtilities
+
+
+def legacyIsletLabels(cellsZmean):
+    """ Islet id of each cell computed by the tagging loop of the first version of meshCreation (kept as the reference
+    of labelIslets, comments removed). The ids differ, the cells grouped together must be the same
+    """
+    cellsIsletIndex = np.zeros(cellsZmean.shape, np.int32)
+    index_islet = 1
+    for i in range(cellsZmean.shape[0]-1):
+        for j in range(cellsZmean.shape[1]-1):
+            if (cellsZmean[i][j] > 0 and cellsZmean[i+1][j] > 0 and cellsZmean[i+1][j+1] > 0 and cellsZmean[i][j+1] > 0):
+                if(cellsIsletIndex[i][j] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
+                elif(cellsIsletIndex[i+1][j] != 0):
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
+                elif(cellsIsletIndex[i][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
+                elif(cellsIsletIndex[i+1][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j+1]
+                else :
+                    cellsIsletIndex[i][j] = index_islet
+                    cellsIsletIndex[i+1][j] = index_islet
+                    cellsIsletIndex[i][j+1] = index_islet
+                    cellsIsletIndex[i+1][j+1] = index_islet
+                    index_islet += 1
+            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) == 0):
+                if(cellsIsletIndex[i][j] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
+                elif(cellsIsletIndex[i+1][j] != 0):
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
+                elif(cellsIsletIndex[i+1][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j+1]
+                else :
+                    cellsIsletIndex[i][j] = index_islet
+                    cellsIsletIndex[i+1][j] = index_islet
+                    cellsIsletIndex[i+1][j+1] = index_islet
+                    index_islet += 1
+            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) == 0 and (cellsZmean[i][j+1]) > 0):
+                if(cellsIsletIndex[i][j] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
+                elif(cellsIsletIndex[i+1][j] != 0):
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
+                elif(cellsIsletIndex[i][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
+                    cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
+                    cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
+                else :
+                    cellsIsletIndex[i][j] = index_islet
+                    cellsIsletIndex[i+1][j] = index_islet
+                    cellsIsletIndex[i][j+1] = index_islet
+                    index_islet += 1
+            elif ((cellsZmean[i][j]) > 0 and (cellsZmean[i+1][j]) == 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) > 0):
+                if(cellsIsletIndex[i][j] != 0):
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j]
+                elif(cellsIsletIndex[i][j+1] != 0):
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i][j+1]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
+                elif(cellsIsletIndex[i+1][j+1] != 0):
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
+                    if(cellsIsletIndex[i][j] != 0 and cellsIsletIndex[i][j] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i][j] = cellsIsletIndex[i+1][j+1]
+                else :
+                    cellsIsletIndex[i][j] = index_islet
+                    cellsIsletIndex[i][j+1] = index_islet
+                    cellsIsletIndex[i+1][j+1] = index_islet
+                    index_islet += 1
+            elif ((cellsZmean[i][j]) == 0 and (cellsZmean[i+1][j]) > 0 and (cellsZmean[i+1][j+1]) > 0 and (cellsZmean[i][j+1]) > 0):
+                if(cellsIsletIndex[i+1][j] != 0):
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i+1][j]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i+1][j]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i+1][j]
+                elif(cellsIsletIndex[i][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i][j+1]
+                    if(cellsIsletIndex[i+1][j+1] != 0 and cellsIsletIndex[i+1][j+1] != cellsIsletIndex[i][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j+1]] = cellsIsletIndex[i][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j+1] = cellsIsletIndex[i][j+1]
+                elif(cellsIsletIndex[i+1][j+1] != 0):
+                    if(cellsIsletIndex[i+1][j] != 0 and cellsIsletIndex[i+1][j] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i+1][j]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
+                    if(cellsIsletIndex[i][j+1] != 0 and cellsIsletIndex[i][j+1] != cellsIsletIndex[i+1][j+1]):
+                        cellsIsletIndex[cellsIsletIndex==cellsIsletIndex[i][j+1]] = cellsIsletIndex[i+1][j+1]
+                    else:
+                        cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
+                    cellsIsletIndex[i+1][j] = cellsIsletIndex[i+1][j+1]
+                    cellsIsletIndex[i][j+1] = cellsIsletIndex[i+1][j+1]
+                else :
+                    cellsIsletIndex[i+1][j] = index_islet
+                    cellsIsletIndex[i][j+1] = index_islet
+                    cellsIsletIndex[i+1][j+1] = index_islet
+                    index_islet += 1
+    return cellsIsletIndex
+
+
+def isletCells(cellsIsletIndex):
+    """ Cells of each islet, as a sorted list of tuples of flattened cell ids (independent of the numbering of the islets) """
+    labels = cellsIsletIndex.ravel()
+    cells = np.flatnonzero(labels)
+    return sorted(tuple(cells[labels[cells] == label]) for label in np.unique(labels[cells]))
+
+
+def randomGrid(rng, maxSize=15):
+    """ Heights of a random grid, each cell being empty (0) with a random probability """
+    shape = tuple(rng.integers(2, maxSize, 2))
+    return np.where(rng.random(shape) < rng.uniform(0.2, 0.9), rng.uniform(1, 5, shape), 0)
+
+
+def testLabelIsletsMatchesLegacyLoop():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        cellsZ = randomGrid(rng)
+        cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(cellsZ)
+        assert isletCells(cellsIsletIndex) == isletCells(legacyIsletLabels(cellsZ))
+        assert isletCount == len(np.unique(cellsIsletIndex[cellsIsletIndex > 0]))
+
+
+def testLabelIsletsNumbersIsletsInScanOrder():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(randomGrid(rng))
+        labels = cellsIsletIndex.ravel()
+        firstMet = labels[labels > 0][np.sort(np.unique(labels[labels > 0], return_index=True)[1])]
+        assert list(firstMet) == list(range(1, isletCount + 1))
+
+
+def testLabelSparseIsletsMatchesDenseGrid():
+    rng = np.random.default_rng(2)
+    for connectivity in PointCloudUtilities.CONNECTIVITY_MODES:
+        for _ in range(100):
+            cellsZ = randomGrid(rng, 30)
+            occupiedIds = np.flatnonzero(cellsZ)
+            cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(cellsZ, connectivity)
+            sparseIsletIndex, sparseIsletCount = PointCloudUtilities.labelSparseIslets(occupiedIds, cellsZ.ravel()[occupiedIds], cellsZ.shape, connectivity)
+            assert sparseIsletCount == isletCount
+            assert np.array_equal(sparseIsletIndex, cellsIsletIndex.ravel()[occupiedIds])
+
+
+def testOccupiedCellIndex():
+    occupiedIds = np.array([1, 5, 6, 11])
+    cellsX = np.array([0, 1, 1, 2, 2, -1, 3])
+    cellsY = np.array([1, 1, 0, 3, 2, 0, 0])
+    # Grid of 3x4 cells : the cell (x, y) has the id x*4 + y
+    assert list(PointCloudUtilities.occupiedCellIndex(occupiedIds, cellsX, cellsY, (3, 4))) == [0, 1, -1, 3, -1, -1, -1]
+
+
+def testFirstCellsOfDenseAndSparseGrids():
+    rng = np.random.default_rng(3)
+    for _ in range(100):
+        cellsZ = randomGrid(rng, 30)
+        cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(cellsZ)
+        isletIds = np.arange(1, isletCount + 1)
+        firstIds = PointCloudUtilities.firstCells(cellsIsletIndex.ravel(), isletIds)
+        assert list(firstIds) == [np.flatnonzero(cellsIsletIndex.ravel() == islet)[0] for islet in isletIds]
+
+        occupiedIds = np.flatnonzero(cellsZ)
+        assert np.array_equal(PointCloudUtilities.firstCells(cellsIsletIndex.ravel()[occupiedIds], isletIds, occupiedIds), firstIds)
+
+
+def testIslandNamesAreNotLayerNumbers():
+    assert PointCloudUtilities.islandNames(np.array([3, 12]), np.array([1, 0])) == ["x3y1", "x12y0"]
+
+
+def testHeightOrderDoesNotDependOnTheInputOrder():
+    rng = np.random.default_rng(4)
+    # Few distinct values, so that many points share their height, or their position
+    points = rng.integers(0, 3, (500, 3)).astype(np.float64)
+    colors = rng.integers(0, 2, (500, 3))
+    islets = rng.integers(1, 4, 500)
+    order = PointCloudUtilities.heightOrder(islets, points, colors)
+    assert np.all(np.diff(islets[order]) >= 0)
+
+    shuffle = rng.permutation(500)
+    shuffledOrder = shuffle[PointCloudUtilities.heightOrder(islets[shuffle], points[shuffle], colors[shuffle])]
+    for array in (islets, points, colors):
+        assert np.array_equal(array[order], array[shuffledOrder])
+
+
+def writeSampleLas(path, pointFormat, extraBytes=False):
+    rng = np.random.default_rng(4)
+    header = laspy.LasHeader(point_format=pointFormat, version="1.2" if pointFormat < 6 else "1.4")
+    header.offsets = [843000.0, 6519000.0, 100.0]
+    header.scales = [0.01, 0.01, 0.01]
+    if extraBytes:
+        header.add_extra_dims([laspy.ExtraBytesParams("amplitude", "f4"), laspy.ExtraBytesParams("echo", "u1")])
+
+    las = laspy.LasData(header)
+    pointCount = 5000
+    las.x = 843000 + rng.random(pointCount) * 100
+    las.y = 6519000 + rng.random(pointCount) * 100
+    las.z = 100 + rng.random(pointCount) * 20
+    las.classification = rng.integers(1, 7, pointCount)
+    for name in ("red", "green", "blue"):
+        setattr(las, name, rng.integers(0, 65536, pointCount))
+    if extraBytes:
+        las.amplitude = rng.random(pointCount)
+        las.echo = rng.integers(0, 256, pointCount)
+    las.write(path)
+
+
+@pytest.mark.parametrize("pointFormat, extraBytes", [(2, False), (3, True), (7, False), (8, True)])
+def testMappedRecordsMatchLaspy(tmp_path, pointFormat, extraBytes):
+    path = str(tmp_path / "points.las")
+    writeSampleLas(path, pointFormat, extraBytes)
+    las = laspy.read(path)
+
+    records, scales, offsets, legacyClassification = PointCloudUtilities.mappedPointRecords(path)
+    assert records is not None
+    assert legacyClassification == (pointFormat < 6)
+    for name in las.points.array.dtype.names:
+        assert np.array_equal(records[name], las.points.array[name])
+
+    # The vegetation read through the memory map is the one read by laspy
+    mask = np.isin(las.classification, PointCloudUtilities.VEGETATION_CLASSES)
+    points, colors = PointCloudUtilities.readVegetationPoints(path)
+    assert np.array_equal(points, np.stack([las.x[mask], las.y[mask], las.z[mask]], axis=1))
+    assert np.array_equal(colors, np.stack([las.red[mask], las.green[mask], las.blue[mask]], axis=1))
@@ -0,0 +1,37 @@
+import pytest
+
+import profiling as Profiling
+
+
+@pytest.fixture
+def profile():
+    Profiling.startProfile()
+    yield
+    Profiling.stopProfile()
+
+
+def testSpanStoppedByAnErrorIsRecorded(profile):
+    with Profiling.span("meshing"):
+        pass
+    with pytest.raises(ValueError):
+        with Profiling.span("meshing"):
+            raise ValueError("the polygon isn't simple")
+
+    total = Profiling.stopProfile()["spans"]["meshing"]
+    assert total["calls"] == 2
+    assert total["errors"] == 1
+
+
+def testWorkerSpansAreMerged(profile):
+    with Profiling.span("ingest"):
+        pass
+    records = Profiling.takeRecords()
+    with Profiling.span("ingest"):
+        pass
+    Profiling.mergeRecords(records)
+
+    total = Profiling.stopProfile()["spans"]["ingest"]
+    assert total["calls"] == 2
+    assert total["errors"] == 0
+    if Profiling.resource is not None:
+        assert 0 < total["processPeakMemoryMB"] <= Profiling.peakMemory()
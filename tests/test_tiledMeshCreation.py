@@ -0,0 +1,44 @@
+import filecmp
+import json
+import os
+
+import pytest
+
+import meshCreation
+import pipelineBenchmark
+
+
+@pytest.fixture(scope="module")
+def syntheticLas(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("input") / "vegetation.las")
+    pipelineBenchmark.writeSyntheticVegetation(path, pipelineBenchmark.treeCountFor(30000), seed=1)
+    return path
+
+
+def outputFiles(folder):
+    return sorted(file for file in os.listdir(folder) if file != "profile.json")
+
+
+@pytest.mark.parametrize("tileSize, halo", [(20, 4), (60, 2)])
+def testTiledMeshesAreTheUntiledOnes(syntheticLas, tmp_path, tileSize, halo):
+    untiled = str(tmp_path / "untiled") + "/"
+    tiled = str(tmp_path / "tiled") + "/"
+    meshCreation.vegetationToMesh(syntheticLas, untiled, 2.0, False)
+    meshCreation.vegetationToMesh(syntheticLas, tiled, 2.0, False, tileSize=tileSize, halo=halo)
+
+    # Same islands with the same names, and the same meshes
+    files = outputFiles(untiled)
+    assert len(files) > 0
+    assert outputFiles(tiled) == files
+    assert filecmp.cmpfiles(untiled, tiled, files, shallow=False)[0] == files
+
+
+def testTiledIslandsAreTakenFromTheCacheOfAnUntiledRun(syntheticLas, tmp_path):
+    cache = str(tmp_path / "cache")
+    meshCreation.vegetationToMesh(syntheticLas, str(tmp_path / "untiled") + "/", 2.0, False, cacheFolder=cache)
+    meshCreation.vegetationToMesh(syntheticLas, str(tmp_path / "tiled") + "/", 2.0, False, tileSize=20, halo=4, cacheFolder=cache, profile=True)
+
+    with open(str(tmp_path / "tiled" / "profile.json")) as f:
+        report = json.load(f)
+    assert len(report["islands"]) > 0
+    assert all(island["cached"] for island in report["islands"])
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from shapely.geometry import box
+from shapely.geometry.polygon import orient
+from shapely.ops import unary_union
+
+import triangulate
+
+
+def signedAreas(points, triangles):
+    """ Signed area of each triangle, > 0 when it is anti-clockwise """
+    a = points[triangles[:,0]]
+    b = points[triangles[:,1]]
+    c = points[triangles[:,2]]
+    return ((b[:,0] - a[:,0]) * (c[:,1] - a[:,1]) - (b[:,1] - a[:,1]) * (c[:,0] - a[:,0])) / 2
+
+
+def assertCovers(exterior, holes, area):
+    """ The triangles are anti-clockwise, none of them is flat and they cover the area of the polygon """
+    points = np.vstack([exterior] + list(holes)).astype(np.float64)
+    areas = signedAreas(points, triangulate.triangulate(exterior, holes))
+    assert np.all(areas > 1e-12)
+    assert areas.sum() == pytest.approx(area)
+
+
+def testSquare():
+    assertCovers([[0, 0], [4, 0], [4, 4], [0, 4]], [], 16)
+
+
+def testClockwiseExterior():
+    assertCovers([[0, 4], [4, 4], [4, 0], [0, 0]], [], 16)
+
+
+def testHoles():
+    holes = [[[1, 1], [1, 2], [2, 2], [2, 1]], [[2.5, 2.5], [3.5, 2.5], [3, 3.5]]]
+    assertCovers([[0, 0], [4, 0], [4, 4], [0, 4]], holes, 16 - 1 - 0.5)
+
+
+def testCollinearVertices():
+    assertCovers([[0, 0], [1, 0], [2, 0], [4, 0], [4, 1], [4, 4], [3, 4], [2, 4], [1, 4], [0, 4], [0, 2]], [], 16)
+
+
+@pytest.mark.parametrize("exterior", [
+    # Spike going out of the polygon, then coming back
+    [[0, 0], [4, 0], [4, 4], [2, 4], [2, 6], [2, 4], [0, 4]],
+    # Spike going inside the polygon
+    [[0, 0], [4, 0], [4, 4], [2, 4], [2, 2], [2, 4], [0, 4]],
+    # Spike along an edge and a spike made of several vertices
+    [[0, 0], [4, 0], [6, 0], [4, 0], [4, 4], [3, 4], [3, 7], [3, 5], [3, 4], [0, 4]],
+    # Spike across the end of the ring
+    [[4, 0], [4, 4], [0, 4], [0, 0], [-3, 0]],
+    # Repeated points
+    [[0, 0], [0, 0], [4, 0], [4, 4], [4, 4], [0, 4], [0, 0]],
+])
+def testDegenerateRings(exterior):
+    assertCovers(exterior, [], 16)
+
+
+def testRandomPolygonsWithHoles():
+    # Unions of random cells, some of their edges being split in their middle (runs of collinear vertices).
+    # Their holes often touch the exterior or each other at a vertex
+    rng = np.random.default_rng(0)
+    polygonCount = 0
+    while polygonCount < 300:
+        cells = rng.integers(0, 8, size=(rng.integers(3, 40), 2))
+        shape = unary_union([box(x, y, x + 1, y + 1) for x, y in cells])
+        for polygon in getattr(shape, "geoms", [shape]):
+            polygon = orient(polygon, 1.0)
+            rings = [np.asarray(polygon.exterior.coords[:-1])] + [np.asarray(hole.coords[:-1]) for hole in polygon.interiors]
+            rings = [np.vstack([[p, (p + q) / 2] if rng.random() < 0.5 else [p] for p, q in zip(ring, np.roll(ring, -1, axis=0))])
+                     for ring in rings]
+            assertCovers(rings[0], rings[1:], polygon.area)
+            polygonCount += 1
+
+
+def testHoleTouchingExterior():
+    assertCovers([[0, 0], [4, 0], [4, 4], [2, 4], [0, 4]], [[[2, 4], [3, 2], [1, 2]]], 16 - 2)
+
+
+def testHolesTouchingEachOther():
+    holes = [[[1, 1], [1, 2], [2, 2], [2, 1]], [[2, 2], [2, 3], [3, 3], [3, 2]]]
+    assertCovers([[0, 0], [4, 0], [4, 4], [0, 4]], holes, 16 - 2)
+
+
+def testRingTouchingItself():
+    # The exterior goes around a hole touching it at (2, 4), as a single ring
+    assertCovers([[0, 0], [4, 0], [4, 4], [2, 4], [3, 2], [1, 2], [2, 4], [0, 4]], [], 16 - 2)
+
+
+def testTooFewPoints():
+    with pytest.raises(ValueError):
+        triangulate.triangulate([[0, 0], [1, 0]])
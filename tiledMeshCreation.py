@@ -0,0 +1,442 @@
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+import meshCreation
+import profiling as Profiling
+import pointCloudUtilities as PointCloudUtilities
+import vegetationPipeline as VegetationPipeline
+
+
+# Key of a cell of the global grid, used to compare cells seen by different tiles
+CELL_KEY_STRIDE = 1 << 32
+
+
+def cellKeys(cellsX, cellsY):
+    """ Encode the x and y index of cells of the global grid as a single integer
+
+    Parameters
+    ------
+    cellsX : array
+      Index of the cells along the x axis
+    cellsY : array
+      Index of the cells along the y axis
+
+    Returns
+    -------
+    keys : array
+        One integer per cell, ordered like the (x, y) pairs
+    """
+    return np.asarray(cellsX, np.int64) * CELL_KEY_STRIDE + np.asarray(cellsY, np.int64)
+
+
+def islandNames(anchorKeys):
+    """ Names of islands in the output files, the same as without tiling (see PointCloudUtilities.islandNames)
+
+    Parameters
+    ------
+    anchorKeys : array
+      Key of the first cell of each island (see cellKeys)
+
+    Returns
+    -------
+    names : list
+        Name of each island
+    """
+    return PointCloudUtilities.islandNames(*np.divmod(np.asarray(anchorKeys, np.int64), CELL_KEY_STRIDE))
+
+
+def vegetationToMeshTiled(input_path, output_path, pipeline, tileSize, halo, chunkSize=None, meshFormat="obj", cache=None):
+    """ Mesh the vegetation of a las/laz file tile by tile, so that the memory is bounded by the size of the tiles
+
+    The vegetation points are first streamed into one file per tile. Each tile is then processed on its own with a
+    halo around it : the grid, the islets and the meshes only cover the tile and its halo.
+    An island is meshed by a tile when it is entirely inside the tile and its halo, and its first cell is in the tile.
+    The parts of the other islands (too big for the halo) are saved and stitched once all the tiles are done,
+    then the stitched islands are meshed. Each island is meshed exactly once, through the same meshing and cache
+    as without tiling (see meshCreation.writeIslands).
+
+    Parameters
+    ------
+    input_path : str
+      Path to the las/laz file
+    output_path : str
+      Path of the output folder
+    pipeline : dict
+      Settings of the meshing, see VegetationPipeline.createPipeline. Its workers process the tiles,
+      then mesh the stitched islands
+    tileSize : float
+      Width and height of a tile (rounded to a number of cells)
+    halo : float
+      Width of the band around each tile also read by the tile (at least one cell)
+    chunkSize : int
+      Number of points read at once when splitting the file in tiles
+    meshFormat : str
+      Format of the output files, see MeshExport.MESH_FORMATS
+    cache : dict
+      Cache of the meshes (see MeshCache.openCache), None to mesh all the islands
+
+    Returns
+    -------
+    pointCount : int
+        Number of vegetation points
+    islandCount : int
+        Number of islands
+    droppedPoints : int
+        Number of points dropped by the downsampling
+    """
+    cellSize = pipeline["cellSize"]
+    workers = pipeline["workers"]
+
+    origin, maxs = PointCloudUtilities.headerBounds(input_path)
+    extent = maxs - origin
+
+    tileCells = max(1, round(tileSize/cellSize))
+    haloCells = max(1, math.ceil(halo/cellSize))
+
+    folder = tempfile.mkdtemp(prefix="vegetation_tiles_")
+    try:
+        with Profiling.span("splitting the points in tiles"):
+            tiles, pointCount, maxColor = PointCloudUtilities.bucketVegetationPoints(input_path, origin, tileCells*cellSize, folder, chunkSize or 1000000)
+            meshCreation.log.info(str(len(tiles)) + " tiles of " + str(tileCells) + " cells, halo of " + str(haloCells) + " cells")
+
+        settings = {
+            "folder": folder,
+            "tiles": set(tiles),
+            "origin": origin,
+            # Number of cells covering the points along the x and y axis
+            "gridShape": (math.floor(extent[0]/cellSize) + 1, math.floor(extent[1]/cellSize) + 1),
+            "tileCells": tileCells,
+            "haloCells": haloCells,
+            # If the color is coded on 16 bits, force it back to 8 bits
+            "colorDivider": 256 if maxColor > 256 else 1,
+            # The tiles are processed in parallel, each of them meshes its islands in a single process
+            "pipeline": dict(pipeline, workers=1),
+            "output_path": output_path,
+            "meshFormat": meshFormat,
+            "cache": cache
+        }
+
+        # The records of the workers are sent back with the results when the run is profiled
+        workerArgs = (meshCreation.log.getEffectiveLevel(), Profiling.profile is not None)
+        with Profiling.span("processing the tiles"):
+            if workers > 1:
+                with ProcessPoolExecutor(workers, initializer=meshCreation.initMeshingWorker, initargs=workerArgs) as executor:
+                    tileResults = Profiling.mergeResults(executor.map(Profiling.profiledCall, [processTile] * len(tiles), tiles, [settings] * len(tiles)))
+            else:
+                tileResults = [processTile(tile, settings) for tile in tiles]
+
+        meshed = {}
+        droppedPoints = 0
+        for pieces, claimed, tileMeshed, dropped, tilePoints in tileResults:
+            meshed.update(tileMeshed)
+            droppedPoints += dropped
+
+        with Profiling.span("meshing the stitched islands"):
+            islands = stitchPieces([piece for pieces, claimed, tileMeshed, dropped, tilePoints in tileResults for piece in pieces],
+                                   np.concatenate([claimed for pieces, claimed, tileMeshed, dropped, tilePoints in tileResults] + [np.empty(0, np.int64)]))
+            meshCreation.log.info(str(len(islands)) + " islands stitched across tiles")
+
+            # The stitched islands are loaded by batches holding at most as many points as the biggest tile, and meshed by all the workers
+            maxPoints = max([tilePoints for pieces, claimed, tileMeshed, dropped, tilePoints in tileResults] + [1])
+            for batch in stitchedBatches(islands, maxPoints):
+                batchMeshed, dropped = writeTiledIslands(settings, pipeline, *loadStitchedIslands(batch))
+                meshed.update(batchMeshed)
+                droppedPoints += dropped
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    # The islands of the tiles were meshed by other processes, the cache is told about them
+    if cache is not None:
+        cache["islands"].update(meshed)
+
+    return pointCount, len(meshed), droppedPoints
+
+
+def processTile(tile, settings):
+    """ Compute the islets of a tile and its halo, mesh the islands owned by the tile and save the parts of the others
+
+    Parameters
+    ------
+    tile : tuple
+      The x and y index of the tile
+    settings : dict
+      Settings of the tiled processing, see vegetationToMeshTiled
+
+    Returns
+    -------
+    pieces : list
+        For each island that couldn't be meshed by the tile and has cells in the tile, a dict with
+        "file" the file containing its points inside the tile, "cells" the keys of its cells inside the tile
+        and "links" the keys of its cells in the halo (see cellKeys)
+    claimed : array
+        Keys of the cells outside of the tile belonging to the islands meshed by the tile
+    meshed : dict
+        Islands meshed by the tile, with their cache record (see writeTiledIslands)
+    dropped : int
+        Number of points of the islands meshed by the tile dropped by the downsampling
+    pointCount : int
+        Number of points read by the tile (in the tile and its halo)
+    """
+    cellSize = settings["pipeline"]["cellSize"]
+    tileCells = settings["tileCells"]
+    haloCells = settings["haloCells"]
+    origin = settings["origin"]
+
+    # Cells of the tile, in the global grid
+    tileX = tile[0]*tileCells
+    tileY = tile[1]*tileCells
+
+    # Window of cells read by the tile : the tile and its halo, without the empty cells around the points
+    # (except one row, so that no islet touches the border of the window there)
+    gridShape = settings["gridShape"]
+    windowX = max(tileX - haloCells, -1)
+    windowY = max(tileY - haloCells, -1)
+    windowShape = (min(tileX + tileCells + haloCells, gridShape[0] + 1) - windowX,
+                   min(tileY + tileCells + haloCells, gridShape[1] + 1) - windowY)
+    bounds = (origin[0] + windowX*cellSize, origin[1] + windowY*cellSize,
+              origin[0] + (windowX+windowShape[0])*cellSize, origin[1] + (windowY+windowShape[1])*cellSize)
+
+    with Profiling.span("ingest"):
+        point_data, point_data_color = PointCloudUtilities.readTilePoints(settings["folder"], settings["tiles"], tileCells*cellSize, origin, bounds)
+        point_data_color = point_data_color // settings["colorDivider"]
+        point_data_color_normalized = point_data_color/255
+
+    with Profiling.span("grid aggregation"):
+        # Index of the cell containing each point, in the window
+        indexes = np.ndarray(point_data.shape[:1] + (2,), np.int32)
+        indexes[:,0] = np.clip(np.floor((point_data[:,0]-origin[0])/cellSize) - windowX, 0, windowShape[0]-1)
+        indexes[:,1] = np.clip(np.floor((point_data[:,1]-origin[1])/cellSize) - windowY, 0, windowShape[1]-1)
+
+        cellsZ, cellsZCount, cellsColorMean, cellsNormalizedColorMean = PointCloudUtilities.aggregateCells(
+            indexes, point_data, point_data_color, point_data_color_normalized, windowShape, settings["pipeline"]["zStatistic"])
+
+    with Profiling.span("labeling"):
+        cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(cellsZ, settings["pipeline"]["connectivity"])
+
+    pieces = []
+    claimed = []
+    if isletCount == 0:
+        return pieces, np.empty(0, np.int64), {}, 0, len(point_data)
+
+    with Profiling.span("partitioning"):
+        # Cells of each islet, the first cell of an islet being its smallest index in the global grid
+        cellIds = np.flatnonzero(cellsIsletIndex)
+        cellIslets = cellsIsletIndex.ravel()[cellIds]
+        cellOrder = np.argsort(cellIslets, kind='stable')
+        cellIds = cellIds[cellOrder]
+        cellOffsets = np.searchsorted(cellIslets[cellOrder], np.arange(1, isletCount + 2))
+        cellsX, cellsY = np.unravel_index(cellIds, windowShape)
+        cellsX = cellsX + windowX
+        cellsY = cellsY + windowY
+        keys = cellKeys(cellsX, cellsY)
+        inTile = (cellsX >= tileX) & (cellsX < tileX + tileCells) & (cellsY >= tileY) & (cellsY < tileY + tileCells)
+
+        # Islets touching the border of the window may continue outside of it
+        border = np.zeros(windowShape, bool)
+        border[[0, -1], :] = True
+        border[:, [0, -1]] = True
+        touchesBorder = np.bincount(cellsIsletIndex[border], minlength=isletCount + 1) > 0
+
+        # Points of each islet, sorted by height in the same order as without tiling (see PointCloudUtilities.heightOrder)
+        pointsIsletIndex = cellsIsletIndex[indexes[:,0], indexes[:,1]]
+        order = PointCloudUtilities.partitionIslands(pointsIsletIndex)[0]
+        order = order[PointCloudUtilities.heightOrder(pointsIsletIndex[order], point_data[order], point_data_color[order])]
+        pointOffsets = np.searchsorted(pointsIsletIndex[order], np.arange(1, isletCount + 2))
+
+        if settings["pipeline"]["colorMode"] == "cell":
+            islands_points_color = cellsNormalizedColorMean[indexes[order,0], indexes[order,1]]
+        else:
+            islands_points_color = point_data_color_normalized[order]
+        islands_points = point_data[order]
+        pointsX = indexes[order,0] + windowX
+        pointsY = indexes[order,1] + windowY
+        pointsInTile = (pointsX >= tileX) & (pointsX < tileX + tileCells) & (pointsY >= tileY) & (pointsY < tileY + tileCells)
+
+    owned = []
+    for islet in range(1, isletCount + 1):
+        cellStart, cellEnd = cellOffsets[islet-1], cellOffsets[islet]
+        isletInTile = inTile[cellStart:cellEnd]
+        if not np.any(isletInTile):
+            # Only in the halo, the island is handled by the tiles containing it
+            continue
+
+        pointStart, pointEnd = pointOffsets[islet-1], pointOffsets[islet]
+        isletKeys = keys[cellStart:cellEnd]
+
+        if not touchesBorder[islet] and isletInTile[np.argmin(isletKeys)]:
+            # The whole island is known and the tile owns it
+            owned.append((isletKeys.min(), pointStart, pointEnd, cellEnd - cellStart))
+            claimed.append(isletKeys[~isletInTile])
+        else:
+            # Save the part of the island that is inside the tile, it will be stitched with the other parts
+            path = os.path.join(settings["folder"], "piece_%d_%d_%d.npz" % (tile[0], tile[1], islet))
+            inside = pointsInTile[pointStart:pointEnd]
+            np.savez(path, points=islands_points[pointStart:pointEnd][inside], colors=islands_points_color[pointStart:pointEnd][inside])
+            pieces.append({"file": path, "cells": isletKeys[isletInTile], "links": isletKeys[~isletInTile], "points": np.count_nonzero(inside)})
+
+    # The islands owned by the tile are meshed together, like the islands of the untiled mode
+    meshed = {}
+    dropped = 0
+    if len(owned) > 0:
+        anchors, starts, ends, sizes = (np.array(column) for column in zip(*owned))
+        kept = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        meshed, dropped = writeTiledIslands(settings, settings["pipeline"], islandNames(anchors), islands_points[kept], islands_points_color[kept],
+                                            np.append(0, np.cumsum(ends - starts)), sizes)
+
+    return pieces, np.concatenate(claimed + [np.empty(0, np.int64)]), meshed, dropped, len(point_data)
+
+
+def stitchPieces(pieces, claimed):
+    """ Group the parts of the islands saved by the tiles into whole islands
+
+    Parameters
+    ------
+    pieces : list
+      Parts of islands, see processTile
+    claimed : array
+      Keys of the cells belonging to islands already meshed by a tile
+
+    Returns
+    -------
+    islands : list
+        For each island, its name (see islandNames), the files of its parts, its size in cells and its number of points
+    """
+    # Parts of the islands already meshed by a tile
+    pieces = [piece for piece in pieces if not np.any(np.isin(piece["cells"], claimed))]
+    if len(pieces) == 0:
+        return []
+
+    # Parts sharing a cell (a cell in the halo of a tile being inside another tile) are linked
+    allKeys = np.concatenate([piece["cells"] for piece in pieces])
+    allPieces = np.repeat(np.arange(len(pieces)), [len(piece["cells"]) for piece in pieces])
+    keyOrder = np.argsort(allKeys)
+    allKeys = allKeys[keyOrder]
+    allPieces = allPieces[keyOrder]
+
+    linksFrom = []
+    linksTo = []
+    for k, piece in enumerate(pieces):
+        positions = np.searchsorted(allKeys, piece["links"])
+        found = positions < len(allKeys)
+        found[found] = allKeys[positions[found]] == piece["links"][found]
+        linksTo.append(allPieces[positions[found]])
+        linksFrom.append(np.full(np.count_nonzero(found), k))
+    linksFrom = np.concatenate(linksFrom)
+    linksTo = np.concatenate(linksTo)
+
+    graph = scipy.sparse.coo_matrix((np.ones(len(linksFrom), np.int8), (linksFrom, linksTo)), shape=(len(pieces), len(pieces)))
+    componentCount, components = scipy.sparse.csgraph.connected_components(graph, directed=False)
+
+    islands = []
+    for component in range(componentCount):
+        members = [pieces[k] for k in np.flatnonzero(components == component)]
+        cells = np.concatenate([piece["cells"] for piece in members])
+        islands.append((islandNames([cells.min()])[0], [piece["file"] for piece in members], len(cells),
+                        sum(piece["points"] for piece in members)))
+
+    return islands
+
+
+def stitchedBatches(islands, maxPoints):
+    """ Group the stitched islands into batches loaded and meshed together
+
+    Parameters
+    ------
+    islands : list
+      The stitched islands, see stitchPieces
+    maxPoints : int
+      Maximum number of points of a batch, an island having more points being alone in its batch
+
+    Returns
+    -------
+    batches : list
+        The islands of each batch
+    """
+    batches = []
+    batchPoints = 0
+    for island in islands:
+        if len(batches) == 0 or batchPoints + island[3] > maxPoints:
+            batches.append([])
+            batchPoints = 0
+        batches[-1].append(island)
+        batchPoints += island[3]
+    return batches
+
+
+def loadStitchedIslands(islands):
+    """ Load the parts of stitched islands
+
+    Parameters
+    ------
+    islands : list
+      The stitched islands, see stitchPieces
+
+    Returns
+    -------
+    names, islandsPoints, islandsColors, offsets, sizes
+        See writeTiledIslands
+    """
+    points = []
+    colors = []
+    for name, pieceFiles, islandSize, pointCount in islands:
+        islandPoints = []
+        islandColors = []
+        for pieceFile in pieceFiles:
+            with np.load(pieceFile) as piece:
+                islandPoints.append(piece["points"])
+                islandColors.append(piece["colors"])
+        islandPoints = np.concatenate(islandPoints)
+        islandColors = np.concatenate(islandColors)
+
+        # Same order as if the island was in a single tile
+        order = PointCloudUtilities.heightOrder(np.zeros(len(islandPoints), np.int32), islandPoints, islandColors)
+        points.append(islandPoints[order])
+        colors.append(islandColors[order])
+
+    offsets = np.append(0, np.cumsum([len(islandPoints) for islandPoints in points]))
+    return ([name for name, pieceFiles, islandSize, pointCount in islands], np.concatenate(points), np.concatenate(colors), offsets,
+            np.array([islandSize for name, pieceFiles, islandSize, pointCount in islands]))
+
+
+def writeTiledIslands(settings, pipeline, names, islandsPoints, islandsColors, offsets, sizes):
+    """ Mesh islands found by the tiled processing and save their meshes, after downsampling them, see meshCreation.writeIslands
+
+    Parameters
+    ------
+    settings : dict
+      Settings of the tiled processing, see vegetationToMeshTiled
+    pipeline : dict
+      Settings of the meshing, see VegetationPipeline.createPipeline
+    names : list
+      Name of each island (see islandNames)
+    islandsPoints : 2d-array
+      The x, y and z coordinates of the points of the islands, the points of each island being contiguous and sorted
+      by height (see PointCloudUtilities.heightOrder)
+    islandsColors : 2d-array
+      The r, g and b values of the points (between 0 and 1), in the same order
+    offsets : array
+      The points of the k-th island are islandsPoints[offsets[k]:offsets[k+1]]
+    sizes : array
+      Number of cells each island is spanning
+
+    Returns
+    -------
+    meshed : dict
+        Cache record of each island (its key, files and summary, see MeshCache.fetchIsland), None without cache
+    dropped : int
+        Number of points dropped by the downsampling
+    """
+    islandsPoints, islandsColors, offsets, dropped = VegetationPipeline.downsampleIslands(islandsPoints, islandsColors, offsets,
+                                                                                         pipeline["voxelWidth"], pipeline["pointBudget"])
+    islands = {"names": names, "points": islandsPoints, "colors": islandsColors, "offsets": offsets, "sizes": sizes, "dropped": dropped}
+    meshCreation.writeIslands(pipeline, islands, settings["output_path"], settings["meshFormat"], settings["cache"])
+
+    cache = settings["cache"]
+    return {name: None if cache is None else cache["islands"][name] for name in names}, int(dropped.sum())
@@ -0,0 +1,201 @@
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+
+# Name of the tileset written in the output folder
+TILESET_NAME = "tileset.json"
+
+# Maximum number of meshes under a tile of the spatial tree before it is split in two
+TILE_MAX_MESHES = 16
+
+# Level of detail of a mesh file, see MeshExport.lodPath
+LOD_PATTERN = re.compile(r"^(.*)_lod(\d+)\.glb$")
+
+
+def readGLBBounds(path):
+    """ Read the bounding box of a glb written by MeshExport.writeGLB from its json chunk only, without reading the geometry
+
+    Parameters
+    ------
+    path : str
+      Path of the glb file
+
+    Returns
+    -------
+    bounds : 2d-array
+        The minimum then the maximum x, y and z coordinates (z-up), None if the mesh is empty
+    """
+    with open(path, 'rb') as f:
+        magic, version, length = struct.unpack('<4sII', f.read(12))
+        chunkLength, chunkType = struct.unpack('<I4s', f.read(8))
+        if magic != b'glTF' or chunkType != b'JSON':
+            raise ValueError(path + " isn't a glb file")
+        gltf = json.loads(f.read(chunkLength))
+
+    positions = gltf["accessors"][gltf["meshes"][0]["primitives"][0]["attributes"]["POSITION"]]
+    if positions["count"] == 0:
+        return None
+
+    # The positions are y-up (x, z, -y) and relative to the translation of the node
+    translation = np.array(gltf["nodes"][0].get("translation", [0, 0, 0]))
+    low = np.array(positions["min"]) + translation
+    high = np.array(positions["max"]) + translation
+    return np.array([[low[0], -high[2], low[1]], [high[0], -low[2], high[1]]])
+
+
+def meshGroups(output_path):
+    """ Group the glb files of an output folder by mesh, each mesh having its full file and its levels of detail
+
+    Parameters
+    ------
+    output_path : str
+      Path of the output folder
+
+    Returns
+    -------
+    groups : dict
+        For each mesh (name of the full file), the names of its files sorted by level of detail (full mesh first)
+    """
+    levels = {}
+    for name in os.listdir(output_path):
+        if not name.endswith(".glb"):
+            continue
+        match = LOD_PATTERN.match(name)
+        if match:
+            levels.setdefault(match.group(1) + ".glb", {})[int(match.group(2))] = name
+        else:
+            levels.setdefault(name, {})[0] = name
+
+    # Levels of detail without their full mesh are ignored
+    return {mesh: [files[level] for level in sorted(files)] for mesh, files in sorted(levels.items()) if 0 in files}
+
+
+def boundingBox(bounds):
+    """ 3D Tiles box of an axis aligned bounding box
+
+    Parameters
+    ------
+    bounds : 2d-array
+      The minimum then the maximum x, y and z coordinates
+
+    Returns
+    -------
+    box : list
+        Center then the three half axes of the box
+    """
+    center = (bounds[0] + bounds[1]) / 2
+    half = np.maximum((bounds[1] - bounds[0]) / 2, 1e-3)
+    return center.tolist() + [half[0], 0, 0, 0, half[1], 0, 0, 0, half[2]]
+
+
+def diagonal(bounds):
+    """ Length of the diagonal of a bounding box (minimum then maximum coordinates) """
+    return float(np.linalg.norm(bounds[1] - bounds[0]))
+
+
+def meshTile(files, bounds, lodRatios):
+    """ Tile of a mesh : its coarsest level of detail, replaced by the finer ones down to the full mesh
+
+    The geometric error of a level of detail is estimated as the size of the mesh times the portion of its faces
+    removed by the decimation. The full mesh has no error.
+
+    Parameters
+    ------
+    files : list
+      Names of the files of the mesh, from the full mesh to the coarsest level of detail
+    bounds : 2d-array
+      Bounding box of the full mesh
+    lodRatios : list
+      Portion of the faces kept by each level of detail (see MeshUtilities.writeMeshLods)
+
+    Returns
+    -------
+    tile : dict
+        The tile of the coarsest level, with the finer levels as children
+    """
+    tile = None
+    for level, name in enumerate(files):
+        if level == 0:
+            error = 0.0
+        else:
+            ratio = lodRatios[level-1] if lodRatios and level <= len(lodRatios) else 0.5**level
+            error = diagonal(bounds) * (1 - ratio)
+        finer = tile
+        tile = {"boundingVolume": {"box": boundingBox(bounds)}, "geometricError": error, "content": {"uri": name}}
+        if finer is not None:
+            tile["refine"] = "REPLACE"
+            tile["children"] = [finer]
+    return tile
+
+
+def spatialTile(meshes):
+    """ Tile of a group of meshes, split in two along the longest side of its box (at the median of the meshes' centers)
+    until each tile has at most TILE_MAX_MESHES meshes
+
+    Parameters
+    ------
+    meshes : list
+      For each mesh, its bounding box and its tile (see meshTile)
+
+    Returns
+    -------
+    tile : dict
+        Tile without content whose children are the meshes, or the two halves of the group
+    """
+    boxes = np.array([bounds for bounds, tile in meshes])
+    bounds = np.array([boxes[:,0].min(axis=0), boxes[:,1].max(axis=0)])
+
+    if len(meshes) <= TILE_MAX_MESHES:
+        children = [tile for bounds, tile in meshes]
+    else:
+        axis = np.argmax((bounds[1] - bounds[0])[:2])
+        order = np.argsort((boxes[:,0,axis] + boxes[:,1,axis]) / 2, kind='stable')
+        half = len(meshes) // 2
+        children = [spatialTile([meshes[k] for k in order[:half]]), spatialTile([meshes[k] for k in order[half:]])]
+
+    return {"boundingVolume": {"box": boundingBox(bounds)}, "geometricError": diagonal(bounds), "refine": "ADD", "children": children}
+
+
+def writeTileset(output_path, lodRatios=None):
+    """ Write a 3D Tiles tileset (version 1.1, glb contents) of the glb meshes of an output folder
+
+    The meshes are organized in a tree of tiles (see spatialTile), each mesh being refined from its coarsest level
+    of detail to its full mesh (see meshTile). The coordinates are the ones of the input (z-up), the glb files being
+    converted back from y-up by the viewers.
+
+    Parameters
+    ------
+    output_path : str
+      Path of the output folder
+    lodRatios : list
+      Portion of the faces kept by each level of detail of the meshes (see MeshUtilities.writeMeshLods)
+
+    Returns
+    -------
+    meshCount : int
+        Number of meshes in the tileset
+    """
+    meshes = []
+    for mesh, files in meshGroups(output_path).items():
+        bounds = readGLBBounds(output_path + mesh)
+        if bounds is not None:
+            meshes.append((bounds, meshTile(files, bounds, lodRatios)))
+
+    if len(meshes) == 0:
+        root = {"boundingVolume": {"box": boundingBox(np.zeros((2, 3)))}, "geometricError": 0.0, "refine": "ADD", "children": []}
+    else:
+        root = spatialTile(meshes)
+
+    tileset = {
+        "asset": {"version": "1.1", "generator": "UD-VCity-Vegetation-LasToMesh"},
+        "geometricError": root["geometricError"],
+        "root": root
+    }
+    with open(output_path + TILESET_NAME, 'w') as f:
+        json.dump(tileset, f)
+
+    return len(meshes)
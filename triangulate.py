@@ -1,70 +1,369 @@
-#Code copied from lionfish0.
-#https://github.com/lionfish0/earclip
-        
-def IsConvex(a, b, c):
-    # only convex if traversing anti-clockwise!
-    crossp = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
-    if crossp >= 0:
-        return True 
-    return False 
-
-def InTriangle(a, b, c, p):
-    L = [0, 0, 0]
-    eps = 0.0000001
-    # calculate barycentric coefficients for point p
-    # eps is needed as error correction since for very small distances denom->0
-    L[0] = ((b[1] - c[1]) * (p[0] - c[0]) + (c[0] - b[0]) * (p[1] - c[1])) \
-          /(((b[1] - c[1]) * (a[0] - c[0]) + (c[0] - b[0]) * (a[1] - c[1])) + eps)
-    L[1] = ((c[1] - a[1]) * (p[0] - c[0]) + (a[0] - c[0]) * (p[1] - c[1])) \
-          /(((b[1] - c[1]) * (a[0] - c[0]) + (c[0] - b[0]) * (a[1] - c[1])) + eps)
-    L[2] = 1 - L[0] - L[1]
-    # check if p lies in triangle (a, b, c)
-    for x in L:
-        if x >= 1 or x <= 0:
-            return False  
-    return True  
-
-def IsClockwise(poly):
-    # initialize sum with last element
-    sum = (poly[0][0] - poly[len(poly)-1][0]) * (poly[0][1] + poly[len(poly)-1][1])
-    # iterate over all other elements (0 to n-1)
-    for i in range(len(poly)-1):
-        sum += (poly[i+1][0] - poly[i][0]) * (poly[i+1][1] + poly[i][1])
-    if sum > 0:
-        return True
-    return False
-
-def GetEar(poly):
-    size = len(poly)
+#Triangulation of polygons (with holes).
+#The polygon is split into y-monotone pieces with a sweep line, then each piece is triangulated in linear time.
+#The sweep status is a skip list : its searches, insertions and removals are in O(log n) expected time,
+#so that the whole triangulation is in O(n log n) (expected).
+#See "Computational Geometry: Algorithms and Applications" (de Berg et al.), chapter 3.
+
+import math
+import random
+
+import numpy as np
+
+
+# The sweep needs the vertices to have distinct heights. Points of a LIDAR often share the same y,
+# so the polygon is slightly rotated before the sweep (this doesn't change the triangles, only the order of the sweep)
+SWEEP_ROTATION = 0.1234567
+
+START, END, SPLIT, MERGE, REGULAR = range(5)
+
+# Head of the skip list of the sweep status, and maximum number of levels of the skip list
+HEAD = -1
+MAX_LEVEL = 32
+
+# The copies of a vertex shared by several rings are moved apart by this portion of the shortest edge around them
+SEPARATION = 1e-4
+
+
+def Orientation(a, b, c):
+    # > 0 if a, b, c turn anti-clockwise, < 0 if they turn clockwise, 0 if they are aligned
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+def SignedArea(ring):
+    # > 0 for an anti-clockwise ring
+    x = ring[:,0]
+    y = ring[:,1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+def IsSpike(a, b, c):
+    # True if the ring a, b, c goes back on itself at b (zero-area spike), or if b is repeated
+    return Orientation(a, b, c) == 0 and (b[0] - a[0]) * (c[0] - b[0]) + (b[1] - a[1]) * (c[1] - b[1]) <= 0
+
+def RemoveSpikes(coordinates, ring):
+    """
+    Remove the degenerate vertices of a ring : the points repeated and the tips of the zero-area spikes
+    (the ring going forth and back along the same segment), which the sweep can't handle.
+    Runs of collinear vertices going forward are kept, the sweep handles them.
+
+    Parameters:
+        coordinates: array of the (x, y) coordinates of all the vertices
+        ring: list of the vertex indexes of the ring, in order
+    Returns:
+        The list of the kept vertex indexes, in order.
+    """
+    kept = []
+    for v in ring:
+        while len(kept) >= 2 and IsSpike(coordinates[kept[-2]], coordinates[kept[-1]], coordinates[v]):
+            kept.pop()
+        if len(kept) > 0 and np.array_equal(coordinates[kept[-1]], coordinates[v]):
+            continue
+        kept.append(v)
+
+    # The ring is closed : spikes can also be made by the last vertices and the first ones
+    while len(kept) >= 3:
+        if IsSpike(coordinates[kept[-2]], coordinates[kept[-1]], coordinates[kept[0]]):
+            kept.pop()
+        elif IsSpike(coordinates[kept[-1]], coordinates[kept[0]], coordinates[kept[1]]):
+            kept.pop(0)
+        else:
+            break
+    return kept
+
+def SeparateTouchingVertices(coordinates, kept, nextVertex, previousVertex):
+    """
+    Split the rings at the vertices they share (e.g. a hole touching the exterior at a vertex, or a ring touching itself),
+    which the sweep can't handle.
+    The edges around a shared point are sorted by angle : each wedge of the interior of the polygon between an outgoing edge
+    and the next incoming edge gets one of the copies of the point, which is moved slightly inside its wedge.
+
+    Parameters:
+        coordinates: array of the (x, y) coordinates of all the vertices
+        kept: list of the indexes of the vertices of the rings
+        nextVertex, previousVertex: index of the next / previous vertex on the ring of each vertex, relinked at the shared points
+    Returns:
+        The coordinates used by the sweep, a copy of coordinates where the shared points are moved apart.
+    """
+    sweepCoordinates = coordinates.copy()
+    if len(kept) == 0:
+        return sweepCoordinates
+
+    kept = np.asarray(kept)
+    _, inverse, counts = np.unique(coordinates[kept], axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    for group in np.flatnonzero(counts > 1):
+        copies = kept[inverse == group].tolist()
+        point = coordinates[copies[0]]
+
+        # Edges around the point : (angle, 0 for an incoming edge or 1 for an outgoing one, other end of the edge)
+        edges = []
+        for v in copies:
+            for kind, other in ((0, previousVertex[v]), (1, nextVertex[v])):
+                edges.append((math.atan2(coordinates[other][1] - point[1], coordinates[other][0] - point[0]), kind, other))
+        edges.sort()
+        shortest = min(math.hypot(coordinates[other][0] - point[0], coordinates[other][1] - point[1]) for _, _, other in edges)
+
+        # Going anti-clockwise, each outgoing edge is followed by the incoming edge closing its wedge
+        start = next(k for k in range(len(edges)) if edges[k][1] == 1)
+        edges = edges[start:] + edges[:start]
+        for k, v in enumerate(copies):
+            outAngle, outKind, following = edges[2*k]
+            inAngle, inKind, previous = edges[2*k + 1]
+            if outKind != 1 or inKind != 0:
+                raise ValueError("triangulate(): the polygon isn't simple")
+            nextVertex[v] = following
+            previousVertex[following] = v
+            previousVertex[v] = previous
+            nextVertex[previous] = v
+
+            bisector = outAngle + ((inAngle - outAngle) % (2*math.pi)) / 2
+            sweepCoordinates[v] = point + SEPARATION * shortest * np.array([math.cos(bisector), math.sin(bisector)])
+    return sweepCoordinates
+
+def IsAbove(points, i, j):
+    # Order of the sweep : from top to bottom, and from left to right at the same height
+    return points[i][1] > points[j][1] or (points[i][1] == points[j][1] and points[i][0] < points[j][0])
+
+
+def SplitInMonotonePolygons(points, nextVertex, previousVertex):
+    """
+    Sweep the polygon from top to bottom and add the diagonals splitting it into y-monotone pieces.
+
+    Parameters:
+        points: list of the (x, y) coordinates of the vertices (rotated for the sweep)
+        nextVertex, previousVertex: index of the next / previous vertex on the ring of each vertex.
+          The interior of the polygon must be on the left of each edge (vertex, nextVertex[vertex]).
+    Returns:
+        The list of diagonals (pairs of vertex indexes).
+    """
+    count = len(points)
+    order = sorted(range(count), key=lambda i: (-points[i][1], points[i][0]))
+
+    vertexType = [REGULAR] * count
+    for v in range(count):
+        p = previousVertex[v]
+        n = nextVertex[v]
+        convex = Orientation(points[p], points[v], points[n]) > 0
+        if IsAbove(points, v, p) and IsAbove(points, v, n):
+            vertexType[v] = START if convex else SPLIT
+        elif IsAbove(points, p, v) and IsAbove(points, n, v):
+            vertexType[v] = END if convex else MERGE
+
+    # Edges crossing the sweep line that have the interior of the polygon on their right, sorted from left to right
+    # in a skip list. An edge is identified by the index of its first vertex, the list starts at HEAD.
+    # forward[edge][level] is the next edge on a level of the list, backward[edge][level] the previous one
+    forward = {HEAD: [None] * MAX_LEVEL}
+    backward = {}
+    levels = random.Random(count)
+    helper = {}
+    diagonals = []
+
+    def XAt(edge, y):
+        a = points[edge]
+        b = points[nextVertex[edge]]
+        if a[1] == b[1]:
+            return min(a[0], b[0])
+        return a[0] + (y - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+
+    def Predecessors(x, y):
+        # Last edge on the left of x at the height y on each level of the list (HEAD if there is none)
+        update = [HEAD] * MAX_LEVEL
+        edge = HEAD
+        for level in range(MAX_LEVEL - 1, -1, -1):
+            following = forward[edge][level]
+            while following is not None and XAt(following, y) < x:
+                edge = following
+                following = forward[edge][level]
+            update[level] = edge
+        return update
+
+    def Insert(edge):
+        point = points[edge]
+        update = Predecessors(point[0], point[1])
+        level = 1
+        while level < MAX_LEVEL and levels.random() < 0.5:
+            level += 1
+        forward[edge] = [None] * level
+        backward[edge] = [None] * level
+        for k in range(level):
+            following = forward[update[k]][k]
+            forward[edge][k] = following
+            backward[edge][k] = update[k]
+            forward[update[k]][k] = edge
+            if following is not None:
+                backward[following][k] = edge
+        helper[edge] = edge
+
+    def Remove(edge):
+        if edge not in backward:
+            raise ValueError("triangulate(): the polygon isn't simple")
+        for k in range(len(backward[edge])):
+            following = forward[edge][k]
+            forward[backward[edge][k]][k] = following
+            if following is not None:
+                backward[following][k] = backward[edge][k]
+        del forward[edge]
+        del backward[edge]
+
+    def LeftEdge(v):
+        edge = Predecessors(points[v][0], points[v][1])[0]
+        if edge == HEAD:
+            raise ValueError("triangulate(): the polygon isn't simple")
+        return edge
+
+    def ConnectToMergeHelper(v, edge):
+        if vertexType[helper[edge]] == MERGE:
+            diagonals.append((v, helper[edge]))
+
+    for v in order:
+        previousEdge = previousVertex[v]
+        if vertexType[v] == START:
+            Insert(v)
+        elif vertexType[v] == END:
+            ConnectToMergeHelper(v, previousEdge)
+            Remove(previousEdge)
+        elif vertexType[v] == SPLIT:
+            left = LeftEdge(v)
+            diagonals.append((v, helper[left]))
+            helper[left] = v
+            Insert(v)
+        elif vertexType[v] == MERGE:
+            ConnectToMergeHelper(v, previousEdge)
+            Remove(previousEdge)
+            left = LeftEdge(v)
+            ConnectToMergeHelper(v, left)
+            helper[left] = v
+        elif IsAbove(points, previousVertex[v], v):
+            # The interior of the polygon is on the right of the vertex
+            ConnectToMergeHelper(v, previousEdge)
+            Remove(previousEdge)
+            Insert(v)
+        else:
+            left = LeftEdge(v)
+            ConnectToMergeHelper(v, left)
+            helper[left] = v
+
+    return diagonals
+
+
+def MonotonePieces(points, nextVertex, diagonals):
+    """
+    Walk along the faces of the polygon split by the diagonals.
+
+    Returns:
+        The list of the pieces, each piece being the list of its vertex indexes (anti-clockwise).
+    """
+    # Half edges having the interior of the polygon on their left, sorted by angle around their origin
+    outgoing = [[n] for n in nextVertex]
+    for a, b in diagonals:
+        outgoing[a].append(b)
+        outgoing[b].append(a)
+
+    angles = []
+    for v in range(len(points)):
+        vertexAngles = [math.atan2(points[w][1] - points[v][1], points[w][0] - points[v][0]) for w in outgoing[v]]
+        order = sorted(range(len(outgoing[v])), key=vertexAngles.__getitem__)
+        outgoing[v] = [outgoing[v][k] for k in order]
+        angles.append([vertexAngles[k] for k in order])
+
+    used = set()
+    pieces = []
+    for start in range(len(points)):
+        for firstNext in outgoing[start]:
+            if (start, firstNext) in used:
+                continue
+            piece = []
+            a = start
+            b = firstNext
+            while (a, b) not in used:
+                used.add((a, b))
+                piece.append(a)
+                # Next edge : the first one met when turning clockwise from the edge going back to a
+                backAngle = math.atan2(points[a][1] - points[b][1], points[a][0] - points[b][0])
+                candidates = angles[b]
+                k = len(candidates) - 1
+                while k >= 0 and candidates[k] >= backAngle:
+                    k -= 1
+                a, b = b, outgoing[b][k]
+                if len(piece) > len(points):
+                    raise ValueError("triangulate(): the polygon isn't simple")
+            if (a, b) != (start, firstNext):
+                raise ValueError("triangulate(): the polygon isn't simple")
+            pieces.append(piece)
+    return pieces
+
+
+def TriangulateMonotonePolygon(points, piece, coordinates=None):
+    """
+    Triangulate a y-monotone polygon given anti-clockwise, in linear time (once its vertices are sorted).
+
+    Parameters:
+        points: list of the (x, y) coordinates of the vertices (rotated for the sweep)
+        piece: list of the vertex indexes of the polygon
+        coordinates: coordinates of the vertices before the rotation, used for the orientation tests
+          so that collinear vertices are exactly collinear and don't make flat triangles. None to use points
+    Returns:
+        The list of the triangles (triples of vertex indexes).
+    """
+    if coordinates is None:
+        coordinates = points
+
+    size = len(piece)
     if size < 3:
         return []
     if size == 3:
-        tri = (poly[0], poly[1], poly[2])
-        del poly[:]
-        return tri
-    for i in range(size):
-        tritest = False
-        p1 = poly[(i-1) % size]
-        p2 = poly[i % size]
-        p3 = poly[(i+1) % size]
-        if IsConvex(p1, p2, p3):
-            for x in poly:
-                if not (x in (p1, p2, p3)) and InTriangle(p1, p2, p3, x):
-                    tritest = True
-            if tritest == False:
-                del poly[i % size]
-                return (p1, p2, p3)
-    print('GetEar(): no ear found')
-    return []
-
-def triangulate(pts):
+        return [tuple(piece)]
+
+    top = min(range(size), key=lambda k: (-points[piece[k]][1], points[piece[k]][0]))
+    bottom = min(range(size), key=lambda k: (points[piece[k]][1], -points[piece[k]][0]))
+
+    # Going anti-clockwise from the top, we go down the left chain until the bottom
+    onLeftChain = {}
+    k = top
+    while k != bottom:
+        onLeftChain[piece[k]] = True
+        k = (k + 1) % size
+    while k != top:
+        onLeftChain[piece[k]] = False
+        k = (k + 1) % size
+    onLeftChain[piece[bottom]] = True
+
+    vertices = sorted(piece, key=lambda v: (-points[v][1], points[v][0]))
+    triangles = []
+    stack = [vertices[0], vertices[1]]
+
+    for j in range(2, size - 1):
+        v = vertices[j]
+        if onLeftChain[v] != onLeftChain[stack[-1]]:
+            # The vertex sees all the vertices of the stack
+            for k in range(len(stack) - 1):
+                triangles.append((v, stack[k], stack[k + 1]))
+            stack = [vertices[j - 1], v]
+        else:
+            last = stack.pop()
+            while len(stack) > 0:
+                orientation = Orientation(coordinates[stack[-1]], coordinates[last], coordinates[v])
+                if (orientation > 0) if onLeftChain[v] else (orientation < 0):
+                    triangles.append((v, last, stack[-1]))
+                    last = stack.pop()
+                else:
+                    break
+            stack.append(last)
+            stack.append(v)
+
+    v = vertices[size - 1]
+    for k in range(len(stack) - 1):
+        triangles.append((v, stack[k], stack[k + 1]))
+
+    return triangles
+
+
+def triangulate(pts, holes=()):
     """
-    Split a convex, simple polygon into triangles, using earclipping algorithm.
-    Code literally copied from mrbaozi.
-    https://github.com/mrbaozi/triangulation and turned into a module.
-    
+    Split a simple polygon, possibly with holes, into triangles (see the top of the file for the complexity).
+    The repeated points and the zero-area spikes of the rings are skipped (see RemoveSpikes),
+    and the rings touching each other (or themselves) at a vertex are split there (see SeparateTouchingVertices).
+
     Parameters:
-        pts: a list of lists (of coordinates). E.g.
+        pts: a list of lists (of coordinates) of the exterior of the polygon. E.g.
           [[ 229.23,   78.21],
            [ 258.49,   17.23],
            [ 132.09,  -22.43],
@@ -75,22 +374,69 @@ def triangulate(pts):
            [ 176.52,  193.84],
            [ 171.13,   87.15]]
            (note the last point isn't the first, it is assumed closed)
+        holes: a list of the holes of the polygon, each given like pts
     Returns:
-        A list of tuples. Each tuple contains three coordinates (representing
-        one triangle), each coordinate is a list of two values. E.g.
-            [([171.12, 87.39],
-              [176.17, 193.49],
-              [4.69,   204.10]),
-             ([171.10, 87.22],
-              [4.32,   204.87],
-              [-12.23, 137.54])]          
-            
+        An array of index triples, one line per triangle, all of them anti-clockwise.
+        The indexes refer to the points of pts followed by the points of each hole, in the order given. E.g.
+            [[8, 6, 7],
+             [8, 0, 6],
+             ...]
+        Raises a ValueError if the polygon isn't simple.
     """
-    tri = []
-    plist = pts[::-1] if IsClockwise(pts) else pts[:]
-    while len(plist) >= 3:
-        a = GetEar(plist)
-        if a == []:
-            break
-        tri.append(a)
-    return tri
\ No newline at end of file
+    rings = [np.asarray(ring, np.float64).reshape(-1, 2) for ring in [pts] + list(holes)]
+    if len(rings[0]) < 3:
+        raise ValueError("triangulate(): the polygon needs at least 3 points")
+
+    coordinates = np.vstack(rings)
+
+    # Links between the vertices, turning anti-clockwise around the exterior and clockwise around the holes
+    # so that the interior of the polygon is always on the left. Points repeated on a ring and spikes are skipped.
+    nextVertex = list(range(len(coordinates)))
+    previousVertex = list(range(len(coordinates)))
+    kept = []
+    offset = 0
+    for ringIndex, ring in enumerate(rings):
+        indexes = RemoveSpikes(coordinates, list(range(offset, offset + len(ring))))
+        offset += len(ring)
+        if len(indexes) < 3:
+            if ringIndex == 0:
+                raise ValueError("triangulate(): the polygon needs at least 3 points")
+            continue
+        antiClockwise = SignedArea(coordinates[indexes]) > 0
+        if antiClockwise != (ringIndex == 0):
+            indexes = indexes[::-1]
+        for k in range(len(indexes)):
+            nextVertex[indexes[k]] = indexes[(k + 1) % len(indexes)]
+            previousVertex[indexes[k]] = indexes[k - 1]
+        kept.extend(indexes)
+
+    # Rotated coordinates used for all the computations of the sweep
+    sweepCoordinates = SeparateTouchingVertices(coordinates, kept, nextVertex, previousVertex)
+    cos = math.cos(SWEEP_ROTATION)
+    sin = math.sin(SWEEP_ROTATION)
+    points = np.column_stack([sweepCoordinates[:,0]*cos - sweepCoordinates[:,1]*sin,
+                              sweepCoordinates[:,0]*sin + sweepCoordinates[:,1]*cos]).tolist()
+
+    # Work on the kept vertices only
+    localIndex = {v: k for k, v in enumerate(kept)}
+    localPoints = [points[v] for v in kept]
+    localCoordinates = sweepCoordinates[kept].tolist()
+    localNext = [localIndex[nextVertex[v]] for v in kept]
+    localPrevious = [localIndex[previousVertex[v]] for v in kept]
+
+    diagonals = SplitInMonotonePolygons(localPoints, localNext, localPrevious)
+
+    triangles = []
+    for piece in MonotonePieces(localPoints, localNext, diagonals):
+        triangles.extend(TriangulateMonotonePolygon(localPoints, piece, localCoordinates))
+
+    triangles = np.array(kept, np.int64)[np.array(triangles, np.int64).reshape(-1, 3)]
+
+    # Make all the triangles anti-clockwise, the flat ones (joining copies of a shared point) are dropped
+    a = coordinates[triangles[:,0]]
+    b = coordinates[triangles[:,1]]
+    c = coordinates[triangles[:,2]]
+    areas = (b[:,0] - a[:,0]) * (c[:,1] - a[:,1]) - (b[:,1] - a[:,1]) * (c[:,0] - a[:,0])
+    triangles[areas < 0] = triangles[areas < 0][:, ::-1]
+
+    return triangles[areas != 0]
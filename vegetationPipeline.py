@@ -0,0 +1,567 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import meshCreation
+import meshCreationUtilities as MeshUtilities
+import pointCloudUtilities as PointCloudUtilities
+import profiling as Profiling
+
+
+def createPipeline(cellSize=2.0, zStatistic="mean", connectivity="corner", colorMode="cell", normalsMode="centroid", nbLayers=5, layerMargin=1/3,
+                   alphaEngine="library", voxelSize=None, pointBudget=None, lodRatios=None, workers=1, gridMode="auto"):
+    """ Settings of the meshing of vegetation in memory, reusable for any number of point clouds (see meshVegetation)
+
+    Unlike meshCreation.vegetationToMesh, the pipeline doesn't read or write any file, doesn't set up the logging
+    and doesn't print anything.
+
+    Parameters
+    ------
+    cellSize : float
+      Size of the cells of the grid
+    zStatistic : str
+      Height given to each cell, see PointCloudUtilities.CELL_STATISTICS
+    connectivity : str
+      Rule used to group the cells into islets, see PointCloudUtilities.CONNECTIVITY_MODES
+    colorMode : str
+      Color given to the points, see PointCloudUtilities.COLOR_MODES
+    normalsMode : str
+      How the faces of the alpha shapes are oriented, see MeshUtilities.NORMALS_MODES
+    nbLayers : int
+      Number of layers of the layered alpha shapes
+    layerMargin : float
+      Portion of the height of a layer added on top of each layer, see meshCreation.layerBounds
+    alphaEngine : str
+      Implementation of the alpha shapes, see MeshUtilities.ALPHA_ENGINES
+    voxelSize : float
+      Width of the voxels of the downsampling relative to the cell size, None to keep all the points
+    pointBudget : int
+      Maximum number of points of an island given to the meshing, None for no maximum
+    lodRatios : list
+      Portion of the faces kept by each level of detail of the meshes, see MeshUtilities.meshLods
+    workers : int
+      Number of processes meshing the islands
+    gridMode : str
+      Storage of the grid of cells, see PointCloudUtilities.GRID_MODES
+
+    Returns
+    -------
+    pipeline : dict
+        The settings
+    """
+    for value, values in ((zStatistic, PointCloudUtilities.CELL_STATISTICS), (connectivity, PointCloudUtilities.CONNECTIVITY_MODES),
+                          (colorMode, PointCloudUtilities.COLOR_MODES), (normalsMode, MeshUtilities.NORMALS_MODES),
+                          (alphaEngine, MeshUtilities.ALPHA_ENGINES), (gridMode, PointCloudUtilities.GRID_MODES)):
+        if value not in values:
+            raise ValueError("Unknown option '" + str(value) + "', expected one of " + str(values))
+
+    return {
+        "cellSize": cellSize,
+        "zStatistic": zStatistic,
+        "connectivity": connectivity,
+        "colorMode": colorMode,
+        "meshOptions": {"normalsMode": normalsMode, "nbLayers": nbLayers, "layerMargin": layerMargin, "alphaEngine": alphaEngine},
+        # Width of the voxels of the downsampling, given relative to the cell size
+        "voxelWidth": voxelSize*cellSize if voxelSize else None,
+        "pointBudget": pointBudget,
+        "lodRatios": list(lodRatios or []),
+        "workers": workers,
+        "gridMode": gridMode
+    }
+
+
+def lasArrays(las):
+    """ Points, colors and classification of a LasData (see laspy)
+
+    Returns
+    -------
+    points : 2d-array
+        The x, y and z coordinates of each point
+    colors : 2d-array
+        The raw r, g and b values of each point (as stored in the file)
+    classification : array
+        The class of each point
+    """
+    points = np.stack([las.x, las.y, las.z], axis=1)
+    colors = np.stack([las.red, las.green, las.blue], axis=1)
+    return points, colors, np.asarray(las.classification)
+
+
+def eightBitColors(colors):
+    """ Colors coded on 8 bits : colors coded on 16 bits are forced back to 8 bits
+
+    The colors are on 16 bits when any of their values is above 256. Only the red value of the first point was checked before,
+    which kept dark 16 bits colors (first point with a red value of at most 256) unchanged.
+
+    Parameters
+    ------
+    colors : 2d-array
+      The r, g and b values of the points (on 8 or 16 bits)
+
+    Returns
+    -------
+    colors : 2d-array
+        The r, g and b values of the points, between 0 and 255
+    """
+    if len(colors) > 0 and np.max(colors) > 256:
+        return colors//256
+    return colors
+
+
+def splitIslands(point_data, point_data_color, cellSize, zStatistic="mean", connectivity="corner", colorMode="cell", voxelWidth=None, pointBudget=None, gridMode="auto",
+                 origin=None):
+    """ Split vegetation points into islands : the points are aggregated in a grid of cells, the cells grouped into islets
+    and the points sorted by islet, then by height inside each islet
+
+    Parameters
+    ------
+    point_data : 2d-array
+      The x, y and z coordinates of the points
+    point_data_color : 2d-array
+      The r, g and b values of the points, between 0 and 255 (see eightBitColors)
+    cellSize : float
+      Size of the cells of the grid
+    zStatistic : str
+      Height given to each cell, see PointCloudUtilities.CELL_STATISTICS
+    connectivity : str
+      Rule used to group the cells into islets, see PointCloudUtilities.CONNECTIVITY_MODES
+    colorMode : str
+      Color given to the points, see PointCloudUtilities.COLOR_MODES
+    voxelWidth : float
+      Width of the voxels of the downsampling (see PointCloudUtilities.downsampleIsland), None to keep all the points
+    pointBudget : int
+      Maximum number of points of an island, None for no maximum
+    gridMode : str
+      Storage of the grid of cells, see PointCloudUtilities.GRID_MODES. The sparse grid only stores the occupied cells
+    origin : tuple
+      The x and y coordinates of the corner of the grid, at most the ones of the points (e.g. the minimum of the las header,
+      like the tiled mode). None for the minimum of the points
+
+    Returns
+    -------
+    islands : dict
+        "names" the name of each island (see PointCloudUtilities.islandNames), "points" and "colors" (between 0 and 1)
+        of the points of all the islands, "offsets" where the points of each island start and end in them,
+        "sizes" the number of cells spanned by each island and "dropped" the number of points of each island dropped
+        by the downsampling
+    """
+    # RGB colors which values vary between 0 and 1
+    point_data_color_normalized = point_data_color/255
+
+    with Profiling.span("grid aggregation"):
+        xmax, ymax, zmax = np.max(point_data, axis=0)
+        if origin is None:
+            xmin, ymin, zmin = np.min(point_data, axis=0)
+        else:
+            xmin, ymin = origin
+
+        # Same cells as the tiled mode (see TiledMeshCreation.processTile) : the cell (i, j) covers
+        # [xmin + i*cellSize, xmin + (i+1)*cellSize[ x [ymin + j*cellSize, ymin + (j+1)*cellSize[
+        cellCountWidth = math.floor((xmax-xmin)/cellSize) + 1
+        cellCountHeight = math.floor((ymax-ymin)/cellSize) + 1
+        gridShape = (cellCountWidth, cellCountHeight)
+        sparse = PointCloudUtilities.gridBackend(len(point_data), gridShape, gridMode) == "sparse"
+
+        # Index of the cell containing each point, used both to aggregate the points and to find their islet
+        indexes = np.ndarray(point_data.shape[:1] + (2,), np.int32)
+        indexes[:,0] = np.clip(np.floor((point_data[:,0]-xmin)/cellSize), 0, cellCountWidth-1)
+        indexes[:,1] = np.clip(np.floor((point_data[:,1]-ymin)/cellSize), 0, cellCountHeight-1)
+
+        # Height of each cell (mean of the heights by default, see PointCloudUtilities.CELL_STATISTICS for the other choices)
+        # and mean of the colors in each cell
+        if sparse:
+            # Only the occupied cells are stored, sorted by their id in the grid
+            occupiedIds, cellsZmean, cellsZCount, cellsColorMean, cellsNormalizedColorMean = PointCloudUtilities.aggregateSparseCells(
+                indexes, point_data, point_data_color, point_data_color_normalized, gridShape, zStatistic)
+            meshCreation.log.info("Sparse grid of " + str(len(occupiedIds)) + " occupied cells out of " + str(cellCountWidth*cellCountHeight))
+        else:
+            cellsZmean, cellsZCount, cellsColorMean, cellsNormalizedColorMean = PointCloudUtilities.aggregateCells(
+                indexes, point_data, point_data_color, point_data_color_normalized, gridShape, zStatistic)
+
+    with Profiling.span("labeling"):
+        # With the default "corner" connectivity, the current cell and the other three on a given corner (here curentx +1 and current y+1)
+        # are part of the same islet if at least 3 of them have a height
+        if sparse:
+            cellsIsletIndex, isletCount = PointCloudUtilities.labelSparseIslets(occupiedIds, cellsZmean, gridShape, connectivity)
+        else:
+            cellsIsletIndex, isletCount = PointCloudUtilities.labelIslets(cellsZmean, connectivity)
+        meshCreation.log.info(str(isletCount) + " islets found")
+
+    with Profiling.span("partitioning"):
+        # Islet of the cell containing each point
+        if sparse:
+            pointsCells = PointCloudUtilities.occupiedCellIndex(occupiedIds, indexes[:,0], indexes[:,1], gridShape)
+            pointsIsletIndex = np.where(pointsCells >= 0, cellsIsletIndex[pointsCells], 0)
+        else:
+            pointsIsletIndex = cellsIsletIndex[indexes[:,0], indexes[:,1]]
+
+        # The points are sorted by island so that each island is a contiguous slice of 'islands_points'
+        order, isletIds, offsets = PointCloudUtilities.partitionIslands(pointsIsletIndex)
+        meshCreation.log.info(str(len(point_data) - len(order)) + " points outside of the islets (cells not linked to other cells)")
+
+        # Inside each island, the points are sorted by height so that each layer of an island is a contiguous slice
+        order = order[PointCloudUtilities.heightOrder(pointsIsletIndex[order], point_data[order], point_data_color[order])]
+        islands_points = point_data[order]
+
+        # Size of each island (number of cells the island is spanning)
+        islands_size = np.bincount(cellsIsletIndex.ravel(), minlength=isletCount+1)[isletIds]
+
+        # Each island is named after its first cell, like in the tiled mode
+        if sparse:
+            firstIds = PointCloudUtilities.firstCells(cellsIsletIndex, isletIds, occupiedIds)
+        else:
+            firstIds = PointCloudUtilities.firstCells(cellsIsletIndex.ravel(), isletIds)
+        islandNames = PointCloudUtilities.islandNames(*np.unravel_index(firstIds, gridShape))
+
+        # Colors of the points, in the same order as 'islands_points'
+        if colorMode == "cell":
+            # Each point has the mean of colors inside a cell
+            if sparse:
+                islands_points_color = cellsNormalizedColorMean[pointsCells[order]]
+            else:
+                islands_points_color = cellsNormalizedColorMean[indexes[order,0], indexes[order,1]]
+        else:
+            # Each point has the color information provided with the LIDAR
+            islands_points_color = point_data_color_normalized[order]
+
+    islands_points, islands_points_color, offsets, islandsDropped = downsampleIslands(islands_points, islands_points_color, offsets,
+                                                                                     voxelWidth, pointBudget)
+
+    return {"names": islandNames, "points": islands_points, "colors": islands_points_color, "offsets": offsets,
+            "sizes": islands_size, "dropped": islandsDropped}
+
+
+def downsampleIslands(islandsPoints, islandsColors, offsets, voxelWidth=None, pointBudget=None):
+    """ Points given to the meshing algorithms : one point per voxel, and at most pointBudget points per island
+    (see PointCloudUtilities.downsampleIsland)
+
+    Parameters
+    ------
+    islandsPoints : 2d-array
+      The x, y and z coordinates of the points of the islands, the points of each island being contiguous
+    islandsColors : 2d-array
+      The r, g and b values of the points, in the same order
+    offsets : array
+      The points of the k-th island are islandsPoints[offsets[k]:offsets[k+1]]
+    voxelWidth : float
+      Width of the voxels, None for no voxels
+    pointBudget : int
+      Maximum number of points of an island, None for no maximum
+
+    Returns
+    -------
+    islandsPoints, islandsColors, offsets
+        The kept points, in the same order
+    dropped : array
+        Number of points of each island dropped
+    """
+    islandsDropped = np.zeros(len(offsets) - 1, np.int64)
+    if voxelWidth or pointBudget:
+        with Profiling.span("downsampling"):
+            kept = [offsets[k] + PointCloudUtilities.downsampleIsland(islandsPoints[offsets[k]:offsets[k+1]], voxelWidth, pointBudget)
+                    for k in range(len(offsets) - 1)]
+            islandsDropped = np.diff(offsets) - [len(islandKept) for islandKept in kept]
+            offsets = np.append(0, np.cumsum([len(islandKept) for islandKept in kept]))
+            kept = np.concatenate(kept + [np.empty(0, np.int64)])
+            islandsPoints = islandsPoints[kept]
+            islandsColors = islandsColors[kept]
+            meshCreation.log.info(str(islandsDropped.sum()) + " points dropped by the downsampling")
+
+    return islandsPoints, islandsColors, offsets, islandsDropped
+
+
+def meshLas(pipeline, las):
+    """ Mesh the vegetation of a LasData (see laspy) in memory, see meshVegetation. The grid starts at the minimum of the header """
+    return meshVegetation(pipeline, *lasArrays(las), origin=las.header.mins[:2])
+
+
+def meshVegetation(pipeline, points, colors, classification=None, origin=None):
+    """ Mesh vegetation points in memory
+
+    Parameters
+    ------
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+    points : 2d-array
+      The x, y and z coordinates of the points
+    colors : 2d-array
+      The r, g and b values of the points (on 8 or 16 bits)
+    classification : array
+      The class of each point, only the points of PointCloudUtilities.VEGETATION_CLASSES are kept. None to keep all of them
+    origin : tuple
+      The x and y coordinates of the corner of the grid of cells, see splitIslands
+
+    Returns
+    -------
+    islands : list
+        For each island, a dict with its "name" (see PointCloudUtilities.islandNames), number of "points" meshed, of points "dropped" by the downsampling,
+        of "cells" it is spanning, the "algorithm" that made its meshes and the "fallbacks" that failed before it
+        (see Profiling.choiceAttempts), its "choice" (see meshCreation.islandMeshes) and its "meshes".
+        Each mesh is a dict with its "name", "vertices", "colors" (between 0 and 1), "faces" and "lods",
+        the vertices, colors and faces of each level of detail (see MeshUtilities.meshLods)
+    """
+    points = np.asarray(points, np.float64).reshape(-1, 3)
+    colors = np.asarray(colors).reshape(-1, 3)
+    if classification is not None:
+        vegetation = np.isin(classification, PointCloudUtilities.VEGETATION_CLASSES)
+        points = points[vegetation]
+        colors = colors[vegetation]
+    if len(points) == 0:
+        return []
+
+    islands = splitIslands(points, eightBitColors(colors), pipeline["cellSize"], pipeline["zStatistic"], pipeline["connectivity"],
+                           pipeline["colorMode"], pipeline["voxelWidth"], pipeline["pointBudget"], pipeline["gridMode"], origin)
+
+    # Back in the order of the islands
+    results = dict(meshIslands(pipeline, islands))
+    return [results[k] for k in range(len(islands["names"]))]
+
+
+def meshIslands(pipeline, islands, numbers=None):
+    """ Mesh the islands of splitIslands, for meshVegetation and for the files written by meshCreation.vegetationToMesh
+
+    The convex hulls of consecutive small islands are made by batches (see meshCreation.hullBatches).
+    With several workers, the points are shared with the worker processes (see meshCreation.shareArray)
+    and the layers of the layered alpha shapes are separate tasks : an island whose layers all succeeded keeps them,
+    otherwise it goes through the fallback chain (see meshCreation.islandFallbackMeshes), as with a single process.
+
+    Parameters
+    ------
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+    islands : dict
+      The islands, see splitIslands
+    numbers : list
+      Numbers of the islands to mesh (positions in islands["names"]), in increasing order. None for all of them
+
+    Yields
+    ------
+    number : int
+      Number of the island, in no particular order
+    island : dict
+      The island, see meshVegetation
+    """
+    names = islands["names"]
+    offsets = islands["offsets"]
+    if numbers is None:
+        numbers = range(len(names))
+
+    hullIslands = [k for k in numbers if meshCreation.isHullIsland(islands["points"][offsets[k]:offsets[k+1]], islands["sizes"][k])]
+    otherIslands = sorted(set(numbers) - set(hullIslands))
+
+    with Profiling.span("meshing"):
+        if pipeline["workers"] > 1:
+            yield from pooledIslands(pipeline, islands, hullIslands, otherIslands)
+            return
+
+        for start, end in meshCreation.hullBatches(hullIslands):
+            yield from zip(range(start, end), hullIslandsTask(islands["points"][offsets[start]:offsets[end]], islands["colors"][offsets[start]:offsets[end]],
+                                                              names[start:end], offsets[start:end+1] - offsets[start], islands["sizes"][start:end],
+                                                              islands["dropped"][start:end], pipeline))
+        for k in otherIslands:
+            with Profiling.islandWork(names[k]):
+                island = islandTask(names[k], islands["points"][offsets[k]:offsets[k+1]], islands["colors"][offsets[k]:offsets[k+1]],
+                                    islands["sizes"][k], islands["dropped"][k], pipeline)
+            yield k, island
+
+
+def pooledIslands(pipeline, islands, hullIslands, otherIslands):
+    """ Mesh islands with a pool of processes, see meshIslands
+
+    Parameters
+    ------
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+    islands : dict
+      The islands, see splitIslands
+    hullIslands : list
+      Numbers of the islands meshed with a convex hull, in increasing order
+    otherIslands : list
+      Numbers of the other islands
+
+    Yields
+    ------
+    number : int
+      Number of the island
+    island : dict
+      The island, see meshVegetation
+    """
+    names = islands["names"]
+    offsets = islands["offsets"]
+    meshOptions = pipeline["meshOptions"]
+
+    # Each task only carries the bounds of its points in the shared arrays
+    sharedPoints = meshCreation.shareArray(islands["points"])
+    sharedColors = meshCreation.shareArray(islands["colors"])
+    try:
+        # The records of the workers are sent back with the results when the run is profiled
+        workerArgs = (meshCreation.log.getEffectiveLevel(), Profiling.profile is not None)
+        with ProcessPoolExecutor(pipeline["workers"], initializer=meshCreation.initMeshingWorker, initargs=workerArgs) as executor:
+            def submit(function, index, start, end, *args):
+                return executor.submit(meshCreation.meshTask, (function, sharedPoints.name, sharedColors.name, len(islands["points"]),
+                                                               start, end, index, args, {}))
+
+            hullFutures = [(start, end, submit(hullIslandsTask, None, offsets[start], offsets[end], names[start:end], offsets[start:end+1] - offsets[start],
+                                               islands["sizes"][start:end], islands["dropped"][start:end], pipeline))
+                           for start, end in meshCreation.hullBatches(hullIslands)]
+
+            islandFutures = {}
+            layerFutures = []
+            for k in otherIslands:
+                islandPoints = islands["points"][offsets[k]:offsets[k+1]]
+                islandSize = islands["sizes"][k]
+                if meshCreation.isLayeredIsland(islandPoints, islandSize):
+                    # The same alpha is used for all the layers of the island
+                    alpha = MeshUtilities.computeAlpha(islandPoints)
+                    futures = [submit(layerTask, names[k], offsets[k]+start, offsets[k]+end, layer, alpha, pipeline)
+                               for layer, start, end in meshCreation.layerBounds(islandPoints, meshOptions["nbLayers"], meshOptions["layerMargin"])]
+                    layerFutures.append((k, alpha, futures))
+                else:
+                    islandFutures[k] = submit(islandTask, names[k], offsets[k], offsets[k+1], islandSize, islands["dropped"][k], pipeline)
+
+            for start, end, future in hullFutures:
+                yield from zip(range(start, end), Profiling.mergeResults([future.result()])[0])
+
+            # The meshes of the layers are only kept once all the layers of the island succeeded
+            for k, alpha, futures in layerFutures:
+                islandSize = islands["sizes"][k]
+                errors = [future.exception() for future in futures if future.exception() is not None]
+                meshes = Profiling.mergeResults(future.result() for future in futures if future.exception() is None)
+                if len(errors) == 0:
+                    yield k, islandResult(names[k], offsets[k+1] - offsets[k], islandSize, islands["dropped"][k], meshes, str(islandSize) + " sliced alpha shape\n")
+                else:
+                    meshCreation.log.info("[Warning] : error when creating the layered alphashape, aborting")
+                    meshCreation.log.info(errors[0])
+                    islandFutures[k] = submit(fallbackTask, names[k], offsets[k], offsets[k+1], islandSize, alpha, islands["dropped"][k], pipeline)
+
+            for k, future in islandFutures.items():
+                yield k, Profiling.mergeResults([future.result()])[0]
+    finally:
+        sharedPoints.close()
+        sharedPoints.unlink()
+        sharedColors.close()
+        sharedColors.unlink()
+
+
+def islandTask(index, islandPoints, islandColors, islandSize, dropped, pipeline):
+    """ Mesh an island (see meshCreation.islandMeshes), possibly inside a worker process (see meshCreation.meshTask)
+
+    Parameters
+    ------
+    index : str
+      Name of the island (see PointCloudUtilities.islandNames)
+    islandPoints : 2d-array
+      The x, y and z coordinates of the points of the island, sorted by height
+    islandColors : 2d-array
+      The r, g and b values of the points of the island (between 0 and 1)
+    islandSize : int
+      Number of cells the island is spanning
+    dropped : int
+      Number of points of the island dropped by the downsampling
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+
+    Returns
+    -------
+    island : dict
+        See meshVegetation
+    """
+    meshes, choice = meshCreation.islandMeshes(index, islandPoints, islandColors, islandSize, **pipeline["meshOptions"])
+    return islandResult(index, len(islandPoints), islandSize, dropped, [lodMesh(mesh, pipeline) for mesh in meshes], choice)
+
+
+def layerTask(index, layerPoints, layerColors, layer, alpha, pipeline):
+    """ Mesh a layer of an island (see meshCreation.layerMesh) inside a worker process, see pooledIslands
+
+    Returns
+    -------
+    mesh : dict
+        See meshVegetation
+    """
+    options = pipeline["meshOptions"]
+    return lodMesh(meshCreation.layerMesh(index, layerPoints, layerColors, layer, alpha, options["normalsMode"], options["alphaEngine"]), pipeline)
+
+
+def fallbackTask(index, islandPoints, islandColors, islandSize, alpha, dropped, pipeline):
+    """ Mesh an island whose layers failed (see meshCreation.islandFallbackMeshes) inside a worker process, see pooledIslands
+
+    Returns
+    -------
+    island : dict
+        See meshVegetation
+    """
+    options = pipeline["meshOptions"]
+    meshes, choice = meshCreation.islandFallbackMeshes(index, islandPoints, islandColors, islandSize, alpha, options["normalsMode"], options["alphaEngine"])
+    return islandResult(index, len(islandPoints), islandSize, dropped, [lodMesh(mesh, pipeline) for mesh in meshes], choice)
+
+
+def hullIslandsTask(islandsPoints, islandsColors, indexes, offsets, islandsSize, islandsDropped, pipeline):
+    """ Mesh a batch of islands meshed with a convex hull (see meshCreation.hullIslandsMeshes), possibly inside a worker process
+
+    The hulls are made together, so that only the levels of detail of each island are counted in its profiled work,
+    the hulls being counted in the "creation of convex hull" span.
+
+    Parameters
+    ------
+    islandsPoints : 2d-array
+      The x, y and z coordinates of the points of the islands, the points of each island being contiguous
+    islandsColors : 2d-array
+      The r, g and b values of the points (between 0 and 1), in the same order
+    indexes : list
+      Name of each island (see PointCloudUtilities.islandNames)
+    offsets : array
+      The points of the k-th island are islandsPoints[offsets[k]:offsets[k+1]]
+    islandsSize : list
+      Number of cells each island is spanning
+    islandsDropped : list
+      Number of points of each island dropped by the downsampling
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+
+    Returns
+    -------
+    islands : list
+        See meshVegetation
+    """
+    results = meshCreation.hullIslandsMeshes(indexes, [islandsPoints[offsets[k]:offsets[k+1]] for k in range(len(indexes))],
+                                             [islandsColors[offsets[k]:offsets[k+1]] for k in range(len(indexes))], islandsSize)
+    islands = []
+    for k, (meshes, choice) in enumerate(results):
+        with Profiling.islandWork(indexes[k]):
+            islands.append(islandResult(indexes[k], offsets[k+1] - offsets[k], islandsSize[k], islandsDropped[k],
+                                        [lodMesh(mesh, pipeline) for mesh in meshes], choice))
+    return islands
+
+
+def lodMesh(mesh, pipeline):
+    """ Add the levels of detail of a mesh (see MeshUtilities.meshLods) and count it in the profiled work of its island
+
+    Parameters
+    ------
+    mesh : dict
+      The mesh, see meshCreation.namedMesh
+    pipeline : dict
+      Settings of the meshing, see createPipeline
+
+    Returns
+    -------
+    mesh : dict
+        The mesh, with its "lods"
+    """
+    mesh["lods"] = MeshUtilities.meshLods(mesh["vertices"], mesh["colors"], mesh["faces"], pipeline["lodRatios"])
+    Profiling.recordMesh(len(mesh["vertices"]), len(mesh["faces"]))
+    return mesh
+
+
+def islandResult(index, pointCount, islandSize, dropped, meshes, choice):
+    """ Island of meshVegetation
+
+    Returns
+    -------
+    island : dict
+        See meshVegetation
+    """
+    algorithm, fallbacks = Profiling.choiceAttempts(choice)
+    return {"name": str(index), "points": int(pointCount), "dropped": int(dropped), "cells": int(islandSize),
+            "algorithm": algorithm, "fallbacks": fallbacks, "choice": choice, "meshes": meshes}